@@ -1,5 +1,11 @@
-from django.contrib import admin
-from .models import Users, Patient, MediAdmin, Pharmacist, Doctor
+from django import forms
+from django.contrib import admin, messages
+from .models import (
+    Users, Patient, MediAdmin, Pharmacist, Doctor, Medication, DoctorAvailability, Appointment,
+    Prescription, PrescriptionItem, DrugInteraction,
+)
+from .prescriptions import cancel_prescription, dispense_prescription
+from .scheduling import SlotUnavailable, check_slot
 
 
 # Register your models here.
@@ -10,3 +16,97 @@ admin.site.register(MediAdmin)
 admin.site.register(Pharmacist)
 admin.site.register(Doctor)
 
+admin.site.register(Medication)
+
+admin.site.register(DoctorAvailability)
+
+
+class AppointmentForm(forms.ModelForm):
+    class Meta:
+        model = Appointment
+        fields = ['doctor', 'patient', 'start', 'status']
+
+    def clean(self):
+        # The same slot and overlap checks as book_appointment; the end follows from the slot
+        cleaned = super().clean()
+        doctor = cleaned.get('doctor', self.instance.doctor if self.instance.pk else None)
+        start = cleaned.get('start', self.instance.start)
+        if doctor is None or start is None:
+            return cleaned
+        if cleaned.get('status') != 'booked':
+            if not self.instance.pk:
+                raise forms.ValidationError("New appointments are added as booked")
+            return cleaned
+        if self.instance.pk and 'status' not in self.changed_data:
+            return cleaned
+        try:
+            self.instance.end = check_slot(doctor, start, exclude=self.instance if self.instance.pk else None)
+        except SlotUnavailable as exc:
+            raise forms.ValidationError(str(exc))
+        return cleaned
+
+
+@admin.register(Appointment)
+class AppointmentAdmin(admin.ModelAdmin):
+    form = AppointmentForm
+    list_display = ('doctor', 'patient', 'start', 'end', 'status')
+    list_filter = ('status',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Rescheduling is a cancellation and a new booking
+        return ('doctor', 'patient', 'start', 'end') if obj else ('end',)
+
+
+class PrescriptionItemInline(admin.TabularInline):
+    model = PrescriptionItem
+    fields = ('medication', 'dosage', 'quantity', 'ends_on')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Prescription)
+class PrescriptionAdmin(admin.ModelAdmin):
+    # Prescribing and moving a prescription go through main.prescriptions (the
+    # interaction check, stock and the pending counter), so here only the notes
+    # are editable and the status changes through the actions below
+    list_display = ('id', 'patient', 'doctor', 'pharmacist', 'status', 'created_at')
+    list_filter = ('status',)
+    readonly_fields = ('doctor', 'patient', 'pharmacist', 'status', 'created_at', 'dispensed_at')
+    fields = readonly_fields + ('notes',)
+    inlines = [PrescriptionItemInline]
+    actions = ['dispense', 'cancel']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # A pending one still counts on its pharmacist's dashboard; cancel it first
+        return obj is not None and obj.status != 'pending' and super().has_delete_permission(request, obj)
+
+    @admin.action(description="Dispense from the assigned pharmacist's stock")
+    def dispense(self, request, queryset):
+        done = 0
+        for prescription in queryset.select_related('pharmacist'):
+            if prescription.pharmacist is None:
+                self.message_user(request, f"{prescription} has no pharmacist to dispense it", messages.ERROR)
+                continue
+            try:
+                dispense_prescription(prescription, prescription.pharmacist)
+            except ValueError as exc:
+                self.message_user(request, f"{prescription}: {exc}", messages.ERROR)
+                continue
+            done += 1
+        self.message_user(request, f"Dispensed {done} prescription(s)")
+
+    @admin.action(description="Cancel")
+    def cancel(self, request, queryset):
+        for prescription in queryset:
+            cancel_prescription(prescription)
+        self.message_user(request, f"Cancelled {len(queryset)} prescription(s)")
+
+
+admin.site.register(DrugInteraction)
@@ -0,0 +1,227 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Subquery
+from django.utils import timezone
+
+from .models import (
+    AggregateMember, AggregateTombstone, AggregateWatermark, DailyRegistrations, Doctor, Patient, Pharmacist,
+    SummaryCount,
+)
+
+# The admin dashboard reads small summary tables instead of counting the
+# account tables on every load. refresh_aggregates brings them up to date from
+# high-water marks: each account past the last seen id or updated_at is
+# compared with what it contributed last time (AggregateMember) and moved
+# between buckets; one seen for the first time is also added to its
+# registration day. Deleted accounts leave an AggregateTombstone behind so they
+# can be taken out without a scan.
+
+AGGREGATE_MODELS = {'patient': Patient, 'doctor': Doctor, 'pharmacist': Pharmacist}
+ROLE_FOR_AGGREGATE_MODEL = {model: role for role, model in AGGREGATE_MODELS.items()}
+
+# Roles with a stored profile_missing bitmask (see update_profile_completeness)
+PROFILE_ROLES = ('patient', 'doctor')
+
+# updated_at is read back this far before the mark, so a save whose
+# transaction committed after a later one's is still picked up (reprocessing
+# an account is harmless: it is compared with its last contribution). The same
+# goes for inserts: on PostgreSQL a row can commit after one with a higher id,
+# and registrations are counted from members, not id ranges, so it still is.
+UPDATED_AT_OVERLAP = timedelta(minutes=5)
+
+REGISTRATION_DAYS = 14
+CHUNK_SIZE = 2000
+
+
+def refresh_stamp():
+    """When the summaries last changed, as an expression to annotate onto the ETag query"""
+    return Subquery(AggregateWatermark.objects.order_by(F('refreshed_at').desc(nulls_last=True)).values('refreshed_at')[:1])
+
+
+def _add(model, lookup, change):
+    if not model.objects.filter(**lookup).update(count=F('count') + change):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(count=F('count') + change)
+
+
+def _contribution(role, row):
+    speciality = row[2] if role == 'doctor' else None
+    incomplete = role in PROFILE_ROLES and row[-1] != 0
+    return speciality, incomplete
+
+
+def _buckets(role, speciality, incomplete):
+    buckets = [('role', role)]
+    if speciality is not None:
+        buckets.append(('speciality', speciality))
+    if incomplete:
+        buckets.append(('incomplete', role))
+    return buckets
+
+
+def _refresh_members(role, model, mark, top_id, deltas):
+    """
+    Compare changed and new accounts with their last contribution, adding
+    first-seen ones to their registration day. Returns the newest updated_at
+    seen, how many accounts were new and how many moved buckets.
+    """
+    fields = ['pk', 'registration_date'] + (['speciality'] if role == 'doctor' else []) + (
+        ['profile_missing'] if role in PROFILE_ROLES else []
+    )
+    changed = model.objects.filter(pk__lte=top_id)
+    if mark.last_updated_at is not None:
+        # No shared id bound or ordering, so each side of the OR seeks its own
+        # index; a row past top_id read here is unchanged when the next refresh gets to it
+        changed = model.objects.filter(updated_at__gte=mark.last_updated_at - UPDATED_AT_OVERLAP) | model.objects.filter(
+            pk__gt=mark.last_id, pk__lte=top_id,
+        )
+    newest = changed.aggregate(newest=Max('updated_at'))['newest']
+    rows = changed.values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+    registrations = {}
+    moved = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            moved += _apply_members(role, chunk, deltas, registrations)
+            chunk = []
+    if chunk:
+        moved += _apply_members(role, chunk, deltas, registrations)
+    for day, added in registrations.items():
+        _add(DailyRegistrations, {'role': role, 'day': day}, added)
+    return newest, sum(registrations.values()), moved
+
+
+def _apply_members(role, rows, deltas, registrations):
+    members = {
+        member.object_id: member
+        for member in AggregateMember.objects.filter(role=role, object_id__in=[row[0] for row in rows])
+    }
+    created, updated = [], []
+    for row in rows:
+        speciality, incomplete = _contribution(role, row)
+        member = members.get(row[0])
+        if member is None:
+            created.append(AggregateMember(role=role, object_id=row[0], speciality=speciality, incomplete=incomplete))
+            registrations[row[1]] = registrations.get(row[1], 0) + 1
+        elif (member.speciality, member.incomplete) != (speciality, incomplete):
+            for bucket in _buckets(role, member.speciality, member.incomplete):
+                deltas[bucket] = deltas.get(bucket, 0) - 1
+            member.speciality, member.incomplete = speciality, incomplete
+            updated.append(member)
+        else:
+            continue
+        for bucket in _buckets(role, speciality, incomplete):
+            deltas[bucket] = deltas.get(bucket, 0) + 1
+    AggregateMember.objects.bulk_create(created)
+    AggregateMember.objects.bulk_update(updated, ['speciality', 'incomplete'])
+    return len(created) + len(updated)
+
+
+def record_deletion(instance):
+    """Leave a tombstone so the next refresh takes a deleted account out of its buckets"""
+    role = ROLE_FOR_AGGREGATE_MODEL.get(type(instance))
+    if role is not None:
+        AggregateTombstone.objects.create(role=role, object_id=instance.pk)
+
+
+def _remove_deleted(role, deltas):
+    """Consume the role's tombstones, dropping the members they name"""
+    tombstones = list(AggregateTombstone.objects.filter(role=role).values_list('pk', 'object_id'))
+    removed = 0
+    for start in range(0, len(tombstones), CHUNK_SIZE):
+        chunk = tombstones[start:start + CHUNK_SIZE]
+        gone = AggregateMember.objects.filter(role=role, object_id__in=[object_id for _, object_id in chunk])
+        for member in gone:
+            for bucket in _buckets(role, member.speciality, member.incomplete):
+                deltas[bucket] = deltas.get(bucket, 0) - 1
+            removed += 1
+        gone.delete()
+        AggregateTombstone.objects.filter(pk__in=[pk for pk, _ in chunk]).delete()
+    return removed
+
+
+@transaction.atomic
+def refresh_aggregates(roles=AGGREGATE_MODELS):
+    """
+    Bring DailyRegistrations and SummaryCount up to date. Returns
+    {role: (new accounts, accounts added or moved, accounts removed)}.
+    """
+    report = {}
+    deltas = {}
+    now = timezone.now()
+    for role in roles:
+        model = AGGREGATE_MODELS[role]
+        mark, _ = AggregateWatermark.objects.select_for_update().get_or_create(role=role)
+        # Rows inserted while this runs wait for the next refresh
+        top_id = model.objects.aggregate(top=Max('pk'))['top'] or 0
+        newest, added, moved = _refresh_members(role, model, mark, top_id, deltas)
+        removed = _remove_deleted(role, deltas)
+        report[role] = (added, moved, removed)
+        mark.last_id = max(mark.last_id, top_id)
+        if newest is not None:
+            mark.last_updated_at = max(filter(None, (mark.last_updated_at, newest)))
+        # Only a change moves the stamp, so dashboard ETags survive idle refreshes
+        if any(report[role]) or mark.refreshed_at is None:
+            mark.refreshed_at = now
+        mark.save()
+    for (kind, key), change in deltas.items():
+        if change:
+            _add(SummaryCount, {'kind': kind, 'key': key}, change)
+    return report
+
+
+@transaction.atomic
+def rebuild_aggregates():
+    """Start over from empty tables (after bulk changes that skipped updated_at)"""
+    for model in (DailyRegistrations, SummaryCount, AggregateMember, AggregateTombstone, AggregateWatermark):
+        model.objects.all().delete()
+    return refresh_aggregates()
+
+
+def _summary(counts, registrations, today):
+    totals = {'role': {}, 'speciality': {}, 'incomplete': {}}
+    for kind, key, count in counts:
+        if count:
+            totals.setdefault(kind, {})[key] = count
+    days = [today - timedelta(days=offset) for offset in range(REGISTRATION_DAYS - 1, -1, -1)]
+    per_day = {day: {role: 0 for role in AGGREGATE_MODELS} for day in days}
+    for role, day, count in registrations:
+        if day in per_day:
+            per_day[day][role] = count
+    peak = max((sum(row.values()) for row in per_day.values()), default=0) or 1
+    return {
+        'role_counts': [(role, totals['role'].get(role, 0)) for role in AGGREGATE_MODELS],
+        'total_accounts': sum(totals['role'].values()),
+        'specialities': sorted(totals['speciality'].items(), key=lambda item: (-item[1], item[0])),
+        'incomplete_profiles': [(role, totals['incomplete'].get(role, 0)) for role in PROFILE_ROLES],
+        'registrations': [
+            {'day': day, 'total': sum(row.values()), 'percent': round(100 * sum(row.values()) / peak), **row}
+            for day, row in per_day.items()
+        ],
+        'registrations_total': sum(sum(row.values()) for row in per_day.values()),
+    }
+
+
+def _summary_queries(today):
+    counts = SummaryCount.objects.values_list('kind', 'key', 'count')
+    registrations = DailyRegistrations.objects.filter(
+        day__gt=today - timedelta(days=REGISTRATION_DAYS), day__lte=today,
+    ).values_list('role', 'day', 'count')
+    return counts, registrations
+
+
+def admin_summary():
+    """Everything the admin dashboard shows, in two queries on the summary tables"""
+    today = timezone.localdate()
+    counts, registrations = _summary_queries(today)
+    return _summary(today=today, counts=list(counts), registrations=list(registrations))
+
+
+async def aadmin_summary():
+    today = timezone.localdate()
+    counts, registrations = _summary_queries(today)
+    return _summary(
+        today=today, counts=[row async for row in counts], registrations=[row async for row in registrations],
+    )
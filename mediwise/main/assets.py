@@ -0,0 +1,165 @@
+import re
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+# Where build_assets writes its output (inside the app's static dir, so
+# collectstatic picks it up and ManifestStaticFilesStorage hashes it)
+DIST_DIR = Path(__file__).resolve().parent / 'static' / 'main' / 'dist'
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+FONT_WEIGHTS = {
+    'thin': 100, 'extralight': 200, 'light': 300, 'normal': 400, 'medium': 500,
+    'semibold': 600, 'bold': 700, 'extrabold': 800, 'black': 900,
+}
+
+# Font Awesome prefix classes -> the webfont that draws them
+ICON_STYLES = {
+    'fas': 'solid', 'fa-solid': 'solid',
+    'far': 'regular', 'fa-regular': 'regular',
+    'fab': 'brands', 'fa-brands': 'brands',
+}
+ICON_FONTS = {'solid': 'fa-solid-900', 'regular': 'fa-regular-400', 'brands': 'fa-brands-400'}
+
+# Font Awesome utility classes that are not icons
+ICON_UTILITIES = {
+    'fa-solid', 'fa-regular', 'fa-brands', 'fa-fw', 'fa-spin', 'fa-pulse', 'fa-beat', 'fa-fade',
+    'fa-bounce', 'fa-flip', 'fa-shake', 'fa-xs', 'fa-sm', 'fa-lg', 'fa-xl', 'fa-2x', 'fa-3x',
+    'fa-4x', 'fa-5x', 'fa-stack', 'fa-inverse', 'fa-border', 'fa-pull-left', 'fa-pull-right',
+}
+
+# Latin and Latin-1 Supplement, the only scripts the templates are written in
+LATIN_RANGE = (
+    'U+0000-00FF,U+0131,U+0152-0153,U+02BB-02BC,U+02C6,U+02DA,U+02DC,U+0304,U+0308,U+0329,'
+    'U+2000-206F,U+2074,U+20AC,U+2122,U+2191,U+2193,U+2212,U+2215,U+FEFF,U+FFFD'
+)
+
+ICON_CLASS_RE = re.compile(r'\bfa-[a-z0-9-]+')
+PREFIX_RE = re.compile(r'(?<![\w-])(fas|far|fab|fa-solid|fa-regular|fa-brands)(?![\w-])')
+WEIGHT_CLASS_RE = re.compile(r'\bfont-(' + '|'.join(FONT_WEIGHTS) + r')\b')
+WEIGHT_CSS_RE = re.compile(r'font-weight:\s*(\d{3})')
+FAMILY_RE = re.compile(r'''font-family:\s*['"]([^'"]+)['"]''')
+# One icon rule in Font Awesome 6's all.css: `.fa-user::before { content: "\f007"; }`
+ICON_RULE_RE = re.compile(r'([^{}]+)\{\s*content:\s*"\\([0-9a-fA-F]+)";?\s*\}')
+FONT_FACE_RE = re.compile(r'@font-face\s*\{[^}]*\}')
+
+
+class TemplateUsage:
+    """What the templates actually use: icon classes, icon styles, font families and weights"""
+
+    def __init__(self):
+        self.icons = set()
+        self.icon_styles = set()
+        self.families = set()
+        self.weights = {FONT_WEIGHTS['normal']}
+
+    @classmethod
+    def scan(cls, root=TEMPLATE_DIR):
+        usage = cls()
+        for path in sorted(Path(root).rglob('*.html')):
+            text = path.read_text(encoding='utf-8')
+            usage.icons.update(name for name in ICON_CLASS_RE.findall(text) if name not in ICON_UTILITIES)
+            usage.icon_styles.update(ICON_STYLES[prefix] for prefix in PREFIX_RE.findall(text))
+            usage.weights.update(FONT_WEIGHTS[name] for name in WEIGHT_CLASS_RE.findall(text))
+            usage.weights.update(int(weight) for weight in WEIGHT_CSS_RE.findall(text))
+            usage.families.update(
+                family for family in FAMILY_RE.findall(text) if not family.startswith('Font Awesome')
+            )
+        return usage
+
+
+def node_modules():
+    return Path(getattr(settings, 'ASSET_NODE_MODULES', settings.BASE_DIR / 'node_modules'))
+
+
+def font_css(usage, out_dir):
+    """
+    @font-face rules for the families and weights the templates use, copying
+    the matching Latin-subset woff2 files from the Fontsource packages
+    """
+    rules = []
+    (out_dir / 'fonts').mkdir(parents=True, exist_ok=True)
+    for family in sorted(usage.families):
+        slug = family.lower().replace(' ', '-')
+        files = node_modules() / '@fontsource' / slug / 'files'
+        for weight in sorted(usage.weights):
+            source = files / f"{slug}-latin-{weight}-normal.woff2"
+            if not source.exists():
+                continue
+            shutil.copyfile(source, out_dir / 'fonts' / source.name)
+            rules.append(
+                f"@font-face{{font-family:'{family}';font-style:normal;font-weight:{weight};"
+                f"font-display:swap;src:url(fonts/{source.name}) format('woff2');"
+                f"unicode-range:{LATIN_RANGE}}}"
+            )
+    return '\n'.join(rules)
+
+
+def purge_icon_css(css, icons):
+    """Drop every icon rule whose selectors are all unused; keep the base classes. Returns (css, codepoints)."""
+    codepoints = set()
+
+    def keep(match):
+        selectors = [selector.strip() for selector in match.group(1).split(',')]
+        used = [s for s in selectors if re.sub(r'::?before$', '', s).lstrip('.') in icons]
+        if not used:
+            return ''
+        codepoints.add(int(match.group(2), 16))
+        return f"{','.join(used)}{{content:\"\\{match.group(2)}\"}}"
+
+    return ICON_RULE_RE.sub(keep, css), codepoints
+
+
+def _subset_font(source, target, codepoints):
+    """Keep only the glyphs for the used icons (needs fontTools; otherwise the whole font is copied)"""
+    try:
+        from fontTools import subset
+    except ImportError:
+        shutil.copyfile(source, target)
+        return False
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    font = subset.load_font(str(source), options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    subset.save_font(font, str(target), options)
+    return True
+
+
+def icon_css(usage, out_dir):
+    """
+    Font Awesome's all.css cut down to the icons the templates use, with
+    woff2-only @font-face rules for the styles in use and subset webfonts.
+    Returns (css, subsetted).
+    """
+    package = node_modules() / '@fortawesome' / 'fontawesome-free'
+    css = (package / 'css' / 'all.css').read_text(encoding='utf-8')
+    css, codepoints = purge_icon_css(css, usage.icons)
+
+    # Replace the stock @font-face rules (which also point at .ttf files and
+    # the v4 compatibility font) with woff2-only rules for the styles in use
+    css = FONT_FACE_RE.sub('', css)
+    (out_dir / 'webfonts').mkdir(parents=True, exist_ok=True)
+    faces = []
+    subsetted = False
+    for style in sorted(usage.icon_styles):
+        name = ICON_FONTS[style]
+        subsetted |= _subset_font(package / 'webfonts' / f"{name}.woff2", out_dir / 'webfonts' / f"{name}.woff2", codepoints)
+        family = 'Font Awesome 6 Brands' if style == 'brands' else 'Font Awesome 6 Free'
+        weight = {'solid': 900, 'regular': 400, 'brands': 400}[style]
+        faces.append(
+            f"@font-face{{font-family:'{family}';font-style:normal;font-weight:{weight};"
+            f"font-display:block;src:url(webfonts/{name}.woff2) format('woff2')}}"
+        )
+    return '\n'.join(faces) + '\n' + css, subsetted
+
+
+def copy_vendor_files(out_dir):
+    """Third-party files used as-is by individual pages"""
+    vendor = out_dir / 'vendor'
+    vendor.mkdir(parents=True, exist_ok=True)
+    for source in ('cropperjs/dist/cropper.min.css', 'cropperjs/dist/cropper.min.js'):
+        shutil.copyfile(node_modules() / source, vendor / Path(source).name)
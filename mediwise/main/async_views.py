@@ -0,0 +1,154 @@
+"""
+Coroutine versions of the hot read paths (login, dashboards and profile
+pages), routed by mediwise.urls_async when the site runs under ASGI. They
+use the async ORM and session APIs and await password checks in the hashing
+pool, so one worker process keeps serving other requests while a request
+waits on the database or on PBKDF2. Form posts are handed to the sync views
+in views.py in a thread.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import redirect, render
+
+from . import views
+from .aggregates import aadmin_summary, refresh_stamp
+from .conditional import conditional_page
+from .credentials import CredentialPoolBusy, acheck_account_password
+from .forms import DoctorProfileUpdateForm, PatientProfileUpdateForm, PharmacistProfileUpdateForm
+from .fragments import fragment_context
+from .identity import LOGIN_MODELS, afind_accounts
+from .pharmacy import adashboard_summary
+from .principal import SESSION_KEYS, principal_required
+
+DASHBOARDS = {
+    'admin': 'admin_dashboard',
+    'patient': 'patient_dashboard',
+    'pharmacist': 'pharmacist_dashboard',
+    'doctor': 'doctor_dashboard',
+}
+
+
+def writes_in_thread(sync_view):
+    """Send anything but GET/HEAD to the sync view, so only reads run on the event loop"""
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+            return await view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def agetUser(email, password):
+    for role, object_id in await afind_accounts(email):
+        user = await LOGIN_MODELS[role].objects.filter(pk=object_id).afirst()
+        if user and await acheck_account_password(user, password):
+            return role, user
+    return None, None
+
+
+async def login(request):
+    if request.method == 'POST':
+        email = request.POST.get('email')
+        password = request.POST.get('password')
+
+        try:
+            role, user_obj = await agetUser(email, password)
+        except CredentialPoolBusy:
+            return render(request, 'login.html', {'error': 'Too many sign-in attempts right now, please try again'}, status=503)
+
+        if role:
+            await request.session.aset(SESSION_KEYS[role], user_obj.id)
+            return redirect(DASHBOARDS[role])
+
+        return render(request, 'login.html', {'error': 'Invalid credentials'})
+
+    return render(request, 'login.html')
+
+
+@conditional_page('admin', stamp=refresh_stamp)
+@principal_required('admin')
+async def admin_dashboard(request):
+    admin = request.principal
+    context = {'admin': admin, 'summary': await aadmin_summary(), **fragment_context('admin', admin)}
+    return render(request, 'admin/dashboard.html', context)
+
+
+@conditional_page('patient')
+@principal_required('patient')
+async def patient_dashboard(request):
+    user = request.principal
+    context = {
+        'user': user,
+        'profile_incomplete': user.profile_missing != 0,
+        **fragment_context('patient', user),
+    }
+    return render(request, 'patient/dashboard.html', context)
+
+
+@principal_required('pharmacist')
+async def pharmacist_dashboard(request):
+    pharmacist = request.principal
+    context = {
+        'pharmacist': pharmacist,
+        'data': await adashboard_summary(pharmacist),
+        **fragment_context('pharmacist', pharmacist),
+    }
+    return render(request, 'pharmacist/dashboard.html', context)
+
+
+@conditional_page('doctor')
+@principal_required('doctor')
+async def doctor_dashboard(request):
+    doctor = request.principal
+    context = {
+        'user': doctor,
+        'profile_incomplete': doctor.profile_missing != 0,
+        **fragment_context('doctor', doctor),
+    }
+    return render(request, 'doctor/dashboard.html', context)
+
+
+@writes_in_thread(views.update_profile)
+@conditional_page('patient')
+@principal_required('patient')
+async def update_profile(request):
+    patient = request.principal
+    return render(request, 'patient/profile.html', {
+        'form': PatientProfileUpdateForm(instance=patient),
+        'user': patient,
+    })
+
+
+@writes_in_thread(views.admin_profile)
+@conditional_page('admin')
+@principal_required('admin')
+async def admin_profile(request):
+    return render(request, 'admin/profile.html', {'admin': request.principal})
+
+
+@writes_in_thread(views.pharmacist_profile)
+@conditional_page('pharmacist')
+@principal_required('pharmacist')
+async def pharmacist_profile(request):
+    pharmacist = request.principal
+    return render(request, 'pharmacist/profile.html', {
+        'pharmacist': pharmacist,
+        'form': PharmacistProfileUpdateForm(instance=pharmacist),
+        'has_password': bool(pharmacist.password and pharmacist.password.strip()),
+    })
+
+
+@writes_in_thread(views.doctor_profile)
+@conditional_page('doctor')
+@principal_required('doctor')
+async def doctor_profile(request):
+    doctor = request.principal
+    return render(request, 'doctor/profile.html', {
+        'form': DoctorProfileUpdateForm(instance=doctor),
+        'user': doctor,
+        'has_password': bool(doctor.password and doctor.password.strip()),
+        'has_profile_picture': bool(doctor.profile_picture),
+    })
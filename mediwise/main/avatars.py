@@ -0,0 +1,51 @@
+import hashlib
+import re
+from functools import lru_cache
+from html import escape
+
+from django.conf import settings
+
+HEX_COLOUR_RE = re.compile(r'^[0-9a-fA-F]{6}$')
+DEFAULT_BACKGROUND = 'fff1f2'
+DEFAULT_COLOUR = 'be123c'
+AVATAR_SIZE = 128
+
+SVG_TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+    '<rect width="{size}" height="{size}" fill="#{background}"/>'
+    '<text x="50%" y="50%" dy=".35em" fill="#{colour}" text-anchor="middle" '
+    'font-family="\'Plus Jakarta Sans\',Arial,sans-serif" font-size="{font_size}" font-weight="700">'
+    '{initials}</text></svg>'
+)
+
+
+def initials_for(first_name, last_name):
+    """Up to two uppercase initials, or '?' when there is no name"""
+    # The first letter or digit of each name, so the result always fits the avatar URL
+    letters = [next((ch for ch in name if ch.isalnum()), '') for name in (first_name, last_name) if name]
+    return clean_initials(''.join(letters))
+
+
+def clean_initials(value):
+    letters = [ch for ch in (value or '') if ch.isalnum()][:2]
+    return ''.join(letters).upper() or '?'
+
+
+def clean_colour(value, default):
+    return value.lower() if value and HEX_COLOUR_RE.match(value) else default
+
+
+@lru_cache(maxsize=getattr(settings, 'AVATAR_CACHE_SIZE', 512))
+def render_avatar(initials, background, colour):
+    """
+    (svg_bytes, etag) for an initials avatar. The output depends only on the
+    arguments, so it is cached per (initials, palette) and the ETag is strong.
+    """
+    svg = SVG_TEMPLATE.format(
+        size=AVATAR_SIZE,
+        background=background,
+        colour=colour,
+        font_size=AVATAR_SIZE * 2 // 5,
+        initials=escape(initials),
+    ).encode()
+    return svg, '"%s"' % hashlib.sha256(svg).hexdigest()[:32]
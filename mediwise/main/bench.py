@@ -0,0 +1,84 @@
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from .models import Doctor, Patient
+from .identity import bulk_sync_identities
+
+
+@contextmanager
+def scratch_data():
+    """Run a benchmark inside a transaction that is always rolled back"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def time_calls(func, args_list):
+    """Call func once per args tuple and return the latencies in milliseconds"""
+    samples = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'mean_ms': sum(samples) / len(samples) if samples else 0.0,
+        'p50_ms': percentile(samples, 50),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+def bench_email(role, index):
+    return f"{role}{index}@bench.mediwise"
+
+
+def seed_patients(start, stop, batch_size=5000):
+    """Bulk insert synthetic patients numbered start..stop-1"""
+    genders = ['male', 'female', 'other']
+    for offset in range(start, stop, batch_size):
+        batch = [
+            Patient(
+                first_name=f"Patient{i}",
+                last_name="Bench",
+                password=f"password{i}",
+                gender=random.choice(genders),
+                email=bench_email('patient', i),
+            )
+            for i in range(offset, min(offset + batch_size, stop))
+        ]
+        Patient.objects.bulk_create(batch, batch_size=batch_size)
+        bulk_sync_identities(batch, batch_size)
+
+
+def seed_doctors(start, stop, batch_size=5000):
+    """Bulk insert synthetic doctors numbered start..stop-1"""
+    specialities = ['Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics']
+    for offset in range(start, stop, batch_size):
+        batch = [
+            Doctor(
+                first_name=f"Doctor{i}",
+                last_name="Bench",
+                password=f"password{i}",
+                phone_number="0",
+                speciality=random.choice(specialities),
+                qualification="MD",
+                email=bench_email('doctor', i),
+            )
+            for i in range(offset, min(offset + batch_size, stop))
+        ]
+        Doctor.objects.bulk_create(batch, batch_size=batch_size)
+        bulk_sync_identities(batch, batch_size)
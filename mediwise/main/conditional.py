@@ -0,0 +1,112 @@
+import hashlib
+from functools import lru_cache, wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from .identity import LOGIN_MODELS
+from .principal import SESSION_KEYS
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates'
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """Newest template mtime, so a deploy that changes a page also changes its ETags"""
+    return max((path.stat().st_mtime_ns for path in TEMPLATE_DIR.rglob('*.html')), default=0)
+
+
+def _etag(request, role, object_id, versions):
+    # The CSRF cookie is part of the key so a cached form never carries a stale token
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    versions = ':'.join(str(version) for version in versions)
+    raw = f"{role}:{object_id}:{versions}:{template_version()}:{csrf}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _versions(role, object_id, stamp=None):
+    """The account's updated_at, plus the value of the `stamp` callable's expression, in one query"""
+    rows = LOGIN_MODELS[role].objects.filter(pk=object_id)
+    if stamp is None:
+        return rows.values_list('updated_at')
+    return rows.annotate(stamp=stamp()).values_list('updated_at', 'stamp')
+
+
+def principal_etag(role, stamp=None):
+    """
+    ETag function for a page that only renders the logged-in account's row
+    (and whatever `stamp` versions): one primary-key lookup of updated_at,
+    without loading the row itself
+    """
+    def etag_func(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        object_id = request.session.get(SESSION_KEYS[role])
+        # Pending flash messages would be lost on a 304, so render those pages
+        if not object_id or len(get_messages(request)):
+            return None
+        versions = _versions(role, object_id, stamp).first()
+        if versions is None:
+            return None
+        return _etag(request, role, object_id, versions)
+    return etag_func
+
+
+def aprincipal_etag(role, stamp=None):
+    """principal_etag for async views (Django's condition() only takes sync ETag functions)"""
+    async def etag_func(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        # Loads the session, so the message storage below reads it from memory
+        object_id = await request.session.aget(SESSION_KEYS[role])
+        if not object_id or len(get_messages(request)):
+            return None
+        versions = await _versions(role, object_id, stamp).afirst()
+        if versions is None:
+            return None
+        return _etag(request, role, object_id, versions)
+    return etag_func
+
+
+def _revalidate(response):
+    if response.has_header('ETag'):
+        # Browsers may keep the page but must revalidate it on every visit
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(role, stamp=None):
+    """
+    Answer GET/HEAD with 304 Not Modified, before the view runs, while the
+    account row is unchanged. A page that also shows shared data passes
+    `stamp`, a callable returning an expression that changes with it.
+    Apply above @principal_required.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            etag_func = aprincipal_etag(role, stamp)
+
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                etag = await etag_func(request, *args, **kwargs)
+                etag = etag and quote_etag(etag)
+                response = get_conditional_response(request, etag=etag) if etag else None
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                    if etag and request.method in ('GET', 'HEAD') and not response.has_header('ETag'):
+                        response.headers['ETag'] = etag
+                return _revalidate(response)
+            return async_wrapper
+
+        conditional_view = condition(etag_func=principal_etag(role, stamp))(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            return _revalidate(conditional_view(request, *args, **kwargs))
+        return wrapper
+    return decorator
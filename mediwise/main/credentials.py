@@ -0,0 +1,172 @@
+import asyncio
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher, identify_hasher
+
+
+class CredentialPoolBusy(Exception):
+    """Raised when the hashing pool already has its maximum number of jobs queued"""
+
+
+class CredentialPoolTimeout(CredentialPoolBusy):
+    """Raised when a hashing job doesn't finish within CREDENTIAL_POOL_TIMEOUT"""
+
+
+class MediwisePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher whose cost factor comes from settings.CREDENTIAL_HASH_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'CREDENTIAL_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+# hashlib.pbkdf2_hmac releases the GIL, so a thread pool gives real parallelism
+# while keeping the request thread free of the CPU-heavy key derivation.
+_executor = None
+_slots = None
+_pool_lock = threading.Lock()
+
+
+def pool_workers():
+    return getattr(settings, 'CREDENTIAL_POOL_WORKERS', None) or os.cpu_count() or 1
+
+
+def _pool():
+    global _executor, _slots
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=pool_workers(), thread_name_prefix='credential-hash')
+            _slots = threading.BoundedSemaphore(getattr(settings, 'CREDENTIAL_POOL_MAX_QUEUE', 64))
+        return _executor, _slots
+
+
+def _submit(slots, executor, func, *args):
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _run(func, *args, wait=False):
+    executor, slots = _pool()
+    timeout = getattr(settings, 'CREDENTIAL_POOL_TIMEOUT', 10)
+    acquired = slots.acquire(timeout=timeout) if wait else slots.acquire(blocking=False)
+    if not acquired:
+        raise CredentialPoolBusy("Too many password hashing jobs in flight")
+    try:
+        return _submit(slots, executor, func, *args).result(timeout=timeout)
+    except TimeoutError:
+        raise CredentialPoolTimeout(f"Password hashing took longer than {timeout}s")
+
+
+async def _arun(func, *args, wait=False):
+    """_run for async callers: the event loop awaits the pool job instead of blocking on it"""
+    executor, slots = _pool()
+    timeout = getattr(settings, 'CREDENTIAL_POOL_TIMEOUT', 10)
+    acquired = slots.acquire(blocking=False)
+    if not acquired and wait:
+        acquired = await sync_to_async(slots.acquire, thread_sensitive=False)(timeout=timeout)
+    if not acquired:
+        raise CredentialPoolBusy("Too many password hashing jobs in flight")
+    future = _submit(slots, executor, func, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except TimeoutError:
+        raise CredentialPoolTimeout(f"Password hashing took longer than {timeout}s")
+
+
+def _encode(raw_password, iterations=None):
+    hasher = get_hasher('default')
+    if iterations is not None:
+        return hasher.encode(raw_password, hasher.salt(), iterations=iterations)
+    return hasher.encode(raw_password, hasher.salt())
+
+
+def _verify(raw_password, encoded):
+    hasher = identify_hasher(encoded)
+    is_correct = hasher.verify(raw_password, encoded)
+    preferred = get_hasher('default')
+    must_update = is_correct and (
+        hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    )
+    return is_correct, must_update
+
+
+def is_password_hash(value):
+    try:
+        identify_hasher(value)
+    except ValueError:
+        return False
+    return True
+
+
+def hash_password(raw_password, iterations=None):
+    """Hash a password in the worker pool, waiting for a free slot if needed"""
+    return _run(_encode, raw_password, iterations, wait=True)
+
+
+def hash_passwords(raw_passwords, iterations=None):
+    """
+    Hash a batch of passwords across all pool workers. Meant for offline jobs
+    such as imports: it does not take queue slots, so don't call it from a view.
+    """
+    executor, _ = _pool()
+    return list(executor.map(_encode, raw_passwords, [iterations] * len(raw_passwords)))
+
+
+async def ahash_password(raw_password, iterations=None):
+    return await _arun(_encode, raw_password, iterations, wait=True)
+
+
+def verify_password(raw_password, stored):
+    """
+    Return (is_correct, must_update). Rows that still hold a plaintext
+    password are compared in constant time and always flagged for upgrade.
+    Raises CredentialPoolBusy instead of queueing when the pool is saturated.
+    """
+    if raw_password is None or not stored:
+        return False, False
+    if is_password_hash(stored):
+        return _run(_verify, raw_password, stored)
+    is_correct = hmac.compare_digest(stored.encode(), raw_password.encode())
+    return is_correct, is_correct
+
+
+def check_account_password(account, raw_password):
+    """Verify an account's password and re-hash legacy or outdated rows in place"""
+    is_correct, must_update = verify_password(raw_password, account.password)
+    if is_correct and must_update:
+        account.password = hash_password(raw_password)
+        type(account).objects.filter(pk=account.pk).update(password=account.password)
+        # update() skips post_save, so drop the cached principal explicitly
+        from .principal import invalidate_principal
+        invalidate_principal(account)
+    return is_correct
+
+
+async def averify_password(raw_password, stored):
+    if raw_password is None or not stored:
+        return False, False
+    if is_password_hash(stored):
+        return await _arun(_verify, raw_password, stored)
+    is_correct = hmac.compare_digest(stored.encode(), raw_password.encode())
+    return is_correct, is_correct
+
+
+async def acheck_account_password(account, raw_password):
+    """check_account_password for async views"""
+    is_correct, must_update = await averify_password(raw_password, account.password)
+    if is_correct and must_update:
+        account.password = await ahash_password(raw_password)
+        await type(account).objects.filter(pk=account.pk).aupdate(password=account.password)
+        from .principal import invalidate_principal
+        invalidate_principal(account)
+    return is_correct
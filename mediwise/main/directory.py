@@ -0,0 +1,64 @@
+import base64
+from datetime import date
+
+from django.db.models import Q
+
+from .models import Doctor
+from .search import search
+
+PAGE_SIZE = 24
+
+# Only what a directory card shows; description and address stay on disk
+CARD_FIELDS = (
+    'id', 'first_name', 'last_name', 'email', 'phone_number',
+    'speciality', 'qualification', 'cureentHospital', 'profile_picture', 'registration_date',
+    'profile_completeness', 'picture_renditions',
+)
+
+
+def encode_cursor(doctor):
+    raw = f"{doctor.registration_date.isoformat()}|{doctor.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (registration_date, id) for a cursor, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, pk = raw.split('|')
+        return date.fromisoformat(day), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def doctor_page(speciality=None, hospital=None, cursor=None, page_size=PAGE_SIZE, incomplete=False):
+    """
+    One page of the doctor directory, newest first, continuing after `cursor`.
+    Seeks on the (registration_date, id) indexes so every page costs the same
+    no matter how deep it is; `incomplete` keeps only doctors with profile
+    fields missing, from the partial index holding just those. Returns
+    (doctors, next_cursor).
+    """
+    qs = Doctor.objects.only(*CARD_FIELDS).order_by('-registration_date', '-id')
+    if incomplete:
+        qs = qs.filter(profile_missing__gt=0)
+    if speciality:
+        qs = qs.filter(speciality=speciality)
+    if hospital:
+        qs = qs.filter(cureentHospital=hospital)
+    if cursor:
+        day, pk = cursor
+        qs = qs.filter(Q(registration_date__lt=day) | Q(registration_date=day, id__lt=pk))
+
+    doctors = list(qs[:page_size + 1])
+    next_cursor = encode_cursor(doctors[page_size - 1]) if len(doctors) > page_size else None
+    return doctors[:page_size], next_cursor
+
+
+def doctor_search_results(text, limit=PAGE_SIZE):
+    """Doctors matching a full-text query, best match first"""
+    ids = [hit['id'] for hit in search(text, role='doctor', limit=limit)]
+    found = Doctor.objects.only(*CARD_FIELDS).in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import zlib
+
+from .models import Doctor, Patient, Pharmacist
+
+EXPORT_MODELS = {'patient': Patient, 'doctor': Doctor, 'pharmacist': Pharmacist}
+
+# Everything except passwords and the internal Users link
+EXPORT_FIELDS = {
+    'patient': (
+        'id', 'first_name', 'last_name', 'email', 'gender', 'date_of_birth', 'blood_group',
+        'phone_number', 'height', 'weight', 'address', 'registration_date',
+    ),
+    'doctor': (
+        'id', 'first_name', 'last_name', 'email', 'phone_number', 'license_number', 'speciality',
+        'qualification', 'cureentHospital', 'address', 'description', 'registration_date',
+    ),
+    'pharmacist': (
+        'id', 'first_name', 'last_name', 'email', 'phone_number', 'license_number', 'address',
+        'registration_date',
+    ),
+}
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+CHUNK_SIZE = 2000
+# Rows encoded per yielded chunk: big enough to keep the per-chunk overhead low
+ROWS_PER_WRITE = 500
+
+
+def export_rows(role, chunk_size=CHUNK_SIZE):
+    """Tuples for every row of a role, fetched chunk by chunk (server-side cursor where supported)"""
+    fields = EXPORT_FIELDS[role]
+    return EXPORT_MODELS[role].objects.order_by('pk').values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def _batches(rows, size=ROWS_PER_WRITE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(role, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out before the query runs, so the first byte doesn't wait on the database
+    writer.writerow(EXPORT_FIELDS[role])
+    yield buffer.getvalue().encode()
+    for batch in _batches(export_rows(role, chunk_size)):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+
+
+def jsonl_chunks(role, chunk_size=CHUNK_SIZE):
+    fields = EXPORT_FIELDS[role]
+    for batch in _batches(export_rows(role, chunk_size)):
+        lines = (json.dumps(dict(zip(fields, row)), default=str) for row in batch)
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_chunks(chunks):
+    """Compress a byte stream on the fly, flushing after every chunk so the client never stalls"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(role, fmt, compress=False, chunk_size=CHUNK_SIZE):
+    chunks = csv_chunks(role, chunk_size) if fmt == 'csv' else jsonl_chunks(role, chunk_size)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(role, fmt, compress=False):
+    return f"{role}s.{fmt}{'.gz' if compress else ''}"
@@ -1,5 +1,9 @@
 from django import forms
 from . models import Patient, Pharmacist, Doctor
+from .credentials import hash_password
+from .images import process_profile_picture
+from .tasks import enqueue
+from .vitals import record_profile_vitals
 
 class PatientRegistrationForm(forms.ModelForm):
     """
@@ -64,8 +68,8 @@ class PatientRegistrationForm(forms.ModelForm):
     def save(self, commit=True):
         """Save the patient instance with the password properly stored"""
         patient = super().save(commit=False)
-        # Store the password directly since the Patient model doesn't use Django's built-in password hashing
-        patient.password = self.cleaned_data['password']
+        # The Patient model doesn't use Django's auth User, so hash the password ourselves
+        patient.password = hash_password(self.cleaned_data['password'])
         
         if commit:
             patient.save()
@@ -90,11 +94,17 @@ class PatientProfileUpdateForm(forms.ModelForm):
         max_length=10,
         widget=forms.TextInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'})
     )
+    password = forms.CharField(
+        required=False,
+        widget=forms.PasswordInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'}),
+        help_text="Leave blank to keep current password."
+    )
 
     class Meta:
         model = Patient
         # Include EVERY field you want the user to be able to edit
-        fields = ['first_name', 'last_name', 'email', 'gender', 'phone_number', 'address', 'date_of_birth', 'blood_group', 'height', 'weight', 'password']
+        # Password is handled separately so a blank field keeps the stored hash
+        fields = ['first_name', 'last_name', 'email', 'gender', 'phone_number', 'address', 'date_of_birth', 'blood_group', 'height', 'weight']
         
         widgets = {
             'first_name': forms.TextInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'}),
@@ -106,9 +116,19 @@ class PatientProfileUpdateForm(forms.ModelForm):
             'blood_group': forms.Select(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'}),
             'height': forms.TextInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'}),
             'weight': forms.TextInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'}),
-            'password': forms.PasswordInput(attrs={'class': 'w-full px-4 py-3 pl-12 rounded-xl border border-rose-100 focus:outline-none focus:ring-2 focus:ring-rose-300 bg-white/50'})
         }
 
+    def save(self, commit=True):
+        patient = super().save(commit=False)
+        password = self.cleaned_data.get('password')
+        if password:
+            patient.password = hash_password(password)
+        if commit:
+            patient.save()
+            if 'height' in self.changed_data or 'weight' in self.changed_data:
+                record_profile_vitals(patient)
+        return patient
+
 class PharmacistRegistrationForm(forms.ModelForm):
     """
     Form for initial pharmacist registration with essential fields
@@ -192,8 +212,8 @@ class PharmacistRegistrationForm(forms.ModelForm):
     def save(self, commit=True):
         """Save the pharmacist instance with the password properly stored"""
         pharmacist = super().save(commit=False)
-        # Store the password directly since the Pharmacist model doesn't use Django's built-in password hashing
-        pharmacist.password = self.cleaned_data['password']
+        # The Pharmacist model doesn't use Django's auth User, so hash the password ourselves
+        pharmacist.password = hash_password(self.cleaned_data['password'])
         
         if commit:
             pharmacist.save()
@@ -254,7 +274,7 @@ class DoctorRegistrationForm(forms.ModelForm):
         
         # If new doctor or password provided, update it
         if password:
-            doctor.password = password
+            doctor.password = hash_password(password)
         # If editing and no password provided, it keeps the old one automatically 
         # (because we removed it from Meta.fields, super().save() won't touch it)
         
@@ -293,7 +313,7 @@ class PharmacistProfileUpdateForm(forms.ModelForm):
         pharmacist = super().save(commit=False)
         password = self.cleaned_data.get('password')
         if password:
-            pharmacist.password = password
+            pharmacist.password = hash_password(password)
         if commit:
             pharmacist.save()
         return pharmacist
@@ -334,54 +354,16 @@ class DoctorProfileUpdateForm(forms.ModelForm):
     def save(self, commit=True):
         doctor = super().save(commit=False)
         password = self.cleaned_data.get('password')
-        
-        # Get the original profile picture from database
-        try:
-            original_doctor = Doctor.objects.get(pk=doctor.pk) if doctor.pk else None
-            original_profile_picture = getattr(original_doctor, 'profile_picture', None) if original_doctor else None
-        except:
-            original_profile_picture = None
-        
-        new_profile_picture = self.cleaned_data.get('profile_picture')
-        
-        print(f"=== PROFILE PICTURE DELETION DEBUG ===")
-        print(f"Original profile picture: {bool(original_profile_picture)}")
-        print(f"New profile picture: {bool(new_profile_picture)}")
-        
-        # Always delete old image when profile_picture field is in form data
-        # This covers both new uploads and clearing the field
-        if 'profile_picture' in self.files or 'profile_picture-clear' in self.data:
-            if original_profile_picture:
-                try:
-                    import os
-                    old_image_path = original_profile_picture.path
-                    print(f"Attempting to delete old image: {old_image_path}")
-                    
-                    if os.path.isfile(old_image_path):
-                        os.remove(old_image_path)
-                        print(f"Successfully deleted old profile picture: {old_image_path}")
-                    else:
-                        print(f"Old profile picture file not found: {old_image_path}")
-                except Exception as e:
-                    print(f"Error deleting old profile picture: {e}")
-                    # Continue saving even if deletion fails
-            else:
-                print("No original profile picture to delete")
-        else:
-            print("Profile picture field not in form data - no deletion needed")
-        
         if password:
-            doctor.password = password
+            doctor.password = hash_password(password)
         
         if commit:
-            # Save the doctor instance
             doctor.save()
             
-            # Verify the change was saved
-            print(f"Doctor profile picture after save: {bool(doctor.profile_picture)}")
-            if doctor.profile_picture:
-                print(f"New image path: {doctor.profile_picture.path}")
-            print("=== END PROFILE PICTURE DELETION DEBUG ===")
+            # The replaced picture is only dereferenced here (see the Doctor signals);
+            # gc_media deletes unreferenced files outside the request.
+            # Thumbnails are generated off the request thread once the row is committed.
+            if 'profile_picture' in self.files and doctor.profile_picture:
+                enqueue(process_profile_picture, doctor.profile_picture.name)
                 
         return doctor
-
@@ -0,0 +1,31 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .identity import ROLE_FOR_MODEL
+
+# Each account's cached dashboard fragments are keyed by (role, id, version).
+# Saving or deleting the account stores a new random version, so its old
+# fragments are simply never read again (and expire after FRAGMENT_CACHE_TTL).
+
+
+def _version_key(role, object_id):
+    return f"principal-version:{role}:{object_id}"
+
+
+def principal_version(role, object_id):
+    # A random first version means a cache flush can never bring back an old key
+    return cache.get_or_set(_version_key(role, object_id), lambda: uuid.uuid4().hex, timeout=None)
+
+
+def bump_principal_version(instance):
+    cache.set(_version_key(ROLE_FOR_MODEL[type(instance)], instance.pk), uuid.uuid4().hex, timeout=None)
+
+
+def fragment_context(role, principal):
+    """Context for {% cache fragment_ttl <name> fragment_key %} blocks in a dashboard"""
+    return {
+        'fragment_ttl': getattr(settings, 'FRAGMENT_CACHE_TTL', 600),
+        'fragment_key': f"{role}:{principal.pk}:{principal_version(role, principal.pk)}",
+    }
@@ -0,0 +1,83 @@
+from .models import MediAdmin, Patient, Pharmacist, Doctor, LoginIdentity
+
+# Order matters: when the same email exists under several roles, the first
+# role whose password matches wins (same precedence the old four-table probe had)
+LOGIN_MODELS = {
+    'admin': MediAdmin,
+    'patient': Patient,
+    'pharmacist': Pharmacist,
+    'doctor': Doctor,
+}
+
+ROLE_FOR_MODEL = {model: role for role, model in LOGIN_MODELS.items()}
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def sync_identity(instance):
+    """Create, update or drop the identity row for a saved account"""
+    role = ROLE_FOR_MODEL[type(instance)]
+    email = normalize_email(instance.email)
+    if not email:
+        remove_identity(instance)
+        return
+    LoginIdentity.objects.update_or_create(
+        role=role, object_id=instance.pk, defaults={'email': email}
+    )
+
+
+def remove_identity(instance):
+    role = ROLE_FOR_MODEL[type(instance)]
+    LoginIdentity.objects.filter(role=role, object_id=instance.pk).delete()
+
+
+def bulk_sync_identities(instances, batch_size=1000):
+    """Identity rows for objects created with bulk_create (which skips signals)"""
+    rows = [
+        LoginIdentity(
+            email=normalize_email(obj.email),
+            role=ROLE_FOR_MODEL[type(obj)],
+            object_id=obj.pk,
+        )
+        for obj in instances
+        if normalize_email(obj.email)
+    ]
+    LoginIdentity.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+
+
+def rebuild_identities(batch_size=1000):
+    """Recreate the whole identity table from the four account tables"""
+    LoginIdentity.objects.all().delete()
+    for model in LOGIN_MODELS.values():
+        batch = []
+        for obj in model.objects.only('id', 'email').iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                bulk_sync_identities(batch, batch_size)
+                batch = []
+        bulk_sync_identities(batch, batch_size)
+
+
+def find_accounts(email):
+    """
+    Return (role, object_id) candidates for an email in login precedence,
+    using a single indexed query on the identity table
+    """
+    email = normalize_email(email)
+    if not email:
+        return []
+    candidates = LoginIdentity.objects.filter(email=email).values_list('role', 'object_id')
+    precedence = list(LOGIN_MODELS)
+    return sorted(candidates, key=lambda c: precedence.index(c[0]))
+
+
+async def afind_accounts(email):
+    """find_accounts for async views"""
+    email = normalize_email(email)
+    if not email:
+        return []
+    candidates = [c async for c in LoginIdentity.objects.filter(email=email).values_list('role', 'object_id')]
+    precedence = list(LOGIN_MODELS)
+    return sorted(candidates, key=lambda c: precedence.index(c[0]))
@@ -0,0 +1,144 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from .models import Doctor
+
+# name -> square size in pixels
+RENDITIONS = {
+    'thumb': 96,    # directory cards, navbar
+    'avatar': 256,  # dashboard and profile header
+}
+
+RENDITION_DIR = 'profile_pictures/renditions'
+
+# Originals we know how to re-encode when they are larger than PROFILE_PICTURE_MAX_SIDE
+ORIGINAL_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.webp': 'WEBP'}
+
+
+def rendition_format():
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def rendition_name(name, rendition):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    extension = 'webp' if rendition_format() == 'WEBP' else 'jpg'
+    return f"{RENDITION_DIR}/{stem}_{rendition}.{extension}"
+
+
+def rendition_url(image_field, rendition):
+    """
+    URL of a rendition once the worker has written them (the owner's
+    picture_renditions flag), otherwise of the original upload
+    """
+    if not image_field:
+        return ''
+    if getattr(image_field.instance, 'picture_renditions', False):
+        return default_storage.url(rendition_name(image_field.name, rendition))
+    return image_field.url
+
+
+def _encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    elif image_format == 'PNG':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, image_format, quality=80, method=4)
+    return buffer.getvalue()
+
+
+def _flatten(image):
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    return image
+
+
+def _oversized(name, image):
+    max_side = getattr(settings, 'PROFILE_PICTURE_MAX_SIDE', 1024)
+    return os.path.splitext(name)[1].lower() in ORIGINAL_FORMATS and max(image.size) > max_side
+
+
+def _shrink(name, image):
+    """An oversized original re-encoded to fit PROFILE_PICTURE_MAX_SIDE"""
+    max_side = getattr(settings, 'PROFILE_PICTURE_MAX_SIDE', 1024)
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return _encode(image, ORIGINAL_FORMATS[os.path.splitext(name)[1].lower()])
+
+
+@transaction.atomic
+def _replace_original(name, data):
+    """
+    Store shrunk bytes under their own content-addressed name and move the
+    doctors still on `name` over to it; the old blob is left to gc_media.
+    Returns the new name, or None when nobody uses the picture any more.
+    """
+    doctors = list(Doctor.objects.select_for_update().filter(profile_picture=name))
+    if not doctors:
+        return None
+    doctors[0].profile_picture.save(os.path.basename(name), ContentFile(data), save=False)
+    new_name = doctors[0].profile_picture.name
+    for doctor in doctors:
+        doctor.profile_picture.name = new_name
+        doctor.save(update_fields=['profile_picture', 'picture_renditions', 'updated_at'])
+    return new_name
+
+
+def _replace(name, data):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def renditions_exist(name):
+    return all(default_storage.exists(rendition_name(name, rendition)) for rendition in RENDITIONS)
+
+
+def process_profile_picture(name, force=False):
+    """
+    Shrink an oversized original, write the fixed-size renditions, then flag
+    the picture's doctors as having them. Runs on the background worker, so
+    the upload request only streams the file to disk.
+    """
+    if not name or not default_storage.exists(name):
+        return
+    with default_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        shrink = _oversized(name, image)
+        # Content-addressed names: a re-upload of the same bytes already has its renditions
+        render = force or shrink or not renditions_exist(name)
+        if render:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    if render:
+        image = _flatten(image)
+    if shrink:
+        # Never rewritten in place: the smaller picture is stored under its own name
+        name = _replace_original(name, _shrink(name, image))
+        if name is None:
+            return
+    if render:
+        image_format = rendition_format()
+        for rendition, size in RENDITIONS.items():
+            thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            _replace(rendition_name(name, rendition), _encode(thumbnail, image_format))
+
+    # Saved (not updated) so the principal cache, fragments and ETags see the change
+    for doctor in Doctor.objects.filter(profile_picture=name, picture_renditions=False):
+        doctor.picture_renditions = True
+        doctor.save(update_fields=['picture_renditions', 'updated_at'])
+
+
+def delete_renditions(name):
+    for rendition in RENDITIONS:
+        rendition_file = rendition_name(name, rendition)
+        if default_storage.exists(rendition_file):
+            default_storage.delete(rendition_file)
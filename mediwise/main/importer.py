@@ -0,0 +1,178 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from .credentials import hash_passwords, is_password_hash
+from .forms import DoctorRegistrationForm, PatientRegistrationForm, PharmacistRegistrationForm
+from .identity import bulk_sync_identities
+from .models import Users, update_profile_completeness
+from .search import index_batch, search_enabled
+
+IMPORT_FORMS = {
+    'patient': PatientRegistrationForm,
+    'pharmacist': PharmacistRegistrationForm,
+    'doctor': DoctorRegistrationForm,
+}
+
+# Checked once per chunk with an __in query instead of once per row
+UNIQUE_FIELDS = {
+    'patient': ('email',),
+    'pharmacist': ('email', 'license_number'),
+    'doctor': ('email',),
+}
+
+
+def _import_form(form_class):
+    """The registration form minus its per-row uniqueness queries"""
+
+    class ImportForm(form_class):
+        def clean_email(self):
+            return self.cleaned_data.get('email')
+
+        def clean_license_number(self):
+            return self.cleaned_data.get('license_number')
+
+        def validate_unique(self):
+            pass
+
+    ImportForm.__name__ = f"Import{form_class.__name__}"
+    return ImportForm
+
+
+IMPORT_FORM_CLASSES = {role: _import_form(form) for role, form in IMPORT_FORMS.items()}
+
+
+class RowError:
+    def __init__(self, line, field, message):
+        self.line = line
+        self.field = field
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}: {self.field}: {self.message}"
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, dict) pairs one at a time from a CSV or JSONL stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            row = exc
+        yield line_number, row
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(role, rows):
+    """
+    Run the registration form rules over a chunk of rows. Returns
+    (valid, errors) where valid holds (line, form) pairs.
+    """
+    form_class = IMPORT_FORM_CLASSES[role]
+    model = form_class._meta.model
+    valid, errors = [], []
+    for line, row in rows:
+        form = form_class({key: value for key, value in row.items() if key != 'role'})
+        if form.is_valid():
+            valid.append((line, form))
+        else:
+            for field, messages in form.errors.items():
+                errors.extend(RowError(line, field, message) for message in messages)
+
+    for field in UNIQUE_FIELDS[role]:
+        values = {form.cleaned_data[field] for _, form in valid if form.cleaned_data.get(field)}
+        taken = set(model.objects.filter(**{f"{field}__in": values}).values_list(field, flat=True))
+        seen = set()
+        kept = []
+        for line, form in valid:
+            value = form.cleaned_data.get(field)
+            if value in taken:
+                errors.append(RowError(line, field, f"A {role} with this {field.replace('_', ' ')} already exists."))
+            elif value and value in seen:
+                errors.append(RowError(line, field, f"Duplicate {field.replace('_', ' ')} earlier in the file."))
+            else:
+                seen.add(value)
+                kept.append((line, form))
+        valid = kept
+    return valid, errors
+
+
+@transaction.atomic
+def insert_chunk(role, forms):
+    """Create the Users rows and the profiles for a chunk of validated forms"""
+    raw = [form.cleaned_data['password'] for form in forms]
+    pending = [index for index, password in enumerate(raw) if not is_password_hash(password)]
+    hashed = hash_passwords([raw[index] for index in pending])
+    for index, encoded in zip(pending, hashed):
+        raw[index] = encoded
+
+    # Users ids come back from the bulk insert, so the profiles can point at them directly
+    users = Users.objects.bulk_create([Users(role=role) for _ in forms])
+    profiles = []
+    for form, user, password in zip(forms, users, raw):
+        profile = form.instance
+        profile.user = user
+        profile.password = password
+        if hasattr(profile, 'PROFILE_FIELDS'):
+            # bulk_create doesn't call save(), which keeps these current
+            update_profile_completeness(profile)
+        profiles.append(profile)
+    model = IMPORT_FORMS[role]._meta.model
+    model.objects.bulk_create(profiles)
+
+    # bulk_create skips the post_save signals that keep these in sync
+    bulk_sync_identities(profiles)
+    if search_enabled():
+        index_batch(profiles)
+    return profiles
+
+
+def import_people(stream, fmt, role=None, batch_size=1000, dry_run=False, on_error=None):
+    """
+    Stream rows from `stream`, validating and inserting `batch_size` at a
+    time. Each row's role comes from `role` or its own "role" column.
+    Returns (imported, failed) counts; errors go to on_error as they are found.
+    """
+    imported = failed = 0
+    for chunk in chunked(read_rows(stream, fmt), batch_size):
+        by_role = {}
+        for line, row in chunk:
+            row_role = role or (row.get('role') if isinstance(row, dict) else None)
+            if not isinstance(row, dict):
+                error = RowError(line, 'row', str(row) if isinstance(row, Exception) else "Expected a JSON object")
+            elif row_role not in IMPORT_FORMS:
+                error = RowError(line, 'role', f"Unknown role {row_role!r}")
+            else:
+                by_role.setdefault(row_role, []).append((line, row))
+                continue
+            failed += 1
+            if on_error:
+                on_error(error)
+
+        for row_role, rows in by_role.items():
+            valid, errors = validate_chunk(row_role, rows)
+            failed += len({error.line for error in errors})
+            if on_error:
+                for error in errors:
+                    on_error(error)
+            if valid and not dry_run:
+                insert_chunk(row_role, [form for _, form in valid])
+            imported += len(valid)
+    return imported, failed
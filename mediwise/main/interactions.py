@@ -0,0 +1,107 @@
+import threading
+from collections import namedtuple
+
+from .models import DrugInteraction
+from .versions import bump_version, current_version
+
+# The interaction table is loaded once per process into one bitset (a Python
+# int) per medication over dense medication positions, and reloaded only when
+# its version (main.versions) changes. Checking N medications against M
+# others is then N ANDs of M-bit integers; the table is only consulted again
+# for the pairs that actually interact.
+
+SEVERITY_ORDER = {'minor': 0, 'moderate': 1, 'major': 2}
+
+_VERSION_NAME = 'drug-interactions'
+
+Interaction = namedtuple('Interaction', 'medication_a medication_b severity description')
+
+
+def interactions_version():
+    return current_version(_VERSION_NAME)
+
+
+def bump_interactions_version():
+    bump_version(_VERSION_NAME)
+
+
+class InteractionMatrix:
+    """Symmetric interaction adjacency over medication ids, as bitsets"""
+
+    def __init__(self, rows):
+        self.positions = {}
+        self.ids = []
+        self.bits = []
+        self.details = {}
+        for medication_a, medication_b, severity, description in rows:
+            a, b = self._position(medication_a), self._position(medication_b)
+            self.bits[a] |= 1 << b
+            self.bits[b] |= 1 << a
+            self.details[(medication_a, medication_b)] = (severity, description)
+
+    def _position(self, medication_id):
+        position = self.positions.get(medication_id)
+        if position is None:
+            position = self.positions[medication_id] = len(self.ids)
+            self.ids.append(medication_id)
+            self.bits.append(0)
+        return position
+
+    def mask(self, medication_ids):
+        """Bitset of the given medications; ones that interact with nothing are left out"""
+        mask = 0
+        for medication_id in medication_ids:
+            position = self.positions.get(medication_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def _members(self, mask):
+        while mask:
+            low = mask & -mask
+            yield self.ids[low.bit_length() - 1]
+            mask ^= low
+
+    def check(self, medication_ids, against_ids=()):
+        """
+        Interactions among `medication_ids` and between them and `against_ids`
+        (a patient's current medications), most severe first
+        """
+        against = self.mask(against_ids)
+        remaining = self.mask(medication_ids)
+        pairs = set()
+        for medication_id in dict.fromkeys(medication_ids):
+            position = self.positions.get(medication_id)
+            if position is None:
+                continue
+            # Each new pair once: only against the new medications not yet visited
+            remaining &= ~(1 << position)
+            hits = self.bits[position] & (against | remaining)
+            for other in self._members(hits):
+                pairs.add((min(medication_id, other), max(medication_id, other)))
+        found = [Interaction(a, b, *self.details[(a, b)]) for a, b in pairs]
+        found.sort(key=lambda hit: (-SEVERITY_ORDER[hit.severity], hit.medication_a, hit.medication_b))
+        return found
+
+
+# (version, matrix), for this process only
+_matrix = None
+_matrix_lock = threading.Lock()
+
+
+def interaction_matrix():
+    global _matrix
+    version = interactions_version()
+    cached = _matrix
+    if cached and cached[0] == version:
+        return cached[1]
+    matrix = InteractionMatrix(
+        DrugInteraction.objects.values_list('medication_a_id', 'medication_b_id', 'severity', 'description').iterator()
+    )
+    with _matrix_lock:
+        _matrix = (version, matrix)
+    return matrix
+
+
+def check_interactions(medication_ids, against_ids=()):
+    return interaction_matrix().check(medication_ids, against_ids)
@@ -0,0 +1,121 @@
+import asyncio
+import io
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .bench import summarize
+
+# In-process drivers for the two entry points: requests go straight into the
+# ASGI or WSGI callable, so the numbers measure the Django side of a single
+# worker process without a server or network in between.
+
+
+def _header_list(headers):
+    return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+
+
+async def asgi_request(application, method, path, headers, body=b''):
+    """Send one request through an ASGI application and return the response status"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'headers': _header_list(headers),
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    received = False
+    status = None
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The client never disconnects; Django cancels this once it has responded
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def wsgi_request(application, method, path, headers, body=b''):
+    """Send one request through a WSGI application and return the response status"""
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1', 'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in headers.items():
+        key = name.upper().replace('-', '_')
+        environ[key if key in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{key}'] = value
+    status = []
+
+    def start_response(line, response_headers, exc_info=None):
+        status.append(int(line.split()[0]))
+
+    result = application(environ, start_response)
+    try:
+        for _ in result:
+            pass
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return status[0]
+
+
+def run_asgi(application, requests, concurrency):
+    """
+    Drive `requests` ((method, path, headers, body) tuples) through the ASGI
+    application on one event loop with at most `concurrency` in flight.
+    Returns (requests per second, latency summary, status counts).
+    """
+    async def main():
+        gate = asyncio.Semaphore(concurrency)
+        samples, statuses = [], {}
+
+        async def one(request):
+            async with gate:
+                start = time.perf_counter()
+                status = await asgi_request(application, *request)
+                samples.append((time.perf_counter() - start) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(request) for request in requests))
+        return len(requests) / (time.perf_counter() - start), summarize(samples), statuses
+
+    return asyncio.run(main())
+
+
+def run_wsgi(application, requests, concurrency, threads):
+    """
+    The same load against the WSGI application: `concurrency` clients feed a
+    worker that handles `threads` requests at a time (1 = a sync worker,
+    more = a threaded one). Latency includes the time a request queues.
+    """
+    samples, statuses = [], {}
+
+    def one(request, queued_at):
+        status = wsgi_request(application, *request)
+        samples.append((time.perf_counter() - queued_at) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as worker:
+        # Clients keep `concurrency` requests outstanding; the rest wait client side
+        pending = deque()
+        for request in requests:
+            if len(pending) >= concurrency:
+                pending.popleft().result()
+            pending.append(worker.submit(one, request, time.perf_counter()))
+        for future in pending:
+            future.result()
+    return len(requests) / (time.perf_counter() - start), summarize(samples), statuses
@@ -0,0 +1,88 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.middleware.csrf import _get_new_csrf_string
+from django.test import override_settings
+from django.urls import reverse
+
+from main.credentials import hash_password
+from main.loadtest import run_asgi, run_wsgi
+from main.models import Patient, Users
+from main.principal import SESSION_KEYS
+
+BENCH_EMAIL = 'bench-asgi@bench.mediwise'
+BENCH_PASSWORD = 'bench-password'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one ASGI worker (native async views) with one WSGI worker on login "
+        "and dashboard traffic at several client concurrencies"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', default='1,10,50', help="Comma separated in-flight request counts")
+        parser.add_argument('--threads', type=int, default=1,
+                            help="Requests the WSGI worker handles at once (1 = sync worker)")
+        parser.add_argument('--scenarios', default='login,dashboard')
+        parser.add_argument('--iterations', type=int, default=100_000,
+                            help="PBKDF2 iterations for the bench account (production uses CREDENTIAL_HASH_ITERATIONS)")
+
+    def handle(self, *args, **options):
+        # Import here: mediwise.asgi builds its handler at import time
+        from mediwise.asgi import application as asgi_application
+        wsgi_application = get_wsgi_application()
+
+        # The async ORM runs queries on another thread, so the bench data has
+        # to be committed rather than wrapped in scratch_data(); it is deleted afterwards
+        with override_settings(CREDENTIAL_HASH_ITERATIONS=options['iterations'], ALLOWED_HOSTS=['localhost']):
+            patient = self._account(options['iterations'])
+            session = SessionStore()
+            session[SESSION_KEYS['patient']] = patient.pk
+            session.create()
+            try:
+                scenarios = self._scenarios(session.session_key)
+                self.stdout.write(f"{'scenario':<12}{'clients':>8}{'entry':>6}{'req/s':>10}{'p50':>10}{'p99':>10}  statuses")
+                for name in options['scenarios'].split(','):
+                    requests = [scenarios[name]] * options['requests']
+                    for concurrency in (int(c) for c in options['concurrency'].split(',')):
+                        results = (
+                            ('asgi', run_asgi(asgi_application, requests, concurrency)),
+                            ('wsgi', run_wsgi(wsgi_application, requests, concurrency, options['threads'])),
+                        )
+                        for entry, (rps, stats, statuses) in results:
+                            self.stdout.write(
+                                f"{name:<12}{concurrency:>8}{entry:>6}{rps:>10.1f}"
+                                f"{stats['p50_ms']:>8.1f}ms{stats['p99_ms']:>8.1f}ms  {statuses}"
+                            )
+            finally:
+                session.delete()
+                Users.objects.filter(pk=patient.user_id).delete()
+                patient.delete()
+
+    def _account(self, iterations):
+        Patient.objects.filter(email=BENCH_EMAIL).delete()
+        return Patient.objects.create(
+            user=Users.objects.create(role='patient'), first_name='Bench', last_name='Asgi',
+            password=hash_password(BENCH_PASSWORD, iterations), email=BENCH_EMAIL, gender='female',
+        )
+
+    def _scenarios(self, session_key):
+        # An unmasked CSRF secret is accepted both as the cookie and as the form field
+        csrf = _get_new_csrf_string()
+        login_body = urlencode({'email': BENCH_EMAIL, 'password': BENCH_PASSWORD, 'csrfmiddlewaretoken': csrf}).encode()
+        return {
+            'login': ('POST', reverse('login'), {
+                'Host': 'localhost',
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'Cookie': f"{settings.CSRF_COOKIE_NAME}={csrf}",
+            }, login_body),
+            'dashboard': ('GET', reverse('patient_dashboard'), {
+                'Host': 'localhost',
+                'Cookie': f"{settings.SESSION_COOKIE_NAME}={session_key}",
+            }, b''),
+        }
@@ -0,0 +1,68 @@
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from main.bench import scratch_data
+from main.models import Doctor, MediAdmin, Patient, Pharmacist, Users
+from main.principal import SESSION_KEYS
+
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = "Requests per second for each role dashboard with and without fragment caching (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with scratch_data():
+            accounts = self._accounts()
+            self.stdout.write(f"{'dashboard':<22}{'uncached':>12}{'cached':>12}{'speedup':>10}")
+            for role, (url, account) in accounts.items():
+                client = Client(HTTP_HOST='localhost')
+                session = client.session
+                session[SESSION_KEYS[role]] = account.pk
+                session.save()
+
+                # DummyCache never stores, so every {% cache %} block renders: the old behaviour
+                with override_settings(CACHES=DUMMY_CACHE):
+                    before = self._rps(client, url, count)
+                caches['default'].clear()
+                after = self._rps(client, url, count)
+                self.stdout.write(f"{role:<22}{before:>10.0f}/s{after:>10.0f}/s{after / before:>9.2f}x")
+
+    def _rps(self, client, url, count):
+        client.get(url)  # warm up (and fill the cache)
+        start = time.perf_counter()
+        for _ in range(count):
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+        return count / (time.perf_counter() - start)
+
+    def _accounts(self):
+        admin = MediAdmin.objects.create(email='bench-admin@bench.mediwise', password='x')
+        patient = Patient.objects.create(
+            user=Users.objects.create(role='patient'), first_name='Bench', last_name='Patient',
+            password='x', email='bench-patient@bench.mediwise', gender='female',
+        )
+        pharmacist = Pharmacist.objects.create(
+            user=Users.objects.create(role='pharmacist'), first_name='Bench', last_name='Pharmacist',
+            password='x', email='bench-pharmacist@bench.mediwise', license_number='BENCH-1',
+            phone_number='0', address='Bench',
+        )
+        doctor = Doctor.objects.create(
+            user=Users.objects.create(role='doctor'), first_name='Bench', last_name='Doctor',
+            password='x', email='bench-doctor@bench.mediwise', phone_number='0',
+            speciality='Cardiology', qualification='MD',
+        )
+        return {
+            'admin': (reverse('admin_dashboard'), admin),
+            'patient': (reverse('patient_dashboard'), patient),
+            'pharmacist': (reverse('pharmacist_dashboard'), pharmacist),
+            'doctor': (reverse('doctor_dashboard'), doctor),
+        }
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from main.bench import bench_email, summarize
+from main.models import Doctor, Patient
+
+SPECIALITIES = ['Cardiology', 'Dermatology', 'Neurology', 'Pediatrics', 'Orthopedics']
+
+# The settings before mediwise/database.py: rollback journal, a new
+# connection per request, deferred transactions
+BASELINE = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE'},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mixed read/write load on Patient and Doctor from concurrent threads, "
+        "comparing the old SQLite settings with the configured database profile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=2000, help="Operations per profile")
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--rows', type=int, default=2000, help="Patients and doctors to seed")
+
+    def handle(self, *args, **options):
+        default = connections['default'].settings_dict
+        profiles = {'configured': default}
+        if default['ENGINE'] == 'django.db.backends.sqlite3':
+            profiles = {'baseline': {**BASELINE, 'NAME': default['NAME']}, **profiles}
+
+        patient_ids, doctor_ids = self._seed(options['rows'])
+        try:
+            self.stdout.write(f"{'profile':<12}{'ops/s':>10}{'read p50':>11}{'read p99':>11}{'write p50':>11}{'write p99':>11}{'errors':>8}")
+            for name, config in profiles.items():
+                alias = self._register(name, config)
+                result = self._run(alias, patient_ids, doctor_ids, options)
+                self.stdout.write(
+                    f"{name:<12}{result['rate']:>10.0f}"
+                    f"{result['read']['p50_ms']:>9.2f}ms{result['read']['p99_ms']:>9.2f}ms"
+                    f"{result['write']['p50_ms']:>9.2f}ms{result['write']['p99_ms']:>9.2f}ms{result['errors']:>8}"
+                )
+        finally:
+            connections.close_all()
+            Patient.objects.filter(pk__in=patient_ids).delete()
+            Doctor.objects.filter(pk__in=doctor_ids).delete()
+
+    def _register(self, name, config):
+        """Add a connection alias for a profile (ConnectionHandler fills in the defaults)"""
+        alias = f"bench_{name}"
+        connections.close_all()
+        connections.settings[alias] = connections.configure_settings({'default': config, alias: config})[alias]
+        return alias
+
+    def _seed(self, rows):
+        patients = Patient.objects.bulk_create(
+            Patient(first_name=f"Patient{i}", last_name='Bench', password='x', gender='female',
+                    email=bench_email('dbpatient', i))
+            for i in range(rows)
+        )
+        doctors = Doctor.objects.bulk_create(
+            Doctor(first_name=f"Doctor{i}", last_name='Bench', password='x', phone_number='0',
+                   email=bench_email('dbdoctor', i), speciality=random.choice(SPECIALITIES), qualification='MD')
+            for i in range(rows)
+        )
+        return [p.pk for p in patients], [d.pk for d in doctors]
+
+    def _run(self, alias, patient_ids, doctor_ids, options):
+        reads, writes, errors = [], [], []
+        lock = threading.Lock()
+
+        def read():
+            Patient.objects.using(alias).filter(pk=random.choice(patient_ids)).first()
+            list(Doctor.objects.using(alias).filter(speciality=random.choice(SPECIALITIES))
+                 .order_by('-registration_date', '-id')[:24])
+
+        def write():
+            # Read-then-write like a profile form save; in a deferred transaction
+            # the upgrade to a write lock is where "database is locked" comes from
+            with transaction.atomic(using=alias):
+                patient = Patient.objects.using(alias).filter(pk=random.choice(patient_ids)).first()
+                Patient.objects.using(alias).filter(pk=patient.pk).update(weight=str(random.randint(40, 120)))
+                Doctor.objects.using(alias).filter(pk=random.choice(doctor_ids)).update(updated_at=timezone.now())
+
+        def operation(is_write):
+            start = time.perf_counter()
+            try:
+                (write if is_write else read)()
+            except OperationalError as exc:
+                with lock:
+                    errors.append(exc)
+            else:
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    (writes if is_write else reads).append(elapsed)
+            finally:
+                # What request_finished does: drop the connection unless it may be kept
+                connections[alias].close_if_unusable_or_obsolete()
+
+        plan = [random.random() < options['write_ratio'] for _ in range(options['operations'])]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            list(pool.map(operation, plan))
+        elapsed = time.perf_counter() - start
+        return {
+            'rate': len(plan) / elapsed,
+            'read': summarize(reads),
+            'write': summarize(writes),
+            'errors': len(errors),
+        }
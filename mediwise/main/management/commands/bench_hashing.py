@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from main.credentials import CredentialPoolBusy, hash_password, pool_workers, verify_password
+
+
+class Command(BaseCommand):
+    help = "Measure password verifications per second per core at several PBKDF2 cost settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--costs', default='100000,300000,600000,1000000',
+                            help="Comma separated PBKDF2 iteration counts")
+        parser.add_argument('--duration', type=float, default=3.0,
+                            help="Seconds to run each cost setting")
+        parser.add_argument('--clients', type=int, default=16,
+                            help="Concurrent request threads submitting logins")
+
+    def handle(self, *args, **options):
+        workers = pool_workers()
+        self.stdout.write(f"hashing pool workers={workers} clients={options['clients']}")
+
+        for cost in (int(c) for c in options['costs'].split(',')):
+            encoded = hash_password('correct horse battery', iterations=cost)
+            done, shed = self._run(encoded, options['duration'], options['clients'])
+            per_second = done / options['duration']
+            self.stdout.write(
+                f"iterations={cost:>8} logins/s={per_second:8.1f} "
+                f"logins/s/core={per_second / workers:7.1f} shed={shed}"
+            )
+
+    def _run(self, encoded, duration, clients):
+        deadline = time.perf_counter() + duration
+
+        def client():
+            done = shed = 0
+            while time.perf_counter() < deadline:
+                try:
+                    verify_password('correct horse battery', encoded)
+                    done += 1
+                except CredentialPoolBusy:
+                    shed += 1
+                    time.sleep(0.001)
+            return done, shed
+
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = list(pool.map(lambda _: client(), range(clients)))
+        return sum(r[0] for r in results), sum(r[1] for r in results)
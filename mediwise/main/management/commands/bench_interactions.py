@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.bench import scratch_data, summarize, time_calls
+from main.interactions import bump_interactions_version, check_interactions, interaction_matrix
+from main.models import DrugInteraction, Medication
+
+SEVERITIES = ['minor', 'moderate', 'major']
+
+
+class Command(BaseCommand):
+    help = "Interaction checks from the in-memory bitsets against a query per drug pair (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medications', type=int, default=5000)
+        parser.add_argument('--interactions', type=int, default=50000)
+        parser.add_argument('--prescribed', type=int, default=5, help="Medications on the new prescription")
+        parser.add_argument('--active', type=int, default=20, help="Medications the patient already takes")
+        parser.add_argument('--runs', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with scratch_data():
+            ids = self._seed(options['medications'], options['interactions'])
+            cases = [
+                (random.sample(ids, options['prescribed']), random.sample(ids, options['active']))
+                for _ in range(options['runs'])
+            ]
+            start = time.perf_counter()
+            matrix = interaction_matrix()
+            build = (time.perf_counter() - start) * 1000
+            self.stdout.write(
+                f"{len(matrix.ids)} medications with interactions, {len(matrix.details)} pairs, loaded in {build:.1f}ms"
+            )
+            self.stdout.write(f"{'check':<20}{'mean':>10}{'p50':>10}{'p99':>10}{'found':>8}")
+            # "found" is over the same first cases for both, as a cross-check
+            sample = cases[:20]
+            found = sum(len(check_interactions(new, active)) for new, active in sample)
+            self._report('bitsets', time_calls(check_interactions, cases), found)
+            found = sum(len(self._per_pair(new, active)) for new, active in sample)
+            self._report('query per pair', time_calls(self._per_pair, sample), found)
+        bump_interactions_version()  # the rolled-back table is still in this process's matrix
+
+    def _report(self, label, samples, found):
+        stats = summarize(samples)
+        self.stdout.write(f"{label:<20}{stats['mean_ms']:>8.3f}ms{stats['p50_ms']:>8.3f}ms{stats['p99_ms']:>8.3f}ms{found:>8}")
+
+    def _seed(self, count, interactions):
+        medications = Medication.objects.bulk_create(
+            Medication(name=f"Bench medication {i}", strength='10mg') for i in range(count)
+        )
+        ids = [medication.pk for medication in medications]
+        pairs = set()
+        while len(pairs) < interactions:
+            a, b = random.sample(ids, 2)
+            pairs.add((min(a, b), max(a, b)))
+        DrugInteraction.objects.bulk_create(
+            (DrugInteraction(medication_a_id=a, medication_b_id=b, severity=random.choice(SEVERITIES))
+             for a, b in pairs),
+            batch_size=5000,
+        )
+        bump_interactions_version()  # bulk_create sends no signals
+        return ids
+
+    def _per_pair(self, new, active):
+        """The naive check: one lookup for every pair"""
+        found = []
+        candidates = [(a, b) for i, a in enumerate(new) for b in new[i + 1:] + active]
+        for a, b in candidates:
+            interaction = DrugInteraction.objects.filter(
+                medication_a_id=min(a, b), medication_b_id=max(a, b),
+            ).first()
+            if interaction:
+                found.append(interaction)
+        return found
@@ -0,0 +1,35 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from main.bench import scratch_data, seed_patients, time_calls, summarize, bench_email
+from main.views import getUser
+
+
+class Command(BaseCommand):
+    help = "Measure login latency while the patient table grows (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help="Comma separated patient counts, e.g. 1000,100000,1000000")
+        parser.add_argument('--lookups', type=int, default=500)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        lookups = options['lookups']
+
+        with scratch_data():
+            seeded = 0
+            for size in sizes:
+                seed_patients(seeded, size)
+                seeded = size
+
+                picks = [random.randrange(seeded) for _ in range(lookups)]
+                calls = [(bench_email('patient', i), f"password{i}") for i in picks]
+                # Misses walk the same index, so include them as well
+                calls += [("nobody@bench.mediwise", "wrong")] * (lookups // 10)
+                stats = summarize(time_calls(getUser, calls))
+                self.stdout.write(
+                    f"patients={size:>9} mean={stats['mean_ms']:.3f}ms "
+                    f"p50={stats['p50_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms"
+                )
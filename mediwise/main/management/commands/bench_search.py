@@ -0,0 +1,71 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main.bench import scratch_data, summarize, time_calls
+from main.search import SEARCH_TABLE, make_rowid, search, search_enabled
+
+SYLLABLES = ['ka', 'ra', 'mi', 'lo', 'ne', 'sa', 'to', 'vi', 'da', 're', 'an', 'el', 'or', 'is', 'um',
+             'ba', 'che', 'li', 'mo', 'ta', 'jo', 'ha', 'pe', 'su', 'ri', 'go', 'na', 'fe', 'wi', 'zo']
+SPECIALITIES = ['Cardiology', 'Neurology', 'Oncology', 'Pediatrics', 'Dermatology', 'Orthopedics',
+                'Psychiatry', 'Radiology', 'Nephrology', 'Gastroenterology']
+HOSPITALS = ['City General', 'St Mary', 'Lakeside Clinic', 'Riverside Medical', 'Hilltop Hospital']
+
+
+def synthetic_name():
+    # Syllable names give a realistic spread of distinct terms and prefixes
+    return ''.join(random.choice(SYLLABLES) for _ in range(random.randint(2, 3))).capitalize()
+
+
+class Command(BaseCommand):
+    help = "Measure typeahead latency on a synthetic search index (data is rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--target-ms', type=float, default=10.0, help="p99 latency target")
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError("Full-text search needs the SQLite FTS5 backend")
+
+        with scratch_data():
+            names = self._seed(options['rows'])
+            queries = []
+            for _ in range(options['queries']):
+                text = random.choice(names)[:random.randint(2, 6)]
+                if random.random() < 0.3:
+                    text = f"{random.choice(names)} {text}"
+                queries.append((text, random.choice([None, 'doctor', 'patient']), 8, True))
+
+            stats = summarize(time_calls(search, queries))
+
+        self.stdout.write(
+            f"rows={options['rows']} queries={options['queries']} mean={stats['mean_ms']:.2f}ms "
+            f"p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+        )
+        if stats['p99_ms'] > options['target_ms']:
+            self.stdout.write(self.style.WARNING(f"p99 above the {options['target_ms']}ms target"))
+
+    def _seed(self, rows, batch_size=20000):
+        """Insert synthetic documents straight into the index; returns a sample of names"""
+        roles = ['doctor', 'patient', 'pharmacist']
+        sample = []
+        sql = f"INSERT INTO {SEARCH_TABLE} (rowid, kind, name, details, summary) VALUES (%s, %s, %s, %s, %s)"
+        with connection.cursor() as cursor:
+            for start in range(0, rows, batch_size):
+                batch = []
+                for i in range(start, min(start + batch_size, rows)):
+                    role = roles[i % 3]
+                    name = f"{synthetic_name()} {synthetic_name()}"
+                    speciality = random.choice(SPECIALITIES)
+                    if role == 'doctor':
+                        details = f"{speciality} {random.choice(HOSPITALS)}"
+                    else:
+                        details = f"user{i}@bench.mediwise"
+                    batch.append((make_rowid(role, 10_000_000 + i), role, name, details, speciality))
+                    if len(sample) < 1000:
+                        sample.append(name.split()[0].lower())
+                cursor.executemany(sql, batch)
+        return sample
@@ -0,0 +1,134 @@
+import time as clock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from main.bench import bench_email, scratch_data, summarize, time_calls
+from main.models import Appointment, Doctor, DoctorAvailability, Patient
+from main.scheduling import (
+    SlotUnavailable, book_appointment, bump_availability_version, free_slots, next_free_slot,
+)
+
+SLOT_MINUTES = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the next free slot across a speciality with most early slots booked, "
+        "one doctor's free slots for a week, and concurrent booking of one slot (data is removed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=5000)
+        parser.add_argument('--booked-hours', type=int, default=3, help="Hours booked solid at the start of each working day")
+        parser.add_argument('--days', type=int, default=5, help="Working days booked from tomorrow")
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        after = timezone.make_aware(datetime.combine(tomorrow, time.min))
+        with scratch_data():
+            doctors, booked = self._seed(options['doctors'], tomorrow, options['days'], options['booked_hours'])
+            self.stdout.write(f"{options['doctors']} cardiologists, {booked} booked appointments")
+
+            start = clock.perf_counter()
+            slot = next_free_slot('Cardiology', after=after)
+            cold = (clock.perf_counter() - start) * 1000
+            self.stdout.write(f"next free cardiology slot: doctor {slot[0]} at {timezone.localtime(slot[1]):%a %H:%M}")
+            self.stdout.write(f"{'query':<30}{'mean':>10}{'p50':>10}{'p99':>10}")
+            self.stdout.write(f"{'next free (cold index)':<30}{cold:>8.2f}ms")
+            self._report('next free (warm index)', time_calls(
+                lambda: next_free_slot('Cardiology', after=after), [()] * options['runs'],
+            ))
+            self._report('one doctor, 7 days', time_calls(
+                lambda doctor: free_slots(doctor, tomorrow, tomorrow + timedelta(days=6), after=after),
+                [(doctors[i % len(doctors)],) for i in range(options['runs'])],
+            ))
+            # The old way: a query per doctor per slot until a free one turns up
+            self._report('per-slot queries', time_calls(
+                lambda: self._naive_next_free(doctors, tomorrow), [()] * max(1, options['runs'] // 10),
+            ))
+        bump_availability_version()  # the rolled-back windows are still in this process's index
+        self._race(tomorrow, options['threads'])
+
+    def _report(self, label, samples):
+        stats = summarize(samples)
+        self.stdout.write(f"{label:<30}{stats['mean_ms']:>8.2f}ms{stats['p50_ms']:>8.2f}ms{stats['p99_ms']:>8.2f}ms")
+
+    def _seed(self, count, first_day, days, booked_hours):
+        doctors = Doctor.objects.bulk_create(
+            Doctor(first_name=f"Doctor{i}", last_name='Bench', password='x', phone_number='0',
+                   email=bench_email('slotdoctor', i), speciality='Cardiology', qualification='MD')
+            for i in range(count)
+        )
+        DoctorAvailability.objects.bulk_create(
+            (DoctorAvailability(doctor=doctor, weekday=weekday, start_time=time(9), end_time=time(17),
+                                slot_minutes=SLOT_MINUTES)
+             for doctor in doctors for weekday in range(5)),
+            batch_size=5000,
+        )
+        bump_availability_version()  # bulk_create sends no signals
+        patient = Patient.objects.create(first_name='Slot', last_name='Bench', password='x',
+                                         gender='female', email=bench_email('slotpatient', 0))
+        appointments = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            opening = timezone.make_aware(datetime.combine(day, time(9)))
+            for doctor in doctors:
+                for slot in range(booked_hours * 60 // SLOT_MINUTES):
+                    start = opening + timedelta(minutes=slot * SLOT_MINUTES)
+                    appointments.append(Appointment(doctor=doctor, patient=patient, start=start,
+                                                    end=start + timedelta(minutes=SLOT_MINUTES)))
+        Appointment.objects.bulk_create(appointments, batch_size=5000)
+        # Leave one doctor a gap on the first day, an hour before everyone else frees up
+        gap = appointments[0].start + timedelta(hours=booked_hours - 1)
+        Appointment.objects.filter(doctor=doctors[-1], start=gap).delete()
+        return doctors, len(appointments) - 1
+
+    def _naive_next_free(self, doctors, day):
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        opening = timezone.make_aware(datetime.combine(day, time(9)))
+        for slot in range(8 * 60 // SLOT_MINUTES):
+            start = opening + timedelta(minutes=slot * SLOT_MINUTES)
+            for doctor in doctors:
+                if not Appointment.objects.filter(doctor=doctor, status='booked', start=start).exists():
+                    return doctor.pk, start
+
+    def _race(self, day, threads):
+        """Many threads book the same slot at once; exactly one may succeed"""
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        doctor = Doctor.objects.create(first_name='Race', last_name='Bench', password='x', phone_number='0',
+                                       email=bench_email('racedoctor', 0), speciality='Cardiology', qualification='MD')
+        patients = Patient.objects.bulk_create(
+            Patient(first_name=f"Race{i}", last_name='Bench', password='x', gender='female',
+                    email=bench_email('racepatient', i))
+            for i in range(threads)
+        )
+        DoctorAvailability.objects.create(doctor=doctor, weekday=day.weekday(), start_time=time(9), end_time=time(10))
+        start = timezone.make_aware(datetime.combine(day, time(9)))
+
+        def attempt(patient):
+            try:
+                book_appointment(doctor, patient, start)
+                return True
+            except SlotUnavailable:
+                return False
+            finally:
+                connections.close_all()
+
+        try:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                results = list(pool.map(attempt, patients))
+            booked = Appointment.objects.filter(doctor=doctor, status='booked').count()
+            self.stdout.write(f"{threads} concurrent bookings of one slot: {sum(results)} succeeded, {booked} booked")
+        finally:
+            doctor.delete()
+            Patient.objects.filter(pk__in=[p.pk for p in patients]).delete()
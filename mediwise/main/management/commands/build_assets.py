@@ -0,0 +1,59 @@
+import shlex
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.assets import DIST_DIR, TemplateUsage, copy_vendor_files, font_css, icon_css, node_modules
+
+GENERATED_MARKER = '/* build_assets: fonts and icons */'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the templates' Tailwind classes, the fonts and the Font Awesome icons they use "
+        "into main/static/main/dist/app.css (run `npm ci` first; fontTools enables icon subsetting)"
+    )
+
+    def handle(self, *args, **options):
+        base_dir = Path(settings.BASE_DIR)
+        cli = getattr(settings, 'TAILWIND_CLI', None)
+        cli = shlex.split(cli) if cli else [str(node_modules() / '.bin' / 'tailwindcss')]
+        if not shutil.which(cli[0]):
+            raise CommandError(f"Tailwind CLI not found at {cli[0]}; run `npm ci` or set TAILWIND_CLI")
+
+        usage = TemplateUsage.scan()
+        shutil.rmtree(DIST_DIR, ignore_errors=True)
+        DIST_DIR.mkdir(parents=True)
+
+        fonts = font_css(usage, DIST_DIR)
+        icons, subsetted = icon_css(usage, DIST_DIR)
+        copy_vendor_files(DIST_DIR)
+
+        source = (base_dir / 'assets' / 'app.css').read_text(encoding='utf-8')
+        if GENERATED_MARKER not in source:
+            raise CommandError(f"assets/app.css is missing the {GENERATED_MARKER} marker")
+        source = source.replace(GENERATED_MARKER, f"{fonts}\n{icons}")
+
+        with tempfile.NamedTemporaryFile('w', suffix='.css', dir=base_dir / 'assets', delete=False) as handle:
+            handle.write(source)
+        try:
+            subprocess.run(
+                [*cli, '--config', str(base_dir / 'tailwind.config.js'),
+                 '--input', handle.name, '--output', str(DIST_DIR / 'app.css'), '--minify'],
+                cwd=base_dir, check=True,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise CommandError(f"Tailwind build failed with exit code {exc.returncode}")
+        finally:
+            Path(handle.name).unlink()
+
+        size = (DIST_DIR / 'app.css').stat().st_size
+        self.stdout.write(
+            f"{len(usage.icons)} icons ({'subset' if subsetted else 'full webfonts: install fontTools to subset'}), "
+            f"{len(usage.families)} font families, weights {sorted(usage.weights)}"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {DIST_DIR / 'app.css'} ({size / 1024:.1f} KiB)"))
@@ -0,0 +1,79 @@
+import json
+import platform
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from main.bench import scratch_data
+from main.perf import PERF_SETTINGS, SCENARIOS, PerfFixture, measure, over_budget, regressions, relative_speed
+from main.principal import cache as principal_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure query count, latency and peak memory of every view scenario at several "
+        "data scales (data is rolled back), and fail on budget overruns or regressions against the baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1000,100000',
+                            help="Comma separated patient and doctor counts, e.g. 1000,100000,1000000")
+        parser.add_argument('--repeat', type=int, default=15, help="Timed requests per scenario")
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'perf_baseline.json'))
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Allowed slowdown or memory growth as a fraction (0.25 = 25%%)")
+        parser.add_argument('--update', action='store_true', help="Write the results as the new baseline")
+        parser.add_argument('--output', help="Also write the results to this JSON file")
+
+    def handle(self, *args, **options):
+        baseline_path = Path(options['baseline'])
+        if not options['update'] and not baseline_path.exists():
+            raise CommandError(f"No baseline at {baseline_path}; run with --update to record one")
+
+        results = {}
+        failures = []
+        with override_settings(**PERF_SETTINGS), scratch_data():
+            caches['default'].clear()
+            fixture = PerfFixture()
+            for size in sorted(int(size) for size in options['scales'].split(',')):
+                fixture.grow(size)
+                scale = results[str(size)] = {}
+                for scenario in SCENARIOS:
+                    scale[scenario.name] = measure(scenario, fixture, options['repeat'])
+                    stats = scale[scenario.name]
+                    self.stdout.write(
+                        f"{size:>9} {scenario.name:<26}{stats['queries']:>4} queries"
+                        f"{stats['best_ms']:>9.2f}ms best{stats['median_ms']:>9.2f}ms median{stats['peak_kib']:>9.0f}KiB"
+                    )
+                failures += [f"{problem} @ {size}" for problem in over_budget(scale)]
+        # Nothing cached from the rolled-back rows may outlive the run
+        caches['default'].clear()
+        principal_cache.clear()
+
+        document = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'settings': PERF_SETTINGS,
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(document, indent=2, sort_keys=True) + '\n')
+
+        if options['update']:
+            if failures:
+                raise CommandError("Not recording a baseline over the query budgets:\n" + '\n'.join(failures))
+            baseline_path.write_text(json.dumps(document, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        speed = relative_speed(baseline['results'], results)
+        self.stdout.write(f"Views ran at {speed:.2f}x their baseline time (median over scenarios)")
+        failures += regressions(baseline['results'], results, options['tolerance'], speed)
+        if failures:
+            raise CommandError("Performance regressions:\n" + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from main.export import CHUNK_SIZE, EXPORT_FORMATS, EXPORT_MODELS, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Stream every patient, doctor or pharmacist to CSV or JSONL (passwords are never exported)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('role', choices=sorted(EXPORT_MODELS))
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--output', '-o', help="File to write; defaults to stdout")
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunks = export_chunks(options['role'], options['format'],
+                               compress=options['gzip'], chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
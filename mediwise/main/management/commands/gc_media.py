@@ -0,0 +1,96 @@
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.images import RENDITION_DIR, delete_renditions
+from main.models import Doctor, MediaBlob
+
+
+class Command(BaseCommand):
+    help = "Delete media files that no profile has referenced for the grace period"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float,
+                            default=getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24))
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sweep-orphans', action='store_true',
+                            help="Also delete files under profile_pictures/ with no MediaBlob row")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+        removed = 0
+
+        last_id = 0
+        while True:
+            batch = list(
+                MediaBlob.objects.filter(refcount__lte=0, unreferenced_since__lt=cutoff, id__gt=last_id)
+                .order_by('id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+            names = [blob.name for blob in batch]
+            # Never trust the counter alone: skip anything a doctor still points at
+            still_used = set(Doctor.objects.filter(profile_picture__in=names).values_list('profile_picture', flat=True))
+            for blob in batch:
+                if blob.name in still_used:
+                    continue
+                if dry_run:
+                    self.stdout.write(f"Would delete {blob.name}")
+                elif self._collect(blob, cutoff):
+                    self.stdout.write(f"Deleting {blob.name}")
+                else:
+                    continue
+                removed += 1
+
+        if options['sweep_orphans']:
+            removed += self._sweep_orphans(cutoff, dry_run)
+
+        self.stdout.write(self.style.SUCCESS(f"{'Would remove' if dry_run else 'Removed'} {removed} files"))
+
+    @transaction.atomic
+    def _collect(self, blob, cutoff):
+        """
+        Delete the row only if it is still unreferenced, then the file, before
+        committing: an upload of the same bytes meanwhile either claimed the
+        row first (and the delete matches nothing) or waits for this
+        transaction and finds no row, so it writes the file again.
+        """
+        deleted, _ = MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0, unreferenced_since__lt=cutoff).delete()
+        if deleted:
+            self._delete(blob.name)
+        return bool(deleted)
+
+    def _delete(self, name):
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        delete_renditions(name)
+
+    def _sweep_orphans(self, cutoff, dry_run):
+        """Files left behind by failed deletes before reference counting existed"""
+        root = os.path.join(settings.MEDIA_ROOT, 'profile_pictures')
+        removed = 0
+        for directory, _, files in os.walk(root):
+            relative_dir = os.path.relpath(directory, settings.MEDIA_ROOT).replace('\\', '/')
+            if relative_dir.startswith(RENDITION_DIR):
+                continue
+            names = [f"{relative_dir}/{filename}" for filename in files]
+            known = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+            known |= set(Doctor.objects.filter(profile_picture__in=names).values_list('profile_picture', flat=True))
+            for name in names:
+                path = os.path.join(settings.MEDIA_ROOT, name)
+                modified = datetime.fromtimestamp(os.path.getmtime(path), tz=dt_timezone.utc)
+                if name in known or modified >= cutoff:
+                    continue
+                self.stdout.write(f"{'Would delete' if dry_run else 'Deleting'} orphan {name}")
+                if not dry_run:
+                    self._delete(name)
+                removed += 1
+        return removed
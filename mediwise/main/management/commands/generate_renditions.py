@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main.images import process_profile_picture
+from main.models import Doctor
+
+
+class Command(BaseCommand):
+    help = "Create missing profile picture renditions (or all of them with --force)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate existing renditions too")
+
+    def handle(self, *args, **options):
+        doctors = Doctor.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        if not options['force']:
+            doctors = doctors.filter(picture_renditions=False)
+        names = doctors.values_list('profile_picture', flat=True).distinct().iterator()
+        processed = 0
+        for name in names:
+            process_profile_picture(name, force=options['force'])
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} profile pictures"))
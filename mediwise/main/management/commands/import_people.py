@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importer import IMPORT_FORMS, import_people
+
+
+class Command(BaseCommand):
+    help = "Bulk import patients, pharmacists or doctors from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--role', choices=sorted(IMPORT_FORMS),
+                            help="Role for every row; without it each row needs a role column")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, insert nothing")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Pass --format csv or --format jsonl")
+
+        def report(error):
+            self.stderr.write(str(error))
+
+        start = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as stream:
+            imported, failed = import_people(
+                stream, fmt,
+                role=options['role'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                on_error=report,
+            )
+        elapsed = time.perf_counter() - start
+        verb = "Validated" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {imported} rows, {failed} rejected in {elapsed:.1f}s"
+        ))
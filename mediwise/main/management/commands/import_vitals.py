@@ -0,0 +1,34 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importer import read_rows
+from main.vitals import LIMITS, ingest_vitals
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk append vitals measurements from a CSV or JSONL file with patient_id, "
+        f"optional measured_at and any of {', '.join(LIMITS)}"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError("Pass --format csv or --format jsonl")
+
+        def report(error):
+            self.stderr.write(str(error))
+
+        start = time.perf_counter()
+        with open(path, newline='', encoding='utf-8') as stream:
+            imported, failed = ingest_vitals(read_rows(stream, fmt), batch_size=options['batch_size'], on_error=report)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} measurements, {failed} rejected in {elapsed:.1f}s"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from main.search import SEARCH_MODELS, SEARCH_TABLE, clear_index, index_batch, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from Doctor, Patient and Pharmacist rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError("Full-text search needs the SQLite FTS5 backend")
+        batch_size = options['batch_size']
+
+        # One transaction: searches keep seeing the old index until the new one is complete
+        with transaction.atomic():
+            clear_index()
+            for model, role in SEARCH_MODELS.items():
+                total = 0
+                batch = []
+                for instance in model.objects.order_by('pk').iterator(chunk_size=batch_size):
+                    batch.append(instance)
+                    if len(batch) >= batch_size:
+                        index_batch(batch)
+                        total += len(batch)
+                        batch = []
+                index_batch(batch)
+                total += len(batch)
+                self.stdout.write(f"Indexed {total} {role} rows")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
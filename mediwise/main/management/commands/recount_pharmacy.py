@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Pharmacist
+from main.pharmacy import recount_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the pharmacist dashboard counters and daily sales from stock and orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument('pharmacist_ids', nargs='*', type=int)
+
+    def handle(self, *args, **options):
+        pharmacists = Pharmacist.objects.order_by('pk')
+        if options['pharmacist_ids']:
+            pharmacists = pharmacists.filter(pk__in=options['pharmacist_ids'])
+        total = 0
+        for pharmacist in pharmacists.iterator():
+            recount_counters(pharmacist)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"Recounted {total} pharmacists"))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.aggregates import AGGREGATE_MODELS, rebuild_aggregates, refresh_aggregates
+
+
+class Command(BaseCommand):
+    help = "Bring the admin dashboard's summary tables up to date with the account tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help="Keep refreshing every SECONDS instead of once")
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recount everything from scratch first (after bulk edits that skipped updated_at)")
+        parser.add_argument('--role', action='append', choices=sorted(AGGREGATE_MODELS),
+                            help="Only refresh these roles (repeatable)")
+
+    def handle(self, *args, **options):
+        roles = options['role'] or AGGREGATE_MODELS
+        if options['rebuild']:
+            self._report('Rebuilt', rebuild_aggregates)
+
+        while True:
+            self._report('Refreshed', refresh_aggregates, roles)
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+
+    def _report(self, label, refresh, *args):
+        start = time.perf_counter()
+        report = refresh(*args)
+        summary = ', '.join(
+            f"{role}: {new} new, {moved} changed, {removed} removed" for role, (new, moved, removed) in report.items()
+        )
+        self.stdout.write(f"{label} in {(time.perf_counter() - start) * 1000:.0f}ms ({summary})")
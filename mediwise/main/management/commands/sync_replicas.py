@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from main.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto each replica in MEDIWISE_DB_REPLICAS "
+        "(local stand-in for real replication; PostgreSQL replicas use streaming replication)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help="Keep copying every SECONDS instead of once")
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError("No replicas configured; set MEDIWISE_DB_REPLICAS")
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("sync_replicas only copies SQLite databases")
+
+        while True:
+            start = time.perf_counter()
+            for alias in aliases:
+                self._copy(primary.settings_dict['NAME'], connections[alias].settings_dict['NAME'])
+            self.stdout.write(f"Copied primary to {', '.join(aliases)} in {(time.perf_counter() - start) * 1000:.0f}ms")
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+
+    def _copy(self, source_path, target_path):
+        # The online backup API takes a consistent snapshot while the site keeps writing
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(target_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.population import BMI_LABELS, GROUPINGS, bmi_distribution, load_latest_bmi, patients_without_vitals
+
+
+class Command(BaseCommand):
+    help = "BMI distribution of every patient's latest measurement by blood group, age band and gender"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group-by', default=','.join(GROUPINGS),
+                            help=f"Comma separated, from {', '.join(GROUPINGS)}; empty for the whole population")
+        parser.add_argument('--min-patients', type=int, default=1, help="Hide smaller groups")
+
+    def handle(self, *args, **options):
+        group_by = tuple(name for name in options['group_by'].split(',') if name)
+        unknown = set(group_by) - set(GROUPINGS)
+        if unknown:
+            raise CommandError(f"Unknown grouping {', '.join(sorted(unknown))}")
+
+        start = time.perf_counter()
+        columns = load_latest_bmi()
+        loaded = time.perf_counter()
+        rows = bmi_distribution(group_by, columns)
+        done = time.perf_counter()
+
+        header = ''.join(f"{name:<12}" for name in group_by)
+        header += f"{'patients':>9}{'mean':>7}{'p25':>7}{'p50':>7}{'p75':>7}"
+        header += ''.join(f"{label:>13}" for label in BMI_LABELS)
+        self.stdout.write(header)
+        for row in rows:
+            if row['patients'] < options['min_patients']:
+                continue
+            line = ''.join(f"{row[name]:<12}" for name in group_by)
+            line += f"{row['patients']:>9}{row['mean']:>7.1f}{row['p25']:>7.1f}{row['p50']:>7.1f}{row['p75']:>7.1f}"
+            line += ''.join(f"{row['bands'][label]:>13}" for label in BMI_LABELS)
+            self.stdout.write(line)
+        self.stdout.write(
+            f"{len(columns['bmi'])} patients with a BMI, {patients_without_vitals()} without vitals; "
+            f"loaded in {(loaded - start) * 1000:.0f}ms, grouped in {(done - loaded) * 1000:.1f}ms"
+        )
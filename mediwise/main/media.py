@@ -0,0 +1,33 @@
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import MediaBlob
+
+
+def add_reference(name):
+    if not name:
+        return
+    MediaBlob.objects.get_or_create(name=name)
+    MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, unreferenced_since=None)
+
+
+def drop_reference(name):
+    """Release one reference; the file itself is left for gc_media to collect"""
+    if not name:
+        return
+    MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - 1)
+    MediaBlob.objects.filter(name=name, refcount__lte=0, unreferenced_since__isnull=True).update(
+        refcount=0, unreferenced_since=timezone.now()
+    )
+
+
+def claim_blob(name):
+    """
+    Keep an existing blob from being collected while an upload reuses it:
+    an unreferenced blob's grace period starts again. Returns False when
+    there is no row, so the caller writes the file itself rather than rely on
+    one gc_media may be deleting (the update waits for gc_media's transaction).
+    """
+    return bool(MediaBlob.objects.filter(name=name).update(
+        unreferenced_since=Case(When(refcount__lte=0, then=Value(timezone.now())), default=F('unreferenced_since')),
+    ))
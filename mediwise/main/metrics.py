@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+logger = logging.getLogger(__name__)
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name -> (help, buckets)
+METRICS = {
+    'mediwise_request_duration_seconds': ("Time spent in Django per request", SECONDS_BUCKETS),
+    'mediwise_request_queries': ("Database queries per request", QUERY_BUCKETS),
+    'mediwise_request_db_seconds': ("Database time per request", SECONDS_BUCKETS),
+    'mediwise_request_render_seconds': ("Template render time per request", SECONDS_BUCKETS),
+    'mediwise_response_bytes': ("Response body size", BYTES_BUCKETS),
+}
+
+
+class Histogram:
+    """Prometheus-style histogram: per-bucket counts plus a running sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+def _histogram_lines(name, labels, buckets, counts, total):
+    cumulative = 0
+    for bound, count in zip(buckets + ('+Inf',), counts):
+        cumulative += count
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+    yield f'{name}_sum{{{labels}}} {total:.6f}'
+    yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+# (metric, view name) -> Histogram, for this process only
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(metric, view, value):
+    with _histograms_lock:
+        histogram = _histograms.get((metric, view))
+        if histogram is None:
+            histogram = _histograms[(metric, view)] = Histogram(METRICS[metric][1])
+        histogram.observe(value)
+
+
+def render_prometheus():
+    """All histograms in the Prometheus text exposition format"""
+    with _histograms_lock:
+        snapshot = sorted((key, h.buckets, list(h.counts), h.sum) for key, h in _histograms.items())
+    lines = []
+    for metric, (help_text, _) in METRICS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, view), buckets, counts, total in snapshot:
+            if name == metric:
+                label = view.replace('\\', '\\\\').replace('"', '\\"')
+                lines.extend(_histogram_lines(metric, f'view="{label}"', buckets, counts, total))
+    return '\n'.join(lines) + '\n'
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'render_time', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.statements = []
+
+
+# Set for the duration of a request; context variables follow the request into
+# sync_to_async threads, so async views are counted too
+_stats = ContextVar('mediwise_request_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries += 1
+        stats.statements.append(sql)
+
+
+def install_query_recorder(connection):
+    """Add the query counter to a connection's execute wrappers (once)"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = _stats.get()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            # Includes and extends render inside this call, so only top-level templates are timed
+            stats.render_time += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render into the request's stats"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class MetricsMiddleware:
+    """
+    Record query count, DB time, template render time, response size and
+    total time per view name. Adds a Server-Timing header and logs requests
+    over METRICS_QUERY_LOG_THRESHOLD queries together with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened from now on get it from the connection_created signal
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _stats.reset(token)
+        return self._finish(request, response, stats, start)
+
+    def _start(self):
+        stats = RequestStats()
+        return stats, _stats.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, start):
+        duration = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+
+        observe('mediwise_request_duration_seconds', view, duration)
+        observe('mediwise_request_queries', view, stats.queries)
+        observe('mediwise_request_db_seconds', view, stats.db_time)
+        observe('mediwise_request_render_seconds', view, stats.render_time)
+        if not response.streaming:
+            observe('mediwise_response_bytes', view, len(response.content))
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                f'render;dur={stats.render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+
+        threshold = settings.METRICS_QUERY_LOG_THRESHOLD
+        if threshold and stats.queries > threshold:
+            logger.warning(
+                "%s %s (%s) ran %d queries in %.1fms:\n%s",
+                request.method, request.path, view, stats.queries, stats.db_time * 1000,
+                '\n'.join(stats.statements),
+            )
+        return response
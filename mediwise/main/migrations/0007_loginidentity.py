@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+def backfill_identities(apps, schema_editor):
+    LoginIdentity = apps.get_model('main', 'LoginIdentity')
+    sources = {
+        'admin': apps.get_model('main', 'MediAdmin'),
+        'patient': apps.get_model('main', 'Patient'),
+        'pharmacist': apps.get_model('main', 'Pharmacist'),
+        'doctor': apps.get_model('main', 'Doctor'),
+    }
+    rows = []
+    for role, model in sources.items():
+        for object_id, email in model.objects.values_list('id', 'email').iterator():
+            email = (email or '').strip().lower()
+            if email:
+                rows.append(LoginIdentity(email=email, role=role, object_id=object_id))
+    LoginIdentity.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_alter_doctor_profile_picture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginIdentity',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('email', models.CharField(db_index=True, max_length=254)),
+                ('role', models.CharField(choices=[('admin', 'Admin'), ('patient', 'Patient'), ('pharmacist', 'Pharmacist'), ('doctor', 'Doctor')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('role', 'object_id'), name='unique_login_identity_account')],
+            },
+        ),
+        migrations.RunPython(backfill_identities, migrations.RunPython.noop),
+    ]
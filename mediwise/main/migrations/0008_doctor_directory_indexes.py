@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_loginidentity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['-registration_date', '-id'], name='doctor_registry_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['speciality', '-registration_date', '-id'], name='doctor_speciality_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['cureentHospital', '-registration_date', '-id'], name='doctor_hospital_order_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:05
+
+from django.db import migrations
+
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS main_search USING fts5(
+    kind, name, details, summary UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+# rowid = id * 4 + role code (doctor=1, patient=2, pharmacist=3), see main/search.py
+POPULATE_SEARCH_TABLE = [
+    """
+    INSERT INTO main_search (rowid, kind, name, details, summary)
+    SELECT id * 4 + 1, 'doctor', first_name || ' ' || last_name,
+           speciality || ' ' || qualification || ' ' || COALESCE("cureentHospital", '') || ' ' || COALESCE(description, ''),
+           speciality || COALESCE(' · ' || "cureentHospital", '')
+    FROM main_doctor
+    """,
+    """
+    INSERT INTO main_search (rowid, kind, name, details, summary)
+    SELECT id * 4 + 2, 'patient', first_name || ' ' || last_name,
+           COALESCE(email, '') || ' ' || COALESCE(phone_number, ''), COALESCE(email, '')
+    FROM main_patient
+    """,
+    """
+    INSERT INTO main_search (rowid, kind, name, details, summary)
+    SELECT id * 4 + 3, 'pharmacist', first_name || ' ' || last_name,
+           email || ' ' || license_number || ' ' || phone_number, email
+    FROM main_pharmacist
+    """,
+]
+
+
+def create_search_table(apps, schema_editor):
+    # FTS5 is SQLite only; other backends fall back to no search results
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SEARCH_TABLE)
+    for statement in POPULATE_SEARCH_TABLE:
+        schema_editor.execute(statement)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS main_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_doctor_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
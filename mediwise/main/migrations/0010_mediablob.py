@@ -0,0 +1,47 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:52
+
+import main.models
+import main.storage
+from django.db import migrations, models
+
+
+def count_existing_references(apps, schema_editor):
+    Doctor = apps.get_model('main', 'Doctor')
+    MediaBlob = apps.get_model('main', 'MediaBlob')
+    counts = (
+        Doctor.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        .values('profile_picture').annotate(refs=models.Count('id'))
+    )
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=row['profile_picture'], refcount=row['refs']) for row in counts],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctor',
+            name='profile_picture',
+            field=models.ImageField(blank=True, max_length=500, null=True, storage=main.storage.profile_picture_storage, upload_to=main.models.doctor_profile_image_path),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=500, unique=True)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('unreferenced_since', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('refcount__lte', 0)), fields=['unreferenced_since'], name='mediablob_gc_idx')],
+            },
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
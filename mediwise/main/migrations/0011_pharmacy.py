@@ -0,0 +1,101 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_mediablob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Medication',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200, unique=True)),
+                ('strength', models.CharField(blank=True, max_length=50, null=True)),
+                ('unit_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PharmacyCounters',
+            fields=[
+                ('pharmacist', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='main.pharmacist')),
+                ('prescriptions_pending', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(max_length=200)),
+                ('customer_contact', models.CharField(blank=True, max_length=200, null=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('completed', 'Completed'), ('cancelled', 'Cancelled')], default='completed', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.patient')),
+                ('pharmacist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='main.pharmacist')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main.medication')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='main.order')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PharmacyDailySales',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('order_count', models.IntegerField(default=0)),
+                ('sales_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pharmacist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='main.pharmacist')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Stock',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantity', models.IntegerField(default=0)),
+                ('reorder_level', models.IntegerField(default=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.medication')),
+                ('pharmacist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='main.pharmacist')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('change', models.IntegerField()),
+                ('reason', models.CharField(choices=[('restock', 'Restock'), ('sale', 'Sale'), ('return', 'Return'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='main.stock')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['pharmacist', '-created_at'], name='order_recent_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='pharmacydailysales',
+            constraint=models.UniqueConstraint(fields=('pharmacist', 'day'), name='unique_daily_sales'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(condition=models.Q(('quantity__lte', models.F('reorder_level'))), fields=['pharmacist', 'quantity'], name='stock_low_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.UniqueConstraint(fields=('pharmacist', 'medication'), name='unique_stock_per_pharmacist'),
+        ),
+    ]
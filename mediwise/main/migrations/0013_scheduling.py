@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('status', models.CharField(choices=[('booked', 'Booked'), ('cancelled', 'Cancelled')], default='booked', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='main.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to='main.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'start'], name='appointment_doctor_start_idx'), models.Index(fields=['start'], name='appointment_start_idx'), models.Index(fields=['patient', '-start'], name='appointment_patient_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end__gt', models.F('start'))), name='appointment_order'), models.UniqueConstraint(condition=models.Q(('status', 'booked')), fields=('doctor', 'start'), name='unique_booked_slot')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DoctorAvailability',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='main.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'weekday'], name='availability_doctor_day_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='availability_window_order'), models.CheckConstraint(condition=models.Q(('slot_minutes__gt', 0), ('slot_minutes__lte', 240)), name='availability_slot_length')],
+            },
+        ),
+    ]
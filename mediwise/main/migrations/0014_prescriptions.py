@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_scheduling'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('restock', 'Restock'), ('sale', 'Sale'), ('return', 'Return'), ('adjustment', 'Adjustment'), ('prescription', 'Prescription')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='Prescription',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('dispensed', 'Dispensed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dispensed_at', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prescriptions', to='main.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prescriptions', to='main.patient')),
+                ('pharmacist', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='prescriptions', to='main.pharmacist')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PrescriptionItem',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('dosage', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('ends_on', models.DateField(blank=True, null=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='main.medication')),
+                ('prescription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='main.prescription')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DrugInteraction',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('severity', models.CharField(choices=[('minor', 'Minor'), ('moderate', 'Moderate'), ('major', 'Major')], max_length=10)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('medication_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.medication')),
+                ('medication_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.medication')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('medication_a', 'medication_b'), name='unique_drug_interaction'), models.CheckConstraint(condition=models.Q(('medication_a__lt', models.F('medication_b'))), name='drug_interaction_order')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['patient', 'status'], name='prescription_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['pharmacist', 'status', '-created_at'], name='prescription_queue_idx'),
+        ),
+    ]
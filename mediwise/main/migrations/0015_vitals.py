@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:39
+
+import re
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def _number(text):
+    match = NUMBER_RE.search(text or '')
+    return float(match.group().replace(',', '.')) if match else None
+
+
+def backfill_profile_vitals(apps, schema_editor):
+    """One measurement per patient from the free-text height and weight, dated at the last profile save"""
+    Patient = apps.get_model('main', 'Patient')
+    VitalsMeasurement = apps.get_model('main', 'VitalsMeasurement')
+    rows = []
+    profiles = Patient.objects.exclude(height__isnull=True, weight__isnull=True)
+    for patient_id, height, weight, updated_at in profiles.values_list('id', 'height', 'weight', 'updated_at').iterator():
+        height, weight = _number(height), _number(weight)
+        if height is not None and not 40 <= height <= 250:
+            height = None
+        if weight is not None and not 2 <= weight <= 400:
+            weight = None
+        if height is None and weight is None:
+            continue
+        bmi = round(weight / (height / 100) ** 2, 1) if height and weight else None
+        rows.append(VitalsMeasurement(
+            patient_id=patient_id, measured_at=updated_at, height_cm=height, weight_kg=weight, bmi=bmi,
+            source='profile',
+        ))
+        if len(rows) >= 1000:
+            VitalsMeasurement.objects.bulk_create(rows)
+            rows = []
+    VitalsMeasurement.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0014_prescriptions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VitalsMeasurement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('measured_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('height_cm', models.FloatField(blank=True, null=True)),
+                ('weight_kg', models.FloatField(blank=True, null=True)),
+                ('bmi', models.FloatField(blank=True, null=True)),
+                ('systolic', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('diastolic', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('source', models.CharField(choices=[('profile', 'Profile'), ('import', 'Import'), ('clinic', 'Clinic')], default='clinic', max_length=10)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vitals', to='main.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'measured_at'], name='vitals_patient_time_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_profile_vitals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:43
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_vitals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateWatermark',
+            fields=[
+                ('role', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('last_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='registration_date',
+            # Existing patients are dated to the migration; their real registration day was never stored
+            field=models.DateField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='AggregateMember',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('role', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('speciality', models.CharField(blank=True, max_length=100, null=True)),
+                ('incomplete', models.BooleanField(default=False)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('role', 'object_id'), name='unique_aggregate_member')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRegistrations',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('role', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='daily_registrations_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('role', 'day'), name='unique_daily_registrations')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SummaryCount',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_summary_count')],
+            },
+        ),
+    ]
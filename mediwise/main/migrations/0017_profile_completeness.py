@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:45
+
+from django.db import migrations, models
+from django.db.models import Case, Q, Value, When
+
+# The profile fields as of this migration, in bit order (Patient/Doctor.PROFILE_FIELDS)
+PROFILE_FIELDS = {
+    'patient': ('phone_number', 'address', 'date_of_birth', 'blood_group', 'height', 'weight'),
+    'doctor': ('description', 'profile_picture', 'cureentHospital', 'license_number', 'address'),
+}
+
+
+def _empty(model, name):
+    empty = Q(**{f'{name}__isnull': True})
+    if model._meta.get_field(name).get_internal_type() != 'DateField':
+        empty |= Q(**{name: ''}) | Q(**{name: 'None'})
+    return empty
+
+
+def backfill_profile_completeness(apps, schema_editor):
+    """One UPDATE per table computing the bitmask and score in SQL, the same as update_profile_completeness"""
+    for model_name, fields in PROFILE_FIELDS.items():
+        model = apps.get_model('main', model_name)
+        missing = filled = Value(0)
+        for bit, name in enumerate(fields):
+            empty = _empty(model, name)
+            missing = missing + Case(When(empty, then=Value(1 << bit)), default=Value(0))
+            filled = filled + Case(When(empty, then=Value(0)), default=Value(1))
+        # Integer division rounds half up; no count of filled fields lands exactly on a half
+        completeness = (filled * Value(100) + Value(len(fields) // 2)) / Value(len(fields))
+        model.objects.update(
+            profile_missing=missing,
+            profile_completeness=completeness,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_admin_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='profile_completeness',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='profile_missing',
+            field=models.PositiveSmallIntegerField(default=31),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='profile_completeness',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='profile_missing',
+            field=models.PositiveSmallIntegerField(default=63),
+        ),
+        migrations.RunPython(backfill_profile_completeness, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(condition=models.Q(('profile_missing__gt', 0)), fields=['-registration_date', '-id'], name='doctor_incomplete_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(condition=models.Q(('profile_missing__gt', 0)), fields=['id'], name='patient_incomplete_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+from main.images import renditions_exist
+
+
+def flag_existing_renditions(apps, schema_editor):
+    """Renditions already on disk count as written; generate_renditions does the rest"""
+    Doctor = apps.get_model('main', 'Doctor')
+    names = (
+        Doctor.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+        .values_list('profile_picture', flat=True).distinct()
+    )
+    ready = [name for name in names.iterator() if renditions_exist(name)]
+    for start in range(0, len(ready), 500):
+        Doctor.objects.filter(profile_picture__in=ready[start:start + 500]).update(picture_renditions=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_data_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='picture_renditions',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_existing_renditions, migrations.RunPython.noop),
+    ]
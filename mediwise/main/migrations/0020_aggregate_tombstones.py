@@ -0,0 +1,45 @@
+# Generated by Django 6.0.1 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+def bury_deleted_members(apps, schema_editor):
+    """Refreshes no longer look for deleted accounts, so tombstone the ones already gone"""
+    AggregateMember = apps.get_model('main', 'AggregateMember')
+    AggregateTombstone = apps.get_model('main', 'AggregateTombstone')
+    for role in ('patient', 'doctor', 'pharmacist'):
+        accounts = apps.get_model('main', role.capitalize()).objects.values('pk')
+        gone = AggregateMember.objects.filter(role=role).exclude(object_id__in=accounts).values_list('object_id', flat=True)
+        AggregateTombstone.objects.bulk_create(
+            [AggregateTombstone(role=role, object_id=object_id) for object_id in gone.iterator()], batch_size=500,
+        )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateTombstone',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('role', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['updated_at'], name='doctor_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['updated_at'], name='patient_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pharmacist',
+            index=models.Index(fields=['updated_at'], name='pharmacist_updated_at_idx'),
+        ),
+        migrations.RunPython(bury_deleted_members, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
+import os
+
 from django.db import models
+from django.utils import timezone
+
+from .storage import profile_picture_storage
 
 # Create your models here.
 
@@ -18,6 +23,31 @@ class MediAdmin(models.Model):
     id = models.BigAutoField(primary_key=True)
     email = models.EmailField(unique=True, max_length=100)
     password = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
+
+def update_profile_completeness(instance, update_fields=None):
+    """
+    Set profile_missing (bit i set when PROFILE_FIELDS[i] is empty) and
+    profile_completeness (percent filled in) from the instance's fields.
+    Returns update_fields with the two columns added when a profile field is
+    among them, so a partial save keeps them in step.
+    """
+    fields = instance.PROFILE_FIELDS
+    missing = 0
+    for bit, name in enumerate(fields):
+        if getattr(instance, name) in (None, '', 'None'):
+            missing |= 1 << bit
+    instance.profile_missing = missing
+    instance.profile_completeness = round(100 * (len(fields) - bin(missing).count('1')) / len(fields))
+    if update_fields is not None and set(update_fields) & set(fields):
+        update_fields = {*update_fields, 'profile_missing', 'profile_completeness'}
+    return update_fields
+
+
+def missing_profile_fields(instance):
+    """Names of the profile fields the stored bitmask says are empty"""
+    return [name for bit, name in enumerate(instance.PROFILE_FIELDS) if instance.profile_missing & 1 << bit]
+
 
 class Patient(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -48,6 +78,23 @@ class Patient(models.Model):
     weight = models.CharField(max_length=10, null=True, blank=True)
     email = models.EmailField(null=True, blank=True)
     address = models.TextField(null=True, blank=True)
+    registration_date = models.DateField(auto_now_add=True)
+    # Fields a complete profile has filled in; see update_profile_completeness
+    PROFILE_FIELDS = ('phone_number', 'address', 'date_of_birth', 'blood_group', 'height', 'weight')
+    profile_missing = models.PositiveSmallIntegerField(default=(1 << len(PROFILE_FIELDS)) - 1)
+    profile_completeness = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(profile_missing__gt=0), name='patient_incomplete_idx'),
+            # The aggregates refresh reads accounts changed since its watermark
+            models.Index(fields=['updated_at'], name='patient_updated_at_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = update_profile_completeness(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -64,19 +111,21 @@ class Pharmacist(models.Model):
     email = models.EmailField(unique=True)
     address = models.TextField()
     registration_date = models.DateField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='pharmacist_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
 def doctor_profile_image_path(instance, filename):
-    # File will be uploaded to MEDIA_ROOT/profile_pictures/user_<id>/<filename>
-    import os
+    # Only the directory and extension survive: ContentAddressedStorage renames
+    # the file after its content hash (MEDIA_ROOT/profile_pictures/ab/cd/<sha256>.<ext>)
     ext = filename.split('.')[-1]
-    # Generate unique filename using user ID and timestamp
-    import uuid
-    from datetime import datetime
-    filename = f'doctor_{instance.id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}_{uuid.uuid4().hex[:8]}.{ext}'
-    return os.path.join('profile_pictures', filename)
+    return os.path.join('profile_pictures', f'upload.{ext}')
 
 
 class Doctor(models.Model):
@@ -89,12 +138,444 @@ class Doctor(models.Model):
     phone_number = models.CharField(max_length=15)
     email = models.EmailField(unique=True)
     address = models.TextField(null=True, blank=True)
-    profile_picture = models.ImageField(upload_to=doctor_profile_image_path, null=True, blank=True, max_length=500)
+    profile_picture = models.ImageField(upload_to=doctor_profile_image_path, storage=profile_picture_storage, null=True, blank=True, max_length=500)
+    # Set by the worker once the picture's renditions are written (see main.images)
+    picture_renditions = models.BooleanField(default=False)
     speciality = models.CharField(max_length=100)
     qualification = models.CharField(max_length=100)
     cureentHospital = models.CharField(max_length=100, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
     registration_date = models.DateField(auto_now_add=True)
+    PROFILE_FIELDS = ('description', 'profile_picture', 'cureentHospital', 'license_number', 'address')
+    profile_missing = models.PositiveSmallIntegerField(default=(1 << len(PROFILE_FIELDS)) - 1)
+    profile_completeness = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the admin directory (newest first)
+            models.Index(fields=['-registration_date', '-id'], name='doctor_registry_order_idx'),
+            models.Index(fields=['speciality', '-registration_date', '-id'], name='doctor_speciality_order_idx'),
+            models.Index(fields=['cureentHospital', '-registration_date', '-id'], name='doctor_hospital_order_idx'),
+            # Only incomplete profiles: the directory's "incomplete" filter seeks here
+            models.Index(
+                fields=['-registration_date', '-id'], condition=models.Q(profile_missing__gt=0),
+                name='doctor_incomplete_order_idx',
+            ),
+            models.Index(fields=['updated_at'], name='doctor_updated_at_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = update_profile_completeness(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
+
+
+class LoginIdentity(models.Model):
+    """
+    Lookup table mapping a normalized email to the account that owns it,
+    kept in sync with MediAdmin, Patient, Pharmacist and Doctor by signals
+    """
+    ROLE_CHOICES = (
+        ('admin', 'Admin'),
+        ('patient', 'Patient'),
+        ('pharmacist', 'Pharmacist'),
+        ('doctor', 'Doctor'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    email = models.CharField(max_length=254, db_index=True)
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    object_id = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'object_id'], name='unique_login_identity_account'),
+        ]
+
+    def __str__(self):
+        return f"{self.role} {self.email}"
+
+
+class MediaBlob(models.Model):
+    """
+    Reference count for a content-addressed media file. Blobs that drop to
+    zero references are deleted later by the gc_media command, never inline.
+    """
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=500, unique=True)
+    refcount = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    unreferenced_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['unreferenced_since'], condition=models.Q(refcount__lte=0), name='mediablob_gc_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+class DataVersion(models.Model):
+    """
+    Version of a table that processes keep in memory (see main.versions).
+    Changed in the same transaction as the table, so every process sees both
+    at once, and a new random value each time so a rolled-back change can't
+    come back under a version already seen.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.name} {self.version}"
+
+
+class Medication(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    name = models.CharField(max_length=200, unique=True)
+    strength = models.CharField(max_length=50, null=True, blank=True)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.name} {self.strength}" if self.strength else self.name
+
+
+class Stock(models.Model):
+    """
+    Quantity of a medication held by one pharmacist. Change it only through
+    main.pharmacy.move_stock so the dashboard counters stay exact.
+    """
+    id = models.BigAutoField(primary_key=True)
+    pharmacist = models.ForeignKey(Pharmacist, on_delete=models.CASCADE, related_name='stock')
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
+    quantity = models.IntegerField(default=0)
+    reorder_level = models.IntegerField(default=10)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pharmacist', 'medication'], name='unique_stock_per_pharmacist'),
+        ]
+        indexes = [
+            # Only below-threshold rows, so the low stock list never scans healthy stock
+            models.Index(
+                fields=['pharmacist', 'quantity'],
+                condition=models.Q(quantity__lte=models.F('reorder_level')),
+                name='stock_low_idx',
+            ),
+        ]
+
+    @property
+    def is_low(self):
+        return self.quantity <= self.reorder_level
+
+    def __str__(self):
+        return f"{self.medication} x{self.quantity}"
+
+
+class StockMovement(models.Model):
+    REASON_CHOICES = (
+        ('restock', 'Restock'),
+        ('sale', 'Sale'),
+        ('return', 'Return'),
+        ('adjustment', 'Adjustment'),
+        ('prescription', 'Prescription'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='movements')
+    change = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class Order(models.Model):
+    STATUS_CHOICES = (
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    pharmacist = models.ForeignKey(Pharmacist, on_delete=models.CASCADE, related_name='orders')
+    patient = models.ForeignKey(Patient, on_delete=models.SET_NULL, null=True, blank=True)
+    customer_name = models.CharField(max_length=200)
+    customer_contact = models.CharField(max_length=200, null=True, blank=True)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pharmacist', '-created_at'], name='order_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.id} ({self.customer_name})"
+
+
+class OrderItem(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    medication = models.ForeignKey(Medication, on_delete=models.PROTECT)
+    quantity = models.PositiveIntegerField()
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+
+class PharmacyCounters(models.Model):
+    """Dashboard counters for one pharmacist, updated in the same transaction as the change"""
+    pharmacist = models.OneToOneField(Pharmacist, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    prescriptions_pending = models.IntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+
+class PharmacyDailySales(models.Model):
+    """Per-day order totals; the dashboard sums at most seven of these rows"""
+    id = models.BigAutoField(primary_key=True)
+    pharmacist = models.ForeignKey(Pharmacist, on_delete=models.CASCADE, related_name='daily_sales')
+    day = models.DateField()
+    order_count = models.IntegerField(default=0)
+    sales_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pharmacist', 'day'], name='unique_daily_sales'),
+        ]
+
+
+# Upper bound on a slot, and so on an appointment: free slot searches only
+# look this far back for bookings that could still be running
+MAX_SLOT_MINUTES = 240
+
+
+class DoctorAvailability(models.Model):
+    """A weekly working window, cut into slot_minutes appointments"""
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='availability')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'weekday'], name='availability_doctor_day_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='availability_window_order'),
+            models.CheckConstraint(
+                condition=models.Q(slot_minutes__gt=0, slot_minutes__lte=MAX_SLOT_MINUTES), name='availability_slot_length',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
+class Appointment(models.Model):
+    """
+    A booked (or cancelled) slot with a doctor. Book only through
+    main.scheduling.book_appointment, which checks the slot and overlaps.
+    """
+    STATUS_CHOICES = (
+        ('booked', 'Booked'),
+        ('cancelled', 'Cancelled'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='appointments')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='appointments')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='booked')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Booked intervals of one doctor, or of a speciality's doctors, in a date range
+            models.Index(fields=['doctor', 'start'], name='appointment_doctor_start_idx'),
+            models.Index(fields=['start'], name='appointment_start_idx'),
+            models.Index(fields=['patient', '-start'], name='appointment_patient_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end__gt=models.F('start')), name='appointment_order'),
+            # Last line of defence against two requests booking the same slot
+            models.UniqueConstraint(
+                fields=['doctor', 'start'], condition=models.Q(status='booked'), name='unique_booked_slot',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} {self.start:%Y-%m-%d %H:%M}"
+
+
+class Prescription(models.Model):
+    """
+    Medications a doctor prescribes to a patient, dispensed by one pharmacist.
+    Create and move it only through main.prescriptions so the pending counter
+    on the pharmacist dashboard stays exact.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('dispensed', 'Dispensed'),
+        ('cancelled', 'Cancelled'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    doctor = models.ForeignKey(Doctor, on_delete=models.SET_NULL, null=True, related_name='prescriptions')
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='prescriptions')
+    pharmacist = models.ForeignKey(Pharmacist, on_delete=models.SET_NULL, null=True, blank=True, related_name='prescriptions')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    notes = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispensed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'status'], name='prescription_patient_idx'),
+            models.Index(fields=['pharmacist', 'status', '-created_at'], name='prescription_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"Prescription {self.id} ({self.patient})"
+
+
+class PrescriptionItem(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    prescription = models.ForeignKey(Prescription, on_delete=models.CASCADE, related_name='items')
+    medication = models.ForeignKey(Medication, on_delete=models.PROTECT)
+    dosage = models.CharField(max_length=100)
+    quantity = models.PositiveIntegerField(default=1)
+    # Last day the patient takes it; null for ongoing medication
+    ends_on = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.medication} {self.dosage}"
+
+
+class DrugInteraction(models.Model):
+    """One known interaction between two medications, stored once with medication_a < medication_b"""
+    SEVERITY_CHOICES = (
+        ('minor', 'Minor'),
+        ('moderate', 'Moderate'),
+        ('major', 'Major'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    medication_a = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='+')
+    medication_b = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='+')
+    severity = models.CharField(max_length=10, choices=SEVERITY_CHOICES)
+    description = models.TextField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication_a', 'medication_b'], name='unique_drug_interaction'),
+            models.CheckConstraint(condition=models.Q(medication_a__lt=models.F('medication_b')), name='drug_interaction_order'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.medication_a_id and self.medication_b_id and self.medication_a_id > self.medication_b_id:
+            self.medication_a_id, self.medication_b_id = self.medication_b_id, self.medication_a_id
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.medication_a} + {self.medication_b} ({self.severity})"
+
+
+class VitalsMeasurement(models.Model):
+    """
+    One observation of a patient's vitals in typed columns. Append-only: a
+    change is a new row, so the history is kept and analytics can load whole
+    columns. Record them through main.vitals.
+    """
+    SOURCE_CHOICES = (
+        ('profile', 'Profile'),
+        ('import', 'Import'),
+        ('clinic', 'Clinic'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='vitals')
+    measured_at = models.DateTimeField(default=timezone.now)
+    height_cm = models.FloatField(null=True, blank=True)
+    weight_kg = models.FloatField(null=True, blank=True)
+    bmi = models.FloatField(null=True, blank=True)
+    systolic = models.PositiveSmallIntegerField(null=True, blank=True)
+    diastolic = models.PositiveSmallIntegerField(null=True, blank=True)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default='clinic')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'measured_at'], name='vitals_patient_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Vitals measurements are append-only; record a new measurement instead")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.patient} {self.measured_at:%Y-%m-%d %H:%M}"
+
+
+# Materialized admin analytics, refreshed by main.aggregates.refresh_aggregates
+
+
+class DailyRegistrations(models.Model):
+    """Accounts of one role registered on one day"""
+    id = models.BigAutoField(primary_key=True)
+    role = models.CharField(max_length=20)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'day'], name='unique_daily_registrations'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_registrations_day_idx'),
+        ]
+
+
+class SummaryCount(models.Model):
+    """A current total: accounts per role, doctors per speciality, incomplete profiles per role"""
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=20)
+    key = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_summary_count'),
+        ]
+
+
+class AggregateMember(models.Model):
+    """
+    What one account currently contributes to SummaryCount, so a refresh can
+    move it between buckets when it changes without rescanning the table
+    """
+    id = models.BigAutoField(primary_key=True)
+    role = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    speciality = models.CharField(max_length=100, null=True, blank=True)
+    incomplete = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'object_id'], name='unique_aggregate_member'),
+        ]
+
+
+class AggregateTombstone(models.Model):
+    """A deleted account whose contribution the next refresh still has to remove"""
+    id = models.BigAutoField(primary_key=True)
+    role = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+
+
+class AggregateWatermark(models.Model):
+    """How far a refresh has read one role's table"""
+    role = models.CharField(max_length=20, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
@@ -0,0 +1,243 @@
+import statistics
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .bench import seed_doctors, seed_patients
+from .credentials import hash_password
+from .models import Doctor, MediAdmin, Patient, Pharmacist, Users
+from .principal import SESSION_KEYS
+
+PASSWORD = 'perf-password'
+
+# Settings the suite runs under: a cheap hash so login measures the view, not
+# PBKDF2, and the host the clients send whether or not DEBUG is on
+PERF_SETTINGS = {'CREDENTIAL_HASH_ITERATIONS': 1000, 'ALLOWED_HOSTS': ['localhost']}
+
+# Most queries each scenario may run, whatever the table sizes. Measured with
+# a warm principal cache (the session lookup plus the ETag's updated_at for a
+# dashboard); raise one only alongside the change that needs it.
+QUERY_BUDGETS = {
+    'login': 6,
+    'admin_dashboard': 4,  # + the summary counts and registrations per day
+    'patient_dashboard': 2,
+    'doctor_dashboard': 2,
+    'pharmacist_dashboard': 5,
+    'patient_profile_get': 2,
+    'patient_profile_post': 10,  # + the appended vitals row when height or weight changes
+    'admin_profile_get': 2,
+    'admin_profile_post': 7,
+    'pharmacist_profile_get': 2,
+    'pharmacist_profile_post': 11,
+    'doctor_profile_get': 2,
+    'doctor_profile_post': 11,
+    'manage_doctors_list': 2,
+    'manage_doctors_add': 14,
+    'manage_doctors_edit': 13,
+    'manage_doctors_delete': 11,  # + availability, appointments, prescriptions, the aggregates tombstone
+}
+
+# Differences below these are noise, whatever the tolerance says
+MIN_LATENCY_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KIB = 64
+
+
+class PerfFixture:
+    """One account per role on top of a seeded population"""
+
+    def __init__(self):
+        self.size = 0
+        password = hash_password(PASSWORD)
+        self.admin = MediAdmin.objects.create(email='perf-admin@bench.mediwise', password=password)
+        self.patient = Patient.objects.create(
+            user=Users.objects.create(role='patient'), first_name='Perf', last_name='Patient',
+            password=password, email='perf-patient@bench.mediwise', gender='female',
+        )
+        self.pharmacist = Pharmacist.objects.create(
+            user=Users.objects.create(role='pharmacist'), first_name='Perf', last_name='Pharmacist',
+            password=password, email='perf-pharmacist@bench.mediwise', license_number='PERF-1',
+            phone_number='0', address='Perf',
+        )
+        self.doctor = Doctor.objects.create(
+            user=Users.objects.create(role='doctor'), first_name='Perf', last_name='Doctor',
+            password=password, email='perf-doctor@bench.mediwise', phone_number='0',
+            speciality='Cardiology', qualification='MD',
+        )
+        self.accounts = {'admin': self.admin, 'patient': self.patient, 'pharmacist': self.pharmacist, 'doctor': self.doctor}
+
+    def grow(self, size):
+        """Seed patients and doctors up to `size` of each"""
+        seed_patients(self.size, size)
+        seed_doctors(self.size, size)
+        self.size = size
+        # Doctors the delete scenario may remove, newest first so the directory page changes
+        self.disposable_doctors = list(
+            Doctor.objects.filter(email__endswith='@bench.mediwise', user__isnull=True)
+            .order_by('-id').values_list('id', flat=True)[:200]
+        )
+
+    def client(self, role):
+        """A fresh client, logged in as `role` (anonymous for None), so no flash messages carry over"""
+        client = Client(HTTP_HOST='localhost')
+        if role:
+            session = client.session
+            session[SESSION_KEYS[role]] = self.accounts[role].pk
+            session.save()
+        return client
+
+
+class Scenario:
+    def __init__(self, name, role, method, url_name, data=None):
+        self.name = name
+        self.role = role
+        self.method = method
+        self.url_name = url_name
+        self.data = data
+
+    def request(self, client, fixture, iteration):
+        url = reverse(self.url_name)
+        if self.method == 'POST':
+            response = client.post(url, self.data(fixture, iteration))
+        else:
+            response = client.get(url)
+        if response.status_code >= 400:
+            raise AssertionError(f"{self.name}: {self.method} {url} returned {response.status_code}")
+        return response
+
+
+def _doctor_form(doctor, **extra):
+    return {
+        'first_name': doctor.first_name, 'last_name': doctor.last_name, 'email': doctor.email,
+        'phone_number': doctor.phone_number, 'speciality': doctor.speciality,
+        'qualification': doctor.qualification, **extra,
+    }
+
+
+SCENARIOS = [
+    Scenario('login', None, 'POST', 'login', lambda f, i: {'email': f.patient.email, 'password': PASSWORD}),
+    Scenario('admin_dashboard', 'admin', 'GET', 'admin_dashboard'),
+    Scenario('patient_dashboard', 'patient', 'GET', 'patient_dashboard'),
+    Scenario('doctor_dashboard', 'doctor', 'GET', 'doctor_dashboard'),
+    Scenario('pharmacist_dashboard', 'pharmacist', 'GET', 'pharmacist_dashboard'),
+    Scenario('patient_profile_get', 'patient', 'GET', 'update_profile'),
+    Scenario('patient_profile_post', 'patient', 'POST', 'update_profile', lambda f, i: {
+        'first_name': 'Perf', 'last_name': 'Patient', 'email': f.patient.email, 'gender': 'female',
+        'height': '170', 'weight': str(60 + i % 20),
+    }),
+    Scenario('admin_profile_get', 'admin', 'GET', 'admin_profile'),
+    Scenario('admin_profile_post', 'admin', 'POST', 'admin_profile', lambda f, i: {'email': f.admin.email, 'password': ''}),
+    Scenario('pharmacist_profile_get', 'pharmacist', 'GET', 'pharmacist_profile'),
+    Scenario('pharmacist_profile_post', 'pharmacist', 'POST', 'pharmacist_profile', lambda f, i: {
+        'first_name': 'Perf', 'last_name': 'Pharmacist', 'email': f.pharmacist.email,
+        'phone_number': str(i), 'license_number': 'PERF-1', 'address': 'Perf',
+    }),
+    Scenario('doctor_profile_get', 'doctor', 'GET', 'doctor_profile'),
+    Scenario('doctor_profile_post', 'doctor', 'POST', 'doctor_profile', lambda f, i: _doctor_form(
+        f.doctor, phone_number=str(i), address='Perf', description='Perf',
+    )),
+    Scenario('manage_doctors_list', 'admin', 'GET', 'manage_doctors'),
+    Scenario('manage_doctors_add', 'admin', 'POST', 'manage_doctors', lambda f, i: {
+        'action': 'add', 'first_name': 'Added', 'last_name': f'Doctor{i}', 'email': f'perf-add-{f.size}-{i}@bench.mediwise',
+        'phone_number': '0', 'speciality': 'Neurology', 'qualification': 'MD', 'password': PASSWORD,
+    }),
+    Scenario('manage_doctors_edit', 'admin', 'POST', 'manage_doctors', lambda f, i: {
+        'action': 'edit', 'doctor_id': f.doctor.pk, **_doctor_form(f.doctor, phone_number=str(i)),
+    }),
+    Scenario('manage_doctors_delete', 'admin', 'POST', 'manage_doctors', lambda f, i: {
+        'action': 'delete', 'doctor_id': f.disposable_doctors.pop(0),
+    }),
+]
+
+
+def count_queries(scenario, client, fixture, iteration=0):
+    with CaptureQueriesContext(connection) as queries:
+        scenario.request(client, fixture, iteration)
+    return len(queries)
+
+
+def measure(scenario, fixture, repeat=5):
+    """
+    Steady-state cost of one scenario: a warm-up request, then the query
+    count, the best and median wall time of `repeat` requests and the peak
+    memory allocated by one more (traced separately, since tracing slows
+    everything)
+    """
+    client = fixture.client(scenario.role)
+    scenario.request(client, fixture, 0)
+    queries = count_queries(scenario, client, fixture, 1)
+    samples = []
+    for iteration in range(2, repeat + 2):
+        start = time.perf_counter()
+        scenario.request(client, fixture, iteration)
+        samples.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    try:
+        scenario.request(client, fixture, repeat + 2)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': queries,
+        'best_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def relative_speed(baseline, results):
+    """
+    How fast this run's views were next to the baseline's: the median over
+    every scenario of best time now / best time then. The views themselves
+    are the workload, so a faster or busier machine moves the expectation by
+    what it actually did to them; a scenario is only a regression when it
+    slowed down more than the rest. (A change slowing every view alike looks
+    like a slower machine, which the query counts and budgets still catch
+    for the usual causes.)
+    """
+    ratios = [
+        stats['best_ms'] / before['best_ms']
+        for scale, scenarios in results.items()
+        for name, stats in scenarios.items()
+        if (before := baseline.get(scale, {}).get(name)) and before['best_ms'] > 0
+    ]
+    return round(statistics.median(ratios), 3) if ratios else 1.0
+
+
+def over_budget(results):
+    """'scenario: n queries > budget' for every scenario that exceeds QUERY_BUDGETS"""
+    return [
+        f"{name}: {stats['queries']} queries > budget {QUERY_BUDGETS[name]}"
+        for name, stats in results.items()
+        if stats['queries'] > QUERY_BUDGETS[name]
+    ]
+
+
+def regressions(baseline, results, tolerance, speed=1.0):
+    """
+    Compare {scale: {scenario: stats}} results with a baseline. Any extra
+    query is a regression; latency and memory only past the tolerance
+    (0.25 = 25% worse) and the noise floors. Latency compares the best run,
+    which other load on the machine can only make slower, after scaling the
+    baseline by `speed` (see relative_speed).
+    """
+    found = []
+    for scale, scenarios in results.items():
+        for name, stats in scenarios.items():
+            before = baseline.get(scale, {}).get(name)
+            if before is None:
+                continue
+            label = f"{name} @ {scale}"
+            if stats['queries'] > before['queries']:
+                found.append(f"{label}: {before['queries']} -> {stats['queries']} queries")
+            expected_ms = before['best_ms'] * speed
+            if (stats['best_ms'] > expected_ms * (1 + tolerance)
+                    and stats['best_ms'] - expected_ms > MIN_LATENCY_DELTA_MS):
+                found.append(f"{label}: best {expected_ms:.2f}ms -> {stats['best_ms']:.2f}ms")
+            if (stats['peak_kib'] > before['peak_kib'] * (1 + tolerance)
+                    and stats['peak_kib'] - before['peak_kib'] > MIN_MEMORY_DELTA_KIB):
+                found.append(f"{label}: {before['peak_kib']:.0f}KiB -> {stats['peak_kib']:.0f}KiB peak")
+    return found
@@ -0,0 +1,200 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Order, OrderItem, PharmacyCounters, PharmacyDailySales, Prescription, Stock, StockMovement
+
+LOW_STOCK_LIST_SIZE = 5
+RECENT_CUSTOMERS_SIZE = 3
+SALES_WINDOW_DAYS = 7
+
+
+class InsufficientStock(ValueError):
+    """Raised when a movement would take a stock quantity below zero"""
+
+
+def _increment(model, lookup, **changes):
+    """F() increments on a counter row, creating the row the first time"""
+    expressions = {field: F(field) + delta for field, delta in changes.items()}
+    if not model.objects.filter(**lookup).update(**expressions):
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**expressions)
+
+
+def _bump_counters(pharmacist_id, **changes):
+    _increment(PharmacyCounters, {'pharmacist_id': pharmacist_id}, **changes)
+
+
+def bump_pending_prescriptions(pharmacist_id, change):
+    _bump_counters(pharmacist_id, prescriptions_pending=change)
+
+
+def _bump_daily_sales(pharmacist_id, day, orders, amount):
+    _increment(
+        PharmacyDailySales, {'pharmacist_id': pharmacist_id, 'day': day},
+        order_count=orders, sales_total=amount,
+    )
+
+
+def _locked_stock(pharmacist, medication):
+    """Lock the stock row and report whether it counted as low before this change"""
+    stock, created = Stock.objects.select_for_update().get_or_create(pharmacist=pharmacist, medication=medication)
+    # A row that did not exist yet was not in the counter
+    return stock, stock.is_low and not created
+
+
+@transaction.atomic
+def move_stock(pharmacist, medication, change, reason='adjustment'):
+    """
+    Add (or with a negative change, remove) units of a medication and keep
+    the low stock counter in step when the row crosses its reorder level
+    """
+    stock, was_low = _locked_stock(pharmacist, medication)
+    if stock.quantity + change < 0:
+        raise InsufficientStock(f"Only {stock.quantity} of {medication} in stock")
+    stock.quantity += change
+    stock.save(update_fields=['quantity', 'updated_at'])
+    StockMovement.objects.create(stock=stock, change=change, reason=reason)
+    if stock.is_low != was_low:
+        _bump_counters(stock.pharmacist_id, low_stock_count=1 if stock.is_low else -1)
+    return stock
+
+
+@transaction.atomic
+def set_reorder_level(pharmacist, medication, level):
+    stock, was_low = _locked_stock(pharmacist, medication)
+    stock.reorder_level = level
+    stock.save(update_fields=['reorder_level', 'updated_at'])
+    if stock.is_low != was_low:
+        _bump_counters(stock.pharmacist_id, low_stock_count=1 if stock.is_low else -1)
+    return stock
+
+
+@transaction.atomic
+def place_order(pharmacist, items, customer_name, customer_contact=None, patient=None):
+    """
+    Sell `items` ((medication, quantity) pairs) to a customer. Stock, the
+    low stock counter and today's sales bucket change in the same transaction.
+    """
+    order = Order.objects.create(
+        pharmacist=pharmacist, patient=patient,
+        customer_name=customer_name, customer_contact=customer_contact,
+    )
+    total = Decimal('0')
+    lines = []
+    for medication, quantity in items:
+        move_stock(pharmacist, medication, -quantity, reason='sale')
+        lines.append(OrderItem(order=order, medication=medication, quantity=quantity, unit_price=medication.unit_price))
+        total += medication.unit_price * quantity
+    OrderItem.objects.bulk_create(lines)
+    order.total = total
+    order.save(update_fields=['total'])
+    _bump_daily_sales(pharmacist.pk, timezone.localdate(order.created_at), 1, total)
+    return order
+
+
+@transaction.atomic
+def cancel_order(order):
+    """Put the items back on the shelf and take the order out of its day's totals"""
+    order = Order.objects.select_for_update().get(pk=order.pk)
+    if order.status == 'cancelled':
+        return order
+    for item in order.items.select_related('medication'):
+        move_stock(order.pharmacist, item.medication, item.quantity, reason='return')
+    order.status = 'cancelled'
+    order.save(update_fields=['status'])
+    _bump_daily_sales(order.pharmacist_id, timezone.localdate(order.created_at), -1, -order.total)
+    return order
+
+
+def _last_visit(moment, today):
+    days = (today - timezone.localdate(moment)).days
+    if days <= 0:
+        return 'Today'
+    if days == 1:
+        return 'Yesterday'
+    return f"{days} days ago"
+
+
+def _summary_queries(pharmacist, today):
+    counters = PharmacyCounters.objects.filter(pharmacist=pharmacist)
+    sales = PharmacyDailySales.objects.filter(
+        pharmacist=pharmacist, day__gt=today - timedelta(days=SALES_WINDOW_DAYS), day__lte=today,
+    ).values_list('day', 'order_count', 'sales_total')
+    recent = (
+        Order.objects.filter(pharmacist=pharmacist, status='completed')
+        .order_by('-created_at')
+        .values('customer_name', 'customer_contact', 'created_at')[:RECENT_CUSTOMERS_SIZE]
+    )
+    low_stock = (
+        Stock.objects.filter(pharmacist=pharmacist, quantity__lte=F('reorder_level'))
+        .order_by('quantity')
+        .values('medication__name', 'quantity')[:LOW_STOCK_LIST_SIZE]
+    )
+    return counters, sales, recent, low_stock
+
+
+def _summary(today, counters, sales, recent, low_stock):
+    today_orders, weekly_sales = 0, Decimal('0')
+    for day, order_count, sales_total in sales:
+        weekly_sales += sales_total
+        if day == today:
+            today_orders = order_count
+    return {
+        'prescriptions_pending': counters.prescriptions_pending if counters else 0,
+        'medications_low_stock': counters.low_stock_count if counters else 0,
+        'today_orders': today_orders,
+        'weekly_sales': weekly_sales,
+        'recent_customers': [
+            {'name': row['customer_name'], 'contact': row['customer_contact'] or '', 'last_visit': _last_visit(row['created_at'], today)}
+            for row in recent
+        ],
+        'low_stock_medications': [
+            {'name': row['medication__name'], 'quantity': row['quantity']}
+            for row in low_stock
+        ],
+    }
+
+
+def dashboard_summary(pharmacist):
+    """
+    Everything the pharmacist dashboard shows, read from the counter and
+    daily tables plus two LIMITed index scans, so the cost does not grow
+    with the order history
+    """
+    today = timezone.localdate()
+    counters, sales, recent, low_stock = _summary_queries(pharmacist, today)
+    return _summary(today, counters.first(), list(sales), list(recent), list(low_stock))
+
+
+async def adashboard_summary(pharmacist):
+    """dashboard_summary for async views: the same four queries through the async ORM"""
+    today = timezone.localdate()
+    counters, sales, recent, low_stock = _summary_queries(pharmacist, today)
+    return _summary(
+        today, await counters.afirst(),
+        [row async for row in sales], [row async for row in recent], [row async for row in low_stock],
+    )
+
+
+@transaction.atomic
+def recount_counters(pharmacist):
+    """Rebuild a pharmacist's counters and daily buckets from the source tables"""
+    low = Stock.objects.filter(pharmacist=pharmacist, quantity__lte=F('reorder_level')).count()
+    pending = Prescription.objects.filter(pharmacist=pharmacist, status='pending').count()
+    PharmacyCounters.objects.update_or_create(
+        pharmacist=pharmacist, defaults={'low_stock_count': low, 'prescriptions_pending': pending},
+    )
+    PharmacyDailySales.objects.filter(pharmacist=pharmacist).delete()
+    buckets = {}
+    for created_at, total in Order.objects.filter(pharmacist=pharmacist, status='completed').values_list('created_at', 'total').iterator():
+        day = timezone.localdate(created_at)
+        count, amount = buckets.get(day, (0, Decimal('0')))
+        buckets[day] = (count + 1, amount + total)
+    PharmacyDailySales.objects.bulk_create(
+        PharmacyDailySales(pharmacist=pharmacist, day=day, order_count=count, sales_total=amount)
+        for day, (count, amount) in buckets.items()
+    )
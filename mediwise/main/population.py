@@ -0,0 +1,131 @@
+import numpy as np
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Patient, VitalsMeasurement
+
+# Population statistics over everyone's latest vitals. The rows are read once
+# into one NumPy array per column and everything after that (latest row per
+# patient, age, bands, grouping, histograms, percentiles) is array arithmetic.
+
+BMI_BINS = (0, 18.5, 25, 30, 35, 40, np.inf)
+BMI_LABELS = ('underweight', 'normal', 'overweight', 'obese I', 'obese II', 'obese III')
+AGE_BANDS = (0, 18, 30, 45, 60, 75)
+AGE_LABELS = ('0-17', '18-29', '30-44', '45-59', '60-74', '75+')
+UNKNOWN = 'unknown'
+
+GROUPINGS = ('blood_group', 'age_band', 'gender')
+
+CHUNK_SIZE = 10000
+
+
+def load_latest_bmi():
+    """
+    Columns for every patient's most recent measurement with a BMI:
+    {'bmi': float64, 'blood_group': str, 'gender': str, 'date_of_birth': datetime64[D]}
+    """
+    rows = (
+        VitalsMeasurement.objects.filter(bmi__isnull=False)
+        .order_by('patient_id', 'measured_at', 'id')
+        .values_list(
+            'patient_id', 'bmi',
+            Coalesce('patient__blood_group', Value('')), Coalesce('patient__gender', Value('')),
+            'patient__date_of_birth',
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    patient_ids, bmis, blood_groups, genders, births = list(zip(*rows)) or [()] * 5
+    patient_ids = np.array(patient_ids, dtype=np.int64)
+    # Sorted by patient then time, so a patient's latest row is the last before the id changes
+    latest = np.flatnonzero(np.append(patient_ids[1:] != patient_ids[:-1], True)) if len(patient_ids) else []
+    return {
+        'bmi': np.array(bmis, dtype=np.float64)[latest],
+        'blood_group': np.array(blood_groups, dtype=str)[latest],
+        'gender': np.array(genders, dtype=str)[latest],
+        # None becomes NaT
+        'date_of_birth': np.array(births, dtype='datetime64[D]')[latest],
+    }
+
+
+def patients_without_vitals():
+    """How many patients have no measurement at all"""
+    return Patient.objects.filter(vitals__isnull=True).count()
+
+
+def _year_month_day(dates):
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    days = (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1
+    return years, months, days
+
+
+def age_bands(births, today=None):
+    """AGE_LABELS band (or UNKNOWN) for an array of birth dates"""
+    today = np.datetime64(today or timezone.localdate(), 'D')
+    known = ~np.isnat(births)
+    year, month, day = _year_month_day(births[known])
+    this_year, this_month, this_day = _year_month_day(np.array([today]))
+    # Less one where this year's birthday is still to come
+    ages = this_year - year - ((month > this_month) | ((month == this_month) & (day > this_day)))
+    index = np.full(len(births), len(AGE_LABELS))
+    index[known] = np.searchsorted(AGE_BANDS, ages, side='right') - 1
+    return np.array(AGE_LABELS + (UNKNOWN,))[index]
+
+
+def _labels(values):
+    return np.where(values == '', UNKNOWN, values)
+
+
+def bmi_distribution(group_by=GROUPINGS, columns=None, today=None):
+    """
+    Per group of `group_by` (any of GROUPINGS): patient count, mean and
+    quartiles of BMI and the count in each BMI_LABELS band, largest groups first
+    """
+    columns = load_latest_bmi() if columns is None else columns
+    bmi = columns['bmi']
+    if not len(bmi):
+        return []
+    keys = {
+        'blood_group': _labels(np.char.upper(columns['blood_group'])),
+        'gender': _labels(columns['gender']),
+        'age_band': age_bands(columns['date_of_birth'], today),
+    }
+    # One integer per patient for its combination of labels, then dense group ids
+    codes = np.zeros(len(bmi), dtype=np.int64)
+    uniques = []
+    for name in group_by:
+        values, inverse = np.unique(keys[name], return_inverse=True)
+        codes = codes * len(values) + inverse.ravel()
+        uniques.append(values)
+    group_codes, group = np.unique(codes, return_inverse=True)
+    group = group.ravel()
+    groups = len(group_codes)
+
+    counts = np.bincount(group, minlength=groups)
+    means = np.bincount(group, weights=bmi, minlength=groups) / counts
+    band = np.searchsorted(BMI_BINS, bmi, side='right') - 1
+    bands = np.bincount(group * len(BMI_LABELS) + band, minlength=groups * len(BMI_LABELS)).reshape(groups, -1)
+
+    # Quartiles from one sort by (group, bmi): each group is then a contiguous run
+    ordered = bmi[np.lexsort((bmi, group))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    quartiles = {
+        name: ordered[starts + np.floor(q * (counts - 1)).astype(np.int64)]
+        for name, q in (('p25', 0.25), ('p50', 0.5), ('p75', 0.75))
+    }
+
+    results = []
+    for index in np.argsort(-counts, kind='stable'):
+        labels, code = {}, int(group_codes[index])
+        for name, values in zip(reversed(group_by), reversed(uniques)):
+            code, position = divmod(code, len(values))
+            labels[name] = str(values[position])
+        results.append({
+            **{name: labels[name] for name in group_by},
+            'patients': int(counts[index]),
+            'mean': round(float(means[index]), 1),
+            **{name: round(float(values[index]), 1) for name, values in quartiles.items()},
+            'bands': dict(zip(BMI_LABELS, bands[index].tolist())),
+        })
+    return results
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .interactions import check_interactions
+from .models import Patient, Prescription, PrescriptionItem
+from .pharmacy import bump_pending_prescriptions, move_stock
+
+# Interactions at or above this severity stop a prescription unless the
+# prescriber explicitly accepts them
+BLOCKING_SEVERITIES = ('major',)
+
+
+class InteractionFound(ValueError):
+    """Raised when a prescription has interactions the prescriber has not accepted"""
+
+    def __init__(self, interactions):
+        self.interactions = interactions
+        super().__init__(f"{len(interactions)} drug interaction(s) found")
+
+
+def active_medication_ids(patient, today=None):
+    """Medications the patient is currently taking, from pending and dispensed prescriptions"""
+    today = today or timezone.localdate()
+    return set(
+        PrescriptionItem.objects.filter(
+            prescription__patient=patient, prescription__status__in=('pending', 'dispensed'),
+        ).filter(Q(ends_on__isnull=True) | Q(ends_on__gte=today)).values_list('medication_id', flat=True)
+    )
+
+
+def prescription_interactions(patient, medication_ids):
+    """Interactions among the medications and with what the patient already takes, in one query"""
+    return check_interactions(medication_ids, active_medication_ids(patient))
+
+
+@transaction.atomic
+def prescribe(doctor, patient, items, pharmacist=None, notes=None, accept_interactions=False):
+    """
+    Prescribe `items` ((medication, dosage, quantity, days) tuples, days None
+    for ongoing) and queue it with a pharmacist. Raises InteractionFound for
+    major interactions unless accept_interactions is set.
+    """
+    # Held until commit, so two prescriptions for one patient can't each
+    # pass the check without seeing the other's medications
+    Patient.objects.select_for_update().only('pk').get(pk=patient.pk)
+    interactions = prescription_interactions(patient, [medication.pk for medication, *_ in items])
+    blocking = [hit for hit in interactions if hit.severity in BLOCKING_SEVERITIES]
+    if blocking and not accept_interactions:
+        raise InteractionFound(blocking)
+    prescription = Prescription.objects.create(doctor=doctor, patient=patient, pharmacist=pharmacist, notes=notes)
+    today = timezone.localdate()
+    PrescriptionItem.objects.bulk_create(
+        PrescriptionItem(
+            prescription=prescription, medication=medication, dosage=dosage, quantity=quantity,
+            ends_on=today + timedelta(days=days) if days else None,
+        )
+        for medication, dosage, quantity, days in items
+    )
+    if pharmacist is not None:
+        bump_pending_prescriptions(pharmacist.pk, 1)
+    prescription.interactions = interactions
+    return prescription
+
+
+def _locked(prescription):
+    return Prescription.objects.select_for_update().get(pk=prescription.pk)
+
+
+@transaction.atomic
+def dispense_prescription(prescription, pharmacist):
+    """Take the items out of the pharmacist's stock and close the prescription"""
+    prescription = _locked(prescription)
+    if prescription.status != 'pending':
+        return prescription
+    for item in prescription.items.select_related('medication'):
+        move_stock(pharmacist, item.medication, -item.quantity, reason='prescription')
+    if prescription.pharmacist_id is not None:
+        bump_pending_prescriptions(prescription.pharmacist_id, -1)
+    prescription.pharmacist = pharmacist
+    prescription.status = 'dispensed'
+    prescription.dispensed_at = timezone.now()
+    prescription.save(update_fields=['pharmacist', 'status', 'dispensed_at'])
+    return prescription
+
+
+@transaction.atomic
+def cancel_prescription(prescription):
+    prescription = _locked(prescription)
+    if prescription.status != 'pending':
+        return prescription
+    if prescription.pharmacist_id is not None:
+        bump_pending_prescriptions(prescription.pharmacist_id, -1)
+    prescription.status = 'cancelled'
+    prescription.save(update_fields=['status'])
+    return prescription
@@ -0,0 +1,176 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+from .identity import LOGIN_MODELS, ROLE_FOR_MODEL
+
+# Session key each role's login stores its row id under
+SESSION_KEYS = {
+    'admin': 'admin_id',
+    'patient': 'patient_id',
+    'pharmacist': 'pharmacist_id',
+    'doctor': 'doctor_id',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrincipalCache:
+    """Small thread-safe LRU of account rows keyed by (role, id), with a TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = PrincipalCache(
+    maxsize=getattr(settings, 'PRINCIPAL_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'PRINCIPAL_CACHE_TTL', 60),
+)
+
+
+def load_principal(role, object_id, fresh=False):
+    """
+    Return the account row for (role, id), from the cache when possible.
+    Callers get their own copy so form binding can't mutate the cached row.
+    """
+    key = (role, int(object_id))
+    principal = None if fresh else cache.get(key)
+    if principal is None:
+        principal = LOGIN_MODELS[role].objects.filter(pk=key[1]).first()
+        if principal is None:
+            cache.invalidate(key)
+            return None
+        cache.set(key, principal)
+    return copy.copy(principal)
+
+
+async def aload_principal(role, object_id, fresh=False):
+    """Async load_principal: the same cache, with afirst() on a miss"""
+    key = (role, int(object_id))
+    principal = None if fresh else cache.get(key)
+    if principal is None:
+        principal = await LOGIN_MODELS[role].objects.filter(pk=key[1]).afirst()
+        if principal is None:
+            cache.invalidate(key)
+            return None
+        cache.set(key, principal)
+    return copy.copy(principal)
+
+
+def invalidate_principal(instance):
+    cache.invalidate((ROLE_FOR_MODEL[type(instance)], instance.pk))
+
+
+def get_principal(request, role=None):
+    """Resolve the logged-in account for a role (or the first role found in the session)"""
+    # Writes always start from the database row so a stale cached copy is never saved back
+    fresh = request.method not in SAFE_METHODS
+    for candidate in ([role] if role else SESSION_KEYS):
+        object_id = request.session.get(SESSION_KEYS[candidate])
+        if object_id:
+            principal = load_principal(candidate, object_id, fresh=fresh)
+            if principal is not None or role:
+                return principal
+    return None
+
+
+async def aget_principal(request, role=None):
+    """get_principal for async views, using the async session API"""
+    fresh = request.method not in SAFE_METHODS
+    for candidate in ([role] if role else SESSION_KEYS):
+        object_id = await request.session.aget(SESSION_KEYS[candidate])
+        if object_id:
+            principal = await aload_principal(candidate, object_id, fresh=fresh)
+            if principal is not None or role:
+                return principal
+    return None
+
+
+class PrincipalMiddleware:
+    """
+    Attach request.principal, resolved lazily on first access. Works in
+    both sync and async stacks, so it never forces ASGI requests through
+    a thread; async views call aget_principal instead of touching it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.principal = SimpleLazyObject(lambda: get_principal(request))
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.principal = SimpleLazyObject(lambda: get_principal(request))
+        return await self.get_response(request)
+
+
+def principal_required(role):
+    """
+    Only let a logged-in account of the given role through, exposing it as
+    request.principal; everyone else is sent to the login page
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                principal = await aget_principal(request, role)
+                if principal is None:
+                    return redirect('login')
+                request.principal = principal
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            principal = get_principal(request, role)
+            if principal is None:
+                return redirect('login')
+            request.principal = principal
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,116 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Apps whose rows are read right after they are written on every request
+# (the session behind a fresh login), so they always stay on the primary
+PRIMARY_ONLY_APPS = {'sessions'}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _Routing:
+    """Per-request routing state: pinned to the primary, and whether anything was written"""
+
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_routing = ContextVar('mediwise_db_routing', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+class PrimaryReplicaRouter:
+    """
+    Reads made while serving a request go to a random replica unless the
+    request is pinned to the primary (it writes, or its client wrote within
+    REPLICA_PIN_SECONDS) or the primary is inside a transaction. Writes,
+    migrations and everything outside a request (commands, the shell) use
+    the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        state = _routing.get()
+        if state is None or state.pinned or state.wrote:
+            return DEFAULT_DB_ALIAS
+        # select_for_update() and reads that feed a write must see the primary
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin unsafe requests, and every request within REPLICA_PIN_SECONDS of one
+    that wrote, to the primary. The window is a short-lived cookie, so
+    deciding costs no query. Sync and async capable, like PrincipalMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = _routing.get()
+            _routing.reset(token)
+        return self._finish(state, response)
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = _routing.get()
+            _routing.reset(token)
+        return self._finish(state, response)
+
+    def _start(self, request):
+        pinned = request.method not in SAFE_METHODS or settings.REPLICA_PIN_COOKIE in request.COOKIES
+        return _routing.set(_Routing(pinned))
+
+    def _finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
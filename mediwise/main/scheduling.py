@@ -0,0 +1,235 @@
+import bisect
+import heapq
+import threading
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import MAX_SLOT_MINUTES, Appointment, Doctor, DoctorAvailability
+from .versions import bump_version, current_version
+
+# Free slots are found by sweeping a day's working windows in start order (a
+# heap merge of their slot sequences). Doctors with the same hours share one
+# window entry, so each step of the sweep is one start minute for a whole
+# group of doctors, checked against the day's bookings in memory (read with
+# one query per day) instead of a query per slot per doctor.
+
+SEARCH_HORIZON_DAYS = 28
+
+_VERSION_NAME = 'availability'
+
+
+class SlotUnavailable(ValueError):
+    """Raised when a slot is not offered by the doctor or is already booked"""
+
+
+def availability_version():
+    return current_version(_VERSION_NAME)
+
+
+def bump_availability_version():
+    """Called when a window or a doctor changes, so every process rebuilds its index"""
+    bump_version(_VERSION_NAME)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _build_index(rows):
+    """weekday -> [(start minute, end minute, slot minutes, doctor ids)] sorted by start"""
+    shapes = {}
+    for doctor_id, weekday, start, end, slot in rows:
+        shapes.setdefault((weekday, _minutes(start), _minutes(end), slot), []).append(doctor_id)
+    index = {}
+    for (weekday, start, end, slot), doctor_ids in shapes.items():
+        index.setdefault(weekday, []).append((start, end, slot, tuple(sorted(doctor_ids))))
+    for windows in index.values():
+        windows.sort()
+    return index
+
+
+_WINDOW_FIELDS = ('doctor_id', 'weekday', 'start_time', 'end_time', 'slot_minutes')
+
+# speciality -> (version, index), for this process only
+_speciality_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def speciality_index(speciality):
+    version = availability_version()
+    with _indexes_lock:
+        cached = _speciality_indexes.get(speciality)
+    if cached and cached[0] == version:
+        return cached[1]
+    index = _build_index(
+        DoctorAvailability.objects.filter(doctor__speciality=speciality).values_list(*_WINDOW_FIELDS)
+    )
+    with _indexes_lock:
+        _speciality_indexes[speciality] = (version, index)
+    return index
+
+
+def doctor_index(doctor):
+    return _build_index(DoctorAvailability.objects.filter(doctor=doctor).values_list(*_WINDOW_FIELDS))
+
+
+def _first_slot(window, minute):
+    """The first slot start of a window at or after `minute`, or None"""
+    start, end, slot, _ = window
+    if minute > start:
+        start += -(-(minute - start) // slot) * slot
+    return start if start + slot <= end else None
+
+
+class _DayBookings:
+    """
+    Busy doctors from the bookings of the day being swept, read with one
+    query when the sweep reaches that day and checked in memory: per doctor,
+    the last booking starting before the slot ends overlaps it if it ends
+    after the slot starts (one doctor's bookings never overlap each other)
+    """
+
+    def __init__(self, booked):
+        self.booked = booked
+        self.day_start = None
+
+    def _load(self, day_start):
+        self.day_start = day_start
+        self.by_doctor = {}
+        rows = self.booked.filter(
+            start__gt=day_start - timedelta(minutes=MAX_SLOT_MINUTES), start__lt=day_start + timedelta(days=1),
+        ).values_list('doctor_id', 'start', 'end')
+        for doctor_id, start, end in rows:
+            self.by_doctor.setdefault(doctor_id, []).append((start, end))
+        for doctor_id, intervals in self.by_doctor.items():
+            intervals.sort()
+            self.by_doctor[doctor_id] = ([start for start, _ in intervals], [end for _, end in intervals])
+
+    def busy(self, start, end, doctor_ids):
+        day_start = timezone.make_aware(datetime.combine(timezone.localdate(start), time.min))
+        if day_start != self.day_start:
+            self._load(day_start)
+        busy = set()
+        for doctor_id in doctor_ids & self.by_doctor.keys():
+            starts, ends = self.by_doctor[doctor_id]
+            last = bisect.bisect_left(starts, end) - 1
+            if last >= 0 and ends[last] > start:
+                busy.add(doctor_id)
+        return busy
+
+
+def _day_slots(windows, day, bookings, after):
+    day_start = timezone.make_aware(datetime.combine(day, time.min))
+    first_minute = 0
+    if after is not None and after > day_start:
+        first_minute = -(-(after - day_start) // timedelta(minutes=1))
+    heap = []
+    for window in windows:
+        start = _first_slot(window, first_minute)
+        if start is not None:
+            heap.append((start, window))
+    heapq.heapify(heap)
+    while heap:
+        # Every window with a slot starting at this minute, by slot length
+        minute = heap[0][0]
+        groups = {}
+        while heap and heap[0][0] == minute:
+            window = heap[0][1]
+            _, end, slot, doctor_ids = window
+            groups.setdefault(slot, set()).update(doctor_ids)
+            if minute + 2 * slot <= end:
+                heapq.heapreplace(heap, (minute + slot, window))
+            else:
+                heapq.heappop(heap)
+        start = day_start + timedelta(minutes=minute)
+        for slot, doctor_ids in sorted(groups.items()):
+            end = start + timedelta(minutes=slot)
+            busy = bookings.busy(start, end, doctor_ids)
+            for doctor_id in sorted(doctor_ids - busy):
+                yield doctor_id, start, end
+
+
+def _sweep(index, bookings, start_date, end_date, after):
+    day = start_date
+    while day <= end_date:
+        windows = index.get(day.weekday())
+        if windows:
+            yield from _day_slots(windows, day, bookings, after)
+        day += timedelta(days=1)
+
+
+def free_slots(doctor, start_date, end_date, after=None):
+    """(start, end) of every free slot of one doctor from start_date to end_date inclusive"""
+    after = timezone.now() if after is None else after
+    bookings = _DayBookings(Appointment.objects.filter(doctor=doctor, status='booked'))
+    return [(start, end) for _, start, end in _sweep(doctor_index(doctor), bookings, start_date, end_date, after)]
+
+
+def speciality_slots(speciality, start_date, end_date, after=None):
+    """Free slots of every doctor of a speciality as (doctor id, start, end), earliest first"""
+    after = timezone.now() if after is None else after
+    bookings = _DayBookings(Appointment.objects.filter(doctor__speciality=speciality, status='booked'))
+    return _sweep(speciality_index(speciality), bookings, start_date, end_date, after)
+
+
+def next_free_slot(speciality, after=None, horizon_days=SEARCH_HORIZON_DAYS):
+    """The earliest free (doctor id, start, end) of a speciality, or None within the horizon"""
+    after = timezone.now() if after is None else after
+    first_day = timezone.localdate(after)
+    slots = speciality_slots(speciality, first_day, first_day + timedelta(days=horizon_days - 1), after)
+    return next(slots, None)
+
+
+def _slot_length(doctor, start):
+    """Minutes of the availability slot beginning at `start`, or None if there is none"""
+    local = timezone.localtime(start)
+    if local.second or local.microsecond:
+        return None
+    minute = _minutes(local)
+    for window in doctor_index(doctor).get(local.weekday(), ()):
+        if _first_slot(window, minute) == minute:
+            return window[2]
+    return None
+
+
+def check_slot(doctor, start, exclude=None):
+    """
+    The end of the doctor's slot starting at `start`. Raises SlotUnavailable
+    if there is no such slot or another booking (other than `exclude`) overlaps it.
+    """
+    length = _slot_length(doctor, start)
+    if length is None:
+        raise SlotUnavailable(f"{doctor} has no slot at {timezone.localtime(start):%Y-%m-%d %H:%M}")
+    end = start + timedelta(minutes=length)
+    overlapping = Appointment.objects.filter(doctor=doctor, status='booked', start__lt=end, end__gt=start)
+    if exclude is not None:
+        overlapping = overlapping.exclude(pk=exclude.pk)
+    if overlapping.exists():
+        raise SlotUnavailable("That slot is already booked")
+    return end
+
+
+@transaction.atomic
+def book_appointment(doctor, patient, start):
+    """
+    Book the slot of `doctor` starting at `start` for `patient`. Concurrent
+    bookings of one doctor are serialized on the doctor row and the partial
+    unique constraint catches anything that still slips through.
+    """
+    if start < timezone.now():
+        raise SlotUnavailable("That slot is in the past")
+    Doctor.objects.select_for_update().only('id').get(pk=doctor.pk)
+    end = check_slot(doctor, start)
+    try:
+        with transaction.atomic():
+            return Appointment.objects.create(doctor=doctor, patient=patient, start=start, end=end)
+    except IntegrityError:
+        raise SlotUnavailable("That slot is already booked")
+
+
+def cancel_appointment(appointment):
+    appointment.status = 'cancelled'
+    appointment.save(update_fields=['status'])
+    return appointment
@@ -0,0 +1,159 @@
+import re
+
+from django.db import connection
+
+from .models import Doctor, Patient, Pharmacist
+
+# FTS5 virtual table (created by migration 0009 on SQLite). The rowid packs
+# the role and the row id together so a profile's entry can be replaced by
+# rowid without scanning the index.
+SEARCH_TABLE = 'main_search'
+
+ROLE_CODES = {'doctor': 1, 'patient': 2, 'pharmacist': 3}
+CODE_ROLES = {code: role for role, code in ROLE_CODES.items()}
+SEARCH_MODELS = {Doctor: 'doctor', Patient: 'patient', Pharmacist: 'pharmacist'}
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TOKENS = 8
+
+# Typeahead only looks at this many matches per keystroke
+TYPEAHEAD_CANDIDATES = 256
+
+# kind, name, details, summary: matches on the name outrank matches in the details
+RANK_EXPRESSION = f"bm25({SEARCH_TABLE}, 0.0, 10.0, 1.0, 0.0)"
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def make_rowid(role, object_id):
+    return object_id * 4 + ROLE_CODES[role]
+
+
+def split_rowid(rowid):
+    return CODE_ROLES[rowid % 4], rowid // 4
+
+
+def _join(*parts):
+    return ' '.join(str(part) for part in parts if part)
+
+
+def document_for(instance):
+    """(rowid, kind, name, details, summary) row for a profile"""
+    role = SEARCH_MODELS[type(instance)]
+    name = _join(instance.first_name, instance.last_name)
+    if role == 'doctor':
+        details = _join(instance.speciality, instance.qualification, instance.cureentHospital, instance.description)
+        summary = _join(instance.speciality, instance.cureentHospital and f"· {instance.cureentHospital}")
+    elif role == 'pharmacist':
+        details = _join(instance.email, instance.license_number, instance.phone_number)
+        summary = instance.email
+    else:
+        details = _join(instance.email, instance.phone_number)
+        summary = instance.email or ''
+    return make_rowid(role, instance.pk), role, name, details, summary
+
+
+def index_instance(instance):
+    if not search_enabled():
+        return
+    row = document_for(instance)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [row[0]])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, name, details, summary) VALUES (%s, %s, %s, %s, %s)",
+            row,
+        )
+
+
+def unindex_instance(instance):
+    if not search_enabled():
+        return
+    rowid = make_rowid(SEARCH_MODELS[type(instance)], instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [rowid])
+
+
+def index_batch(instances):
+    """Insert many documents with one executemany (used by the rebuild command)"""
+    rows = [document_for(instance) for instance in instances]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, kind, name, details, summary) VALUES (%s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def clear_index():
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())[:MAX_TOKENS]
+
+
+def build_match(tokens, role=None):
+    """
+    Turn query tokens into an FTS5 prefix query, e.g. ['car', 'smi'] ->
+    {name details} : ("car"* AND "smi"*). Returns None if nothing is searchable.
+    """
+    if not tokens:
+        return None
+    terms = ' AND '.join(f'"{token}"*' for token in tokens)
+    expression = f'{{name details}} : ({terms})'
+    if role:
+        expression = f'kind : {role} AND {expression}'
+    return expression
+
+
+def _typeahead_rows(cursor, tokens, match, limit):
+    # bm25 has to visit every posting of a prefix term to score it, which for a
+    # short prefix is most of the index. Typeahead instead takes the first
+    # TYPEAHEAD_CANDIDATES matches and orders them by how well the name matches.
+    cursor.execute(
+        f"SELECT rowid, name, summary FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s",
+        [match, TYPEAHEAD_CANDIDATES],
+    )
+    rows = cursor.fetchall()
+
+    def name_rank(row):
+        words = row[1].lower().split()
+        in_name = sum(any(word.startswith(token) for word in words) for token in tokens)
+        starts = bool(words) and words[0].startswith(tokens[0])
+        return (-in_name, not starts, len(row[1]))
+
+    rows.sort(key=name_rank)
+    return rows[:limit]
+
+
+def search(text, role=None, limit=10, typeahead=False):
+    """
+    Ranked prefix search; returns dicts with role, id, name and summary.
+    With typeahead=True ranking is bounded to the first TYPEAHEAD_CANDIDATES
+    matches so every keystroke costs about the same.
+    """
+    if role and role not in ROLE_CODES:
+        return []
+    tokens = tokenize(text)
+    match = build_match(tokens, role)
+    if match is None or not search_enabled():
+        return []
+    with connection.cursor() as cursor:
+        if typeahead:
+            rows = _typeahead_rows(cursor, tokens, match, limit)
+        else:
+            cursor.execute(
+                f"SELECT rowid, name, summary FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY {RANK_EXPRESSION} LIMIT %s",
+                [match, limit],
+            )
+            rows = cursor.fetchall()
+    results = []
+    for rowid, name, summary in rows:
+        role_name, object_id = split_rowid(rowid)
+        results.append({'role': role_name, 'id': object_id, 'name': name, 'summary': summary})
+    return results
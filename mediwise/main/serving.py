@@ -0,0 +1,185 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+# Precompressed variants written next to the original at collect time
+# (MediwiseStaticStorage.post_process), tried in this order
+ENCODINGS = (('gzip', '.gz'),)
+
+# Names that change whenever the content does: 12-hex manifest hashes
+# (app.3f9a1c2b4d5e.css) and 64-hex content addresses (profile pictures)
+VERSIONED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.|(?:^|/)[0-9a-f]{64}[._]')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """
+    A file positioned at the start of a byte range that reads no further than
+    its end. fileno() is passed through, so servers with wsgi.file_wrapper
+    (gunicorn, uWSGI) still hand the range to os.sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def accepted_encodings(request):
+    """Codings the client accepts, ignoring any offered with q=0"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip().replace(' ', '')
+        if coding and quality not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single byte range, None to send the whole file, or False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multipart ranges and malformed headers get the full response
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _etag(st):
+    return quote_etag(f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+
+def _cache_headers(response, path, max_age):
+    if VERSIONED_NAME_RE.search(path):
+        patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+
+
+def serve_file(request, root, path, max_age=3600, accel_prefix=None):
+    """
+    Serve `path` under `root`, picking a precompressed variant the client
+    accepts, answering conditional requests with 304 and single byte ranges
+    with 206. The body is a FileResponse (sendfile where the server supports
+    it). With accel_prefix the response is empty and carries X-Accel-Redirect,
+    so the fronting proxy sends the bytes.
+    """
+    try:
+        fullpath = safe_join(root, path)
+        st = os.stat(fullpath)
+    except (OSError, SuspiciousFileOperation):
+        # SuspiciousFileOperation from safe_join: path escapes root (../ etc.)
+        raise Http404("File not found")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("File not found")
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    if accel_prefix:
+        # The proxy does conditionals, ranges and its own gzip_static lookup
+        response = HttpResponse(content_type=content_type)
+        _cache_headers(response, path, max_age)
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + os.path.relpath(fullpath, root).replace(os.sep, '/')
+        return response
+
+    range_header = request.headers.get('Range') if request.method in ('GET', 'HEAD') else None
+    encoding, sendpath, sendstat = None, fullpath, st
+    # Ranges always address the identity bytes, so only whole-file responses are compressed
+    if not range_header:
+        accepted = accepted_encodings(request)
+        for coding, suffix in ENCODINGS:
+            if coding in accepted:
+                try:
+                    variant = os.stat(fullpath + suffix)
+                except OSError:
+                    continue
+                if variant.st_mtime >= st.st_mtime:
+                    encoding, sendpath, sendstat = coding, fullpath + suffix, variant
+                    break
+
+    etag = _etag(sendstat)
+    if encoding:
+        # A different representation needs its own validator
+        etag = etag[:-1] + f'-{encoding}"'
+
+    response = HttpResponse(content_type=content_type)
+    _cache_headers(response, path, max_age)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(sendstat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(sendstat.st_mtime), response=response)
+    if conditional is not response:
+        return conditional
+
+    size = sendstat.st_size
+    byte_range = None
+    if range_header and request.headers.get('If-Range', etag) in (etag, response['Last-Modified']):
+        byte_range = parse_range(range_header, size)
+    if byte_range is False:
+        response.status_code = 416
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(end - start + 1, 0)
+    body = RangeFile(open(sendpath, 'rb'), start, length)
+    file_response = FileResponse(body, content_type=content_type, status=206 if byte_range else 200)
+    for header, value in response.items():
+        file_response[header] = value
+    file_response['Content-Length'] = str(length)
+    if byte_range:
+        file_response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    if encoding:
+        file_response['Content-Encoding'] = encoding
+    return file_response
+
+
+def serve_static(request, path):
+    return serve_file(
+        request, settings.STATIC_ROOT, path,
+        accel_prefix=settings.SENDFILE_ACCEL_PREFIXES.get('static'),
+    )
+
+
+def serve_media(request, path):
+    return serve_file(
+        request, settings.MEDIA_ROOT, path,
+        max_age=settings.MEDIA_MAX_AGE,
+        accel_prefix=settings.SENDFILE_ACCEL_PREFIXES.get('media'),
+    )
@@ -0,0 +1,93 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import MediAdmin, Patient, Pharmacist, Doctor, DoctorAvailability, DrugInteraction
+from .identity import sync_identity, remove_identity
+from .principal import invalidate_principal
+from .fragments import bump_principal_version
+from .search import SEARCH_MODELS, index_instance, unindex_instance
+from .media import add_reference, drop_reference
+from .metrics import install_query_recorder
+from .scheduling import bump_availability_version
+from .interactions import bump_interactions_version
+from .aggregates import record_deletion
+
+ACCOUNT_MODELS = (MediAdmin, Patient, Pharmacist, Doctor)
+
+
+@receiver(post_save)
+def account_saved(sender, instance, raw=False, **kwargs):
+    if sender not in ACCOUNT_MODELS or raw:
+        return
+    sync_identity(instance)
+    invalidate_principal(instance)
+    bump_principal_version(instance)
+    if sender in SEARCH_MODELS:
+        index_instance(instance)
+
+
+@receiver(post_delete)
+def account_deleted(sender, instance, **kwargs):
+    if sender not in ACCOUNT_MODELS:
+        return
+    remove_identity(instance)
+    invalidate_principal(instance)
+    bump_principal_version(instance)
+    record_deletion(instance)
+    if sender in SEARCH_MODELS:
+        unindex_instance(instance)
+
+
+@receiver(pre_save, sender=Doctor)
+def remember_previous_doctor(sender, instance, raw=False, **kwargs):
+    instance._previous_picture = instance._previous_speciality = None
+    if instance.pk and not raw:
+        previous = Doctor.objects.filter(pk=instance.pk).values_list('profile_picture', 'speciality').first()
+        if previous:
+            instance._previous_picture, instance._previous_speciality = previous
+    if (instance.profile_picture.name or None) != (instance._previous_picture or None):
+        # A new picture has no renditions until the worker writes (or finds) them
+        instance.picture_renditions = False
+
+
+@receiver(post_save, sender=Doctor)
+def count_profile_picture(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = instance.profile_picture.name or None
+    previous = getattr(instance, '_previous_picture', None) or None
+    if current != previous:
+        add_reference(current)
+        drop_reference(previous)
+
+
+@receiver(post_delete, sender=Doctor)
+def release_profile_picture(sender, instance, **kwargs):
+    drop_reference(instance.profile_picture.name)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@receiver(post_save, sender=DoctorAvailability)
+@receiver(post_delete, sender=DoctorAvailability)
+def availability_changed(sender, raw=False, **kwargs):
+    if not raw:
+        bump_availability_version()
+
+
+@receiver(post_save, sender=Doctor)
+def speciality_changed(sender, instance, created=False, raw=False, **kwargs):
+    # A doctor's speciality decides which slot index their windows are in; a
+    # new doctor has no windows yet and a deleted one's go with it
+    if not raw and not created and getattr(instance, '_previous_speciality', None) not in (None, instance.speciality):
+        bump_availability_version()
+
+
+@receiver(post_save, sender=DrugInteraction)
+@receiver(post_delete, sender=DrugInteraction)
+def interaction_changed(sender, **kwargs):
+    bump_interactions_version()
@@ -0,0 +1,96 @@
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores each upload under the SHA-256 of its bytes, fanned out into two
+    levels of shard directories: profile_pictures/3f/a9/3fa9...e1.jpg.
+    Identical uploads resolve to the same name and are written only once;
+    MediaBlob rows count the references and gc_media removes unused blobs.
+    """
+
+    shard_depth = 2
+    chunk_size = 64 * 1024
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        hexdigest = digest.hexdigest()
+        shards = [hexdigest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), *shards, hexdigest + extension).replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, so an existing name is never a conflict
+        return name
+
+    def _save(self, name, content):
+        # Imported here: the models module imports this one for the field storage
+        from .media import claim_blob
+
+        name = self.content_name(name, content)
+        if self.exists(name):
+            if claim_blob(name):
+                return name
+            # No blob row: gc_media has deleted (or is deleting) the file, so write it again
+            self.delete(name)
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            # Another request stored the same bytes first
+            return name
+
+
+def profile_picture_storage():
+    return ContentAddressedStorage()
+
+
+class MediwiseStaticStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed static names (app.3f9a1c2b.css) from the collectstatic
+    manifest. Files that have not been built/collected yet, as in a fresh
+    checkout or the test run, keep their plain name instead of raising.
+    """
+
+    manifest_strict = False
+
+    # Written as name.gz beside each collected file so serve_static never compresses per request
+    compressible_extensions = ('.css', '.js', '.svg', '.json', '.map', '.txt', '.html', '.xml', '.ttf', '.eot', '.ico')
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and not isinstance(processed, Exception):
+                for target in {name, hashed_name} - {None}:
+                    self.write_gzip_variant(target)
+            yield name, hashed_name, processed
+
+    def write_gzip_variant(self, name):
+        if not name.endswith(self.compressible_extensions):
+            return
+        path = self.path(name)
+        if not os.path.exists(path) or os.path.getsize(path) < self.min_compress_size:
+            return
+        with open(path, 'rb') as source:
+            data = source.read()
+        # mtime=0 keeps the output byte-identical between runs
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data) * 0.95:
+            with open(path + '.gz', 'wb') as target:
+                target.write(compressed)
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
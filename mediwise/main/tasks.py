@@ -0,0 +1,57 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# A single in-process worker thread for slow follow-up work (image processing)
+# that must not run on the request thread.
+_jobs = queue.Queue(maxsize=1000)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run_jobs():
+    while True:
+        func, args = _jobs.get()
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Background job %s failed", getattr(func, '__name__', func))
+        finally:
+            close_old_connections()
+            _jobs.task_done()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_jobs, name='mediwise-background', daemon=True)
+            _worker.start()
+
+
+def enqueue(func, *args):
+    """
+    Run func(*args) on the background worker once the current transaction
+    commits. With BACKGROUND_TASKS_EAGER the job runs inline instead.
+    """
+    def submit():
+        if getattr(settings, 'BACKGROUND_TASKS_EAGER', False):
+            func(*args)
+            return
+        _ensure_worker()
+        try:
+            _jobs.put_nowait((func, args))
+        except queue.Full:
+            logger.warning("Background queue full, dropping %s", getattr(func, '__name__', func))
+
+    transaction.on_commit(submit)
+
+
+def wait_for_jobs():
+    """Block until queued jobs are finished (used by management commands)"""
+    _jobs.join()
@@ -0,0 +1,23 @@
+from urllib.parse import urlencode
+
+from django import template
+from django.urls import reverse
+
+from ..avatars import DEFAULT_BACKGROUND, DEFAULT_COLOUR, initials_for
+from ..images import rendition_url
+
+register = template.Library()
+
+
+@register.filter
+def rendition(image_field, name):
+    """{{ doctor.profile_picture|rendition:'thumb' }}"""
+    return rendition_url(image_field, name)
+
+
+@register.simple_tag
+def avatar_url(person, background=DEFAULT_BACKGROUND, color=DEFAULT_COLOUR):
+    """{% avatar_url user background='fff1f2' color='be123c' %}: locally rendered initials avatar"""
+    initials = initials_for(getattr(person, 'first_name', ''), getattr(person, 'last_name', ''))
+    url = reverse('initials_avatar', args=[initials])
+    return f"{url}?{urlencode({'background': background, 'color': color})}"
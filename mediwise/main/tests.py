@@ -1,3 +1,1453 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import warnings
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from time import sleep
+from types import SimpleNamespace
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.signals import template_rendered
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .admin import AppointmentForm
+from .aggregates import AGGREGATE_MODELS, PROFILE_ROLES, UPDATED_AT_OVERLAP, rebuild_aggregates, refresh_aggregates
+from . import async_views, credentials, metrics
+from .avatars import initials_for
+from .credentials import CredentialPoolBusy, is_password_hash
+from .identity import LOGIN_MODELS, find_accounts, normalize_email, rebuild_identities
+from .directory import decode_cursor, doctor_page
+from .export import EXPORT_FIELDS, export_chunks
+from .forms import DoctorProfileUpdateForm
+from .fragments import fragment_context
+from .images import process_profile_picture, rendition_name, rendition_url
+from .importer import import_people
+from .interactions import InteractionMatrix, check_interactions
+from .models import (
+    AggregateTombstone, AggregateWatermark, Appointment, DailyRegistrations, Doctor, DoctorAvailability,
+    DrugInteraction, LoginIdentity, MediAdmin, MediaBlob, Medication, Patient, PharmacyCounters, Pharmacist,
+    Prescription, Stock, SummaryCount, VitalsMeasurement, missing_profile_fields, update_profile_completeness,
+)
+from .media import add_reference, drop_reference
+from .pharmacy import move_stock, recount_counters
+from .perf import (
+    PERF_SETTINGS, QUERY_BUDGETS, SCENARIOS, PerfFixture, count_queries, measure, over_budget, regressions, relative_speed,
+)
+from .population import BMI_LABELS, UNKNOWN, age_bands, bmi_distribution, load_latest_bmi, patients_without_vitals
+from .prescriptions import InteractionFound, cancel_prescription, dispense_prescription, prescribe
+from .principal import PrincipalCache, cache as principal_cache, get_principal
+from .routers import PrimaryReplicaRouter, ReplicaPinningMiddleware
+from .search import SEARCH_MODELS, SEARCH_TABLE, document_for, search, search_enabled
+from .scheduling import (
+    SlotUnavailable, book_appointment, cancel_appointment, free_slots, next_free_slot, speciality_slots,
+)
+from .serving import parse_range, serve_file
+from .storage import ContentAddressedStorage
+from .templatetags.media_tags import avatar_url
+from .vitals import ingest_vitals, record_vitals
+
+# Patients and doctors seeded for the budget tests; check_perf covers the larger scales
+PERF_SCALE = int(os.environ.get('MEDIWISE_PERF_SCALE', 1000))
+
+
+@override_settings(**PERF_SETTINGS)
+class QueryBudgetTests(TestCase):
+    """Every view scenario stays within its query budget (see main.perf.QUERY_BUDGETS)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixture = PerfFixture()
+        cls.fixture.grow(PERF_SCALE)
+
+    def setUp(self):
+        # Rolled-back rows must not survive in the process-wide caches
+        caches['default'].clear()
+        principal_cache.clear()
+
+    def test_scenarios_have_budgets(self):
+        self.assertEqual({scenario.name for scenario in SCENARIOS}, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario.name):
+                client = self.fixture.client(scenario.role)
+                # Budgets are for the steady state, after the principal cache is warm
+                scenario.request(client, self.fixture, 0)
+                queries = count_queries(scenario, client, self.fixture, 1)
+                self.assertLessEqual(queries, QUERY_BUDGETS[scenario.name])
+
+    def test_record_measurements(self):
+        """With MEDIWISE_PERF_RESULTS set, write query count, latency and peak memory per scenario there"""
+        path = os.environ.get('MEDIWISE_PERF_RESULTS')
+        if not path:
+            self.skipTest("MEDIWISE_PERF_RESULTS not set")
+        results = {scenario.name: measure(scenario, self.fixture) for scenario in SCENARIOS}
+        self.assertEqual(over_budget(results), [])
+        with open(path, 'w') as handle:
+            json.dump({'settings': PERF_SETTINGS, 'results': {str(PERF_SCALE): results}}, handle, indent=2, sort_keys=True)
+
+
+class RegressionCheckTests(SimpleTestCase):
+    baseline = {'1000': {'login': {'queries': 6, 'best_ms': 10.0, 'median_ms': 11.0, 'peak_kib': 300.0}}}
+
+    def check(self, speed=1.0, **changes):
+        stats = {**self.baseline['1000']['login'], **changes}
+        return regressions(self.baseline, {'1000': {'login': stats}}, tolerance=0.25, speed=speed)
+
+    def test_unchanged_results_pass(self):
+        self.assertEqual(self.check(), [])
+
+    def test_any_extra_query_fails(self):
+        self.assertEqual(len(self.check(queries=7)), 1)
+
+    def test_latency_fails_only_past_tolerance(self):
+        self.assertEqual(self.check(best_ms=12.4), [])
+        self.assertEqual(len(self.check(best_ms=13.0)), 1)
+
+    def test_slower_machine_scales_the_baseline(self):
+        self.assertEqual(self.check(best_ms=18.0, speed=2.0), [])
+
+    def test_memory_fails_only_past_tolerance_and_noise_floor(self):
+        self.assertEqual(self.check(peak_kib=360.0), [])
+        self.assertEqual(len(self.check(peak_kib=450.0)), 1)
+
+    def test_new_scenarios_are_not_regressions(self):
+        results = {'1000': {'manage_doctors_list': {'queries': 2, 'best_ms': 5.0, 'median_ms': 5.0, 'peak_kib': 200.0}}}
+        self.assertEqual(regressions(self.baseline, results, tolerance=0.25), [])
+
+    def test_speed_is_the_median_scenario_ratio(self):
+        baseline = {'1000': {name: {'best_ms': 10.0} for name in ('a', 'b', 'c')}}
+        results = {'1000': {'a': {'best_ms': 6.0}, 'b': {'best_ms': 6.5}, 'c': {'best_ms': 30.0}, 'new': {'best_ms': 1.0}}}
+        self.assertEqual(relative_speed(baseline, results), 0.65)
+        self.assertEqual(relative_speed(baseline, {}), 1.0)
+
+    def test_over_budget(self):
+        self.assertEqual(over_budget({'login': {'queries': QUERY_BUDGETS['login']}}), [])
+        self.assertEqual(len(over_budget({'login': {'queries': QUERY_BUDGETS['login'] + 1}})), 1)
+
+
+class PopulationTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(
+            first_name='Asha', last_name='Rao', password='x', gender='female', blood_group='a+',
+            date_of_birth=date(1990, 3, 1),
+        )
+
+    def test_latest_measurement_per_patient(self):
+        now = timezone.now()
+        VitalsMeasurement.objects.create(patient=self.patient, measured_at=now - timedelta(days=30), bmi=31.0)
+        VitalsMeasurement.objects.create(patient=self.patient, measured_at=now, bmi=22.0)
+        # Blood pressure only: no BMI, so the earlier BMI row still isn't the latest
+        VitalsMeasurement.objects.create(patient=self.patient, measured_at=now + timedelta(hours=1), systolic=120, diastolic=80)
+        other = Patient.objects.create(first_name='Ravi', last_name='Rao', password='x')
+        VitalsMeasurement.objects.create(patient=other, measured_at=now - timedelta(days=1), bmi=41.0)
+
+        columns = load_latest_bmi()
+        self.assertEqual(sorted(columns['bmi'].tolist()), [22.0, 41.0])
+        rows = {row['gender']: row for row in bmi_distribution(('gender',), columns)}
+        self.assertEqual(rows['female']['patients'], 1)
+        self.assertEqual(rows['female']['bands']['normal'], 1)
+        self.assertEqual(rows[UNKNOWN]['bands']['obese III'], 1)
+        self.assertEqual(patients_without_vitals(), 0)
+
+    def test_age_band_turns_on_the_birthday(self):
+        births = np.array(['2000-06-15', '2000-06-16', 'NaT', '1940-01-01'], dtype='datetime64[D]')
+        self.assertEqual(age_bands(births, today=date(2018, 6, 15)).tolist(), ['18-29', '0-17', UNKNOWN, '75+'])
+
+    def test_groups_and_quartiles(self):
+        columns = {
+            'bmi': np.array([18.0, 22.0, 24.0, 26.0, 31.0]),
+            'blood_group': np.array(['a+', 'a+', 'a+', 'a+', '']),
+            'gender': np.array(['male'] * 5),
+            'date_of_birth': np.array(['1990-01-01'] * 5, dtype='datetime64[D]'),
+        }
+        rows = bmi_distribution(('blood_group',), columns, today=date(2020, 1, 1))
+        self.assertEqual([row['blood_group'] for row in rows], ['A+', UNKNOWN])
+        self.assertEqual(rows[0]['patients'], 4)
+        self.assertEqual(rows[0]['mean'], 22.5)
+        self.assertEqual((rows[0]['p25'], rows[0]['p50'], rows[0]['p75']), (18.0, 22.0, 24.0))
+        self.assertEqual(rows[0]['bands'], {**dict.fromkeys(BMI_LABELS, 0), 'underweight': 1, 'normal': 2, 'overweight': 1})
+
+    def test_no_measurements(self):
+        self.assertEqual(bmi_distribution(), [])
+        self.assertEqual(patients_without_vitals(), 1)
+
+
+class VitalsIngestTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.errors = []
+
+    def ingest(self, *rows):
+        return ingest_vitals(enumerate(rows, 1), batch_size=2, on_error=self.errors.append)
+
+    def test_valid_rows_are_appended(self):
+        imported = self.ingest(
+            {'patient_id': self.patient.pk, 'height_cm': '170', 'weight_kg': '68'},
+            {'patient_id': self.patient.pk, 'systolic': 118, 'diastolic': 76, 'measured_at': '2024-01-02T09:30:00'},
+        )
+        self.assertEqual(imported, (2, 0))
+        self.assertEqual(self.errors, [])
+        self.assertEqual(sorted(self.patient.vitals.values_list('bmi', flat=True), key=str), [23.5, None])
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        imported = self.ingest(
+            {'patient_id': self.patient.pk + 1000, 'weight_kg': 70},
+            {'patient_id': self.patient.pk, 'weight_kg': 7000},
+            {'patient_id': self.patient.pk, 'systolic': 120},
+            {'patient_id': self.patient.pk},
+            {'patient_id': self.patient.pk, 'weight_kg': 70},
+            {'patient_id': self.patient.pk, 'weight_kg': 70, 'measured_at': 12345},
+            {'patient_id': [self.patient.pk], 'weight_kg': 70},
+        )
+        self.assertEqual(imported, (1, 6))
+        self.assertEqual(sorted(error.line for error in self.errors), [1, 2, 3, 4, 6, 7])
+        self.assertEqual(self.patient.vitals.count(), 1)
+
+    def test_measurements_are_append_only(self):
+        vitals = record_vitals(self.patient, weight_kg=70)
+        vitals.weight_kg = 71
+        with self.assertRaises(ValueError):
+            vitals.save()
+
+
+class InteractionMatrixTests(SimpleTestCase):
+    matrix = InteractionMatrix([
+        (1, 2, 'minor', 'a'),
+        (1, 3, 'major', 'b'),
+        (2, 4, 'moderate', 'c'),
+        (3, 4, 'major', 'd'),
+        (5, 6, 'major', 'e'),
+    ])
+
+    def pairs(self, medication_ids, against_ids=()):
+        return [(hit.medication_a, hit.medication_b) for hit in self.matrix.check(medication_ids, against_ids)]
+
+    def test_pairs_among_the_new_medications(self):
+        self.assertEqual(self.pairs([1, 2, 3]), [(1, 3), (1, 2)])
+
+    def test_pairs_against_current_medications_only_once(self):
+        # 3-4 is found from 3's side only; 5-6 are both current so are not reported
+        self.assertEqual(self.pairs([3, 2], against_ids=[4, 5, 6]), [(3, 4), (2, 4)])
+        self.assertEqual(self.pairs([2, 1, 2], against_ids=[1]), [(1, 2)])
+
+    def test_most_severe_first(self):
+        self.assertEqual(
+            [hit.severity for hit in self.matrix.check([1, 2, 3, 4])], ['major', 'major', 'moderate', 'minor'],
+        )
+
+    def test_unknown_medications_interact_with_nothing(self):
+        self.assertEqual(self.pairs([7, 8], against_ids=[1]), [])
+
+
+class PrescriptionTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.doctor = Doctor.objects.create(
+            first_name='Dev', last_name='Nair', password='x', phone_number='1', email='dev@example.com',
+            speciality='Cardiology', qualification='MD',
+        )
+        self.pharmacists = [
+            Pharmacist.objects.create(
+                first_name='Pia', last_name=str(i), password='x', license_number=f'PH{i}', phone_number='1',
+                email=f'pia{i}@example.com', address='x',
+            )
+            for i in range(2)
+        ]
+        self.warfarin, self.aspirin, self.paracetamol = (
+            Medication.objects.create(name=name) for name in ('Warfarin', 'Aspirin', 'Paracetamol')
+        )
+        DrugInteraction.objects.create(medication_a=self.aspirin, medication_b=self.warfarin, severity='major')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'x'))
+
+    def pending(self, pharmacist):
+        counters = PharmacyCounters.objects.filter(pharmacist=pharmacist).first()
+        return counters.prescriptions_pending if counters else 0
+
+    def test_major_interaction_with_current_medication_blocks(self):
+        prescribe(self.doctor, self.patient, [(self.warfarin, '5mg daily', 30, None)])
+        with self.assertRaises(InteractionFound) as raised:
+            prescribe(self.doctor, self.patient, [(self.aspirin, '75mg daily', 30, 30)])
+        self.assertEqual(raised.exception.interactions[0].severity, 'major')
+        prescription = prescribe(self.doctor, self.patient, [(self.aspirin, '75mg', 30, 30)], accept_interactions=True)
+        self.assertEqual(len(prescription.interactions), 1)
+
+    def test_interactions_added_later_are_seen(self):
+        check_interactions([self.paracetamol.pk, self.warfarin.pk])  # matrix now cached
+        DrugInteraction.objects.create(medication_a=self.warfarin, medication_b=self.paracetamol, severity='minor')
+        self.assertEqual(len(check_interactions([self.paracetamol.pk, self.warfarin.pk])), 1)
+
+    def test_pending_counter_follows_the_prescription(self):
+        queued_with, dispenser = self.pharmacists
+        move_stock(dispenser, self.paracetamol, 100, reason='restock')
+        first = prescribe(self.doctor, self.patient, [(self.paracetamol, '1g', 20, 5)], pharmacist=queued_with)
+        second = prescribe(self.doctor, self.patient, [(self.paracetamol, '1g', 10, 5)], pharmacist=queued_with)
+        self.assertEqual(self.pending(queued_with), 2)
+
+        cancel_prescription(first)
+        cancel_prescription(first)
+        self.assertEqual(self.pending(queued_with), 1)
+
+        dispense_prescription(second, dispenser)
+        dispense_prescription(second, dispenser)
+        self.assertEqual(self.pending(queued_with), 0)
+        self.assertEqual(Stock.objects.get(pharmacist=dispenser, medication=self.paracetamol).quantity, 90)
+
+        for pharmacist in self.pharmacists:
+            counted = self.pending(pharmacist)
+            recount_counters(pharmacist)
+            self.assertEqual(self.pending(pharmacist), counted)
+
+    def run_action(self, action, *prescriptions):
+        return self.client.post(reverse('admin:main_prescription_changelist'), {
+            'action': action, '_selected_action': [prescription.pk for prescription in prescriptions],
+        }, follow=True)
+
+    def test_admin_moves_prescriptions_through_the_workflow(self):
+        pharmacist = self.pharmacists[0]
+        move_stock(pharmacist, self.paracetamol, 15, reason='restock')
+        small, large, cancelled = (
+            prescribe(self.doctor, self.patient, [(self.paracetamol, '1g', quantity, 5)], pharmacist=pharmacist)
+            for quantity in (10, 20, 1)
+        )
+        response = self.run_action('dispense', small, large)
+        self.assertContains(response, "Dispensed 1 prescription(s)")
+        self.assertEqual([m.level_tag for m in response.context['messages']], ['error', 'info'])
+        self.run_action('cancel', cancelled)
+        self.assertEqual(
+            {p.pk: p.status for p in Prescription.objects.all()},
+            {small.pk: 'dispensed', large.pk: 'pending', cancelled.pk: 'cancelled'},
+        )
+        self.assertEqual(self.pending(pharmacist), 1)
+        self.assertEqual(Stock.objects.get(pharmacist=pharmacist, medication=self.paracetamol).quantity, 5)
+
+    def test_admin_cannot_edit_status_or_items(self):
+        prescription = prescribe(
+            self.doctor, self.patient, [(self.paracetamol, '1g', 10, 5)], pharmacist=self.pharmacists[0],
+        )
+        url = reverse('admin:main_prescription_change', args=[prescription.pk])
+        self.client.post(url, {
+            'status': 'dispensed', 'notes': 'Take with food',
+            'items-TOTAL_FORMS': 0, 'items-INITIAL_FORMS': 1, 'items-MIN_NUM_FORMS': 0, 'items-MAX_NUM_FORMS': 1000,
+        })
+        prescription.refresh_from_db()
+        self.assertEqual((prescription.status, prescription.notes), ('pending', 'Take with food'))
+        self.assertEqual(prescription.items.count(), 1)
+        self.assertEqual(self.pending(self.pharmacists[0]), 1)
+        delete_url = reverse('admin:main_prescription_delete', args=[prescription.pk])
+        self.assertEqual(self.client.post(delete_url).status_code, 403)
+        self.assertEqual(self.client.get(reverse('admin:main_prescription_add')).status_code, 403)
+
+
+class MediaCollectionTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.storage = ContentAddressedStorage()
+
+    def upload(self, data=b'same bytes'):
+        return self.storage.save('profile_pictures/photo.png', ContentFile(data))
+
+    def unreferenced(self, name, hours):
+        add_reference(name)
+        drop_reference(name)
+        MediaBlob.objects.filter(name=name).update(unreferenced_since=timezone.now() - timedelta(hours=hours))
+
+    def collect(self):
+        call_command('gc_media', grace_hours=24, stdout=StringIO())
+
+    def test_collects_only_past_the_grace_period(self):
+        old, recent = self.upload(b'old'), self.upload(b'recent')
+        self.unreferenced(old, 48)
+        self.unreferenced(recent, 1)
+        self.collect()
+        self.assertFalse(self.storage.exists(old))
+        self.assertFalse(MediaBlob.objects.filter(name=old).exists())
+        self.assertTrue(self.storage.exists(recent))
+
+    def test_reupload_restarts_the_grace_period(self):
+        name = self.upload()
+        self.unreferenced(name, 48)
+        self.assertEqual(self.upload(), name)
+        self.collect()
+        self.assertTrue(self.storage.exists(name))
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+
+    def test_file_without_a_blob_row_is_written_again(self):
+        name = self.upload()
+        path = self.storage.path(name)
+        with open(path, 'wb') as handle:
+            handle.write(b'truncated')
+        self.assertEqual(self.upload(), name)
+        with self.storage.open(name) as handle:
+            self.assertEqual(handle.read(), b'same bytes')
+
+    def test_referenced_blobs_are_kept(self):
+        name = self.upload()
+        self.unreferenced(name, 48)
+        MediaBlob.objects.filter(name=name).update(refcount=1)
+        self.collect()
+        self.assertTrue(self.storage.exists(name))
+
+
+class SchedulingTests(TestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.first, self.second = (
+            Doctor.objects.create(
+                first_name='Dev', last_name=str(i), password='x', phone_number='1', email=f'dev{i}@example.com',
+                speciality='Cardiology', qualification='MD',
+            )
+            for i in range(2)
+        )
+        DoctorAvailability.objects.create(doctor=self.first, weekday=0, start_time=time(9), end_time=time(11))
+        DoctorAvailability.objects.create(doctor=self.second, weekday=0, start_time=time(9), end_time=time(10))
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.monday, time(hour, minute)))
+
+    def starts(self, slots):
+        return [timezone.localtime(slot[-2]).strftime('%H:%M') for slot in slots]
+
+    def test_free_slots_skip_bookings(self):
+        book_appointment(self.first, self.patient, self.at(9, 30))
+        self.assertEqual(self.starts(free_slots(self.first, self.monday, self.monday)), ['09:00', '10:00', '10:30'])
+
+    def test_speciality_slots_earliest_first(self):
+        # A longer booking made elsewhere blocks every slot it overlaps
+        Appointment.objects.create(doctor=self.second, patient=self.patient, start=self.at(8, 45), end=self.at(9, 45))
+        slots = list(speciality_slots('Cardiology', self.monday, self.monday))
+        self.assertEqual(
+            [(doctor_id, start) for doctor_id, start in zip((slot[0] for slot in slots), self.starts(slots))],
+            [(self.first.pk, '09:00'), (self.first.pk, '09:30'), (self.first.pk, '10:00'), (self.first.pk, '10:30')],
+        )
+
+    def test_next_free_slot_moves_past_bookings(self):
+        for start in (self.at(9), self.at(9, 30)):
+            book_appointment(self.first, self.patient, start)
+            book_appointment(self.second, self.patient, start)
+        doctor_id, start, end = next_free_slot('Cardiology', after=self.at(0))
+        self.assertEqual((doctor_id, start, end), (self.first.pk, self.at(10), self.at(10, 30)))
+
+    def test_changed_windows_are_seen(self):
+        list(speciality_slots('Cardiology', self.monday, self.monday))  # index now cached
+        DoctorAvailability.objects.create(doctor=self.second, weekday=1, start_time=time(14), end_time=time(15))
+        tuesday = self.monday + timedelta(days=1)
+        self.assertEqual(self.starts(speciality_slots('Cardiology', tuesday, tuesday)), ['14:00', '14:30'])
+        self.second.speciality = 'Neurology'
+        self.second.save()
+        self.assertEqual(self.starts(speciality_slots('Cardiology', tuesday, tuesday)), [])
+
+    def test_booking_conflicts(self):
+        appointment = book_appointment(self.first, self.patient, self.at(9))
+        self.assertEqual(appointment.end, self.at(9, 30))
+        for start in (self.at(9), self.at(9, 15), self.at(11), self.at(9, day=self.monday - timedelta(days=14))):
+            with self.subTest(start=start), self.assertRaises(SlotUnavailable):
+                book_appointment(self.first, self.patient, start)
+        cancel_appointment(appointment)
+        self.assertEqual(book_appointment(self.first, self.patient, self.at(9)).status, 'booked')
+
+    def test_admin_form_applies_the_same_checks(self):
+        book_appointment(self.first, self.patient, self.at(9))
+        data = {'doctor': self.first.pk, 'patient': self.patient.pk, 'status': 'booked'}
+        form = AppointmentForm(data={**data, 'start': self.at(9)})
+        self.assertFalse(form.is_valid())
+        form = AppointmentForm(data={**data, 'start': self.at(9, 30)})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().end, self.at(10))
+
+
+class ProfilePictureTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PROFILE_PICTURE_MAX_SIDE=64)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.doctor = Doctor.objects.create(
+            first_name='Dev', last_name='Nair', password='x', phone_number='1', email='dev@example.com',
+            speciality='Cardiology', qualification='MD',
+        )
+
+    def png(self, width, height, colour='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), colour).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_worker_shrinks_oversized_originals_under_a_new_name(self):
+        self.doctor.profile_picture = self.png(200, 100)
+        self.doctor.save()
+        original = self.doctor.profile_picture.name
+        with self.doctor.profile_picture.open('rb') as stored:
+            self.assertEqual(Image.open(stored).size, (200, 100))
+
+        process_profile_picture(original)
+        self.doctor.refresh_from_db()
+        name = self.doctor.profile_picture.name
+        self.assertNotEqual(name, original)
+        with self.doctor.profile_picture.open('rb') as stored:
+            data = stored.read()
+        self.assertEqual(Image.open(BytesIO(data)).size, (64, 32))
+        self.assertIn(hashlib.sha256(data).hexdigest(), name)
+        self.assertTrue(self.doctor.picture_renditions)
+        # The original is untouched and left for gc_media
+        with ContentAddressedStorage().open(original, 'rb') as stored:
+            self.assertEqual(Image.open(stored).size, (200, 100))
+        self.assertEqual(
+            dict(MediaBlob.objects.filter(name__in=[original, name]).values_list('name', 'refcount')),
+            {original: 0, name: 1},
+        )
+
+    @override_settings(BACKGROUND_TASKS_EAGER=True)
+    def test_upload_is_stored_as_is_and_shrunk_after_commit(self):
+        form = DoctorProfileUpdateForm(
+            data={
+                'first_name': 'Dev', 'last_name': 'Nair', 'email': 'dev@example.com', 'phone_number': '1',
+                'speciality': 'Cardiology', 'qualification': 'MD',
+            },
+            files={'profile_picture': self.png(200, 100)}, instance=self.doctor,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        with self.captureOnCommitCallbacks() as callbacks:
+            form.save()
+        with self.doctor.profile_picture.open('rb') as stored:
+            self.assertEqual(Image.open(stored).size, (200, 100))
+        for callback in callbacks:
+            callback()
+        self.doctor.refresh_from_db()
+        with self.doctor.profile_picture.open('rb') as stored:
+            self.assertEqual(Image.open(stored).size, (64, 32))
+
+    def test_small_originals_keep_their_name(self):
+        self.doctor.profile_picture = self.png(40, 40)
+        self.doctor.save()
+        name = self.doctor.profile_picture.name
+        process_profile_picture(name)
+        self.doctor.refresh_from_db()
+        self.assertEqual(self.doctor.profile_picture.name, name)
+        self.assertTrue(self.doctor.picture_renditions)
+
+    def test_renditions_are_used_once_flagged(self):
+        self.doctor.profile_picture = self.png(40, 40)
+        self.doctor.save()
+        name = self.doctor.profile_picture.name
+        self.assertEqual(rendition_url(self.doctor.profile_picture, 'thumb'), self.doctor.profile_picture.url)
+
+        process_profile_picture(name)
+        self.doctor.refresh_from_db()
+        self.assertTrue(self.doctor.picture_renditions)
+        self.assertIn(rendition_name(name, 'thumb'), rendition_url(self.doctor.profile_picture, 'thumb'))
+
+        # A different picture starts without renditions
+        self.doctor.profile_picture = self.png(40, 40, 'blue')
+        self.doctor.save()
+        self.doctor.refresh_from_db()
+        self.assertFalse(self.doctor.picture_renditions)
+
+
+class AvatarTests(SimpleTestCase):
+    def test_initials_skip_characters_the_url_cannot_carry(self):
+        self.assertEqual(initials_for('/x', 'rao'), 'XR')
+        self.assertEqual(initials_for(' asha', 'Rao'), 'AR')
+        self.assertEqual(initials_for('//', '.'), '?')
+        self.assertEqual(initials_for('', None), '?')
+
+    def test_avatar_url_reverses_for_any_name(self):
+        for first_name in ('/etc', '..', '', 'Asha'):
+            with self.subTest(first_name=first_name):
+                person = SimpleNamespace(first_name=first_name, last_name='?')
+                self.assertTrue(avatar_url(person).startswith('/avatars/'))
+
+
+@override_settings(CREDENTIAL_POOL_TIMEOUT=0.01)
+class CredentialPoolTests(SimpleTestCase):
+    def test_slow_hash_reports_busy(self):
+        with self.assertRaises(CredentialPoolBusy):
+            credentials._run(sleep, 0.2)
+
+    def test_slow_hash_reports_busy_to_async_callers(self):
+        with self.assertRaises(CredentialPoolBusy):
+            async_to_sync(credentials._arun)(sleep, 0.2)
+
+
+class LoginIdentityTests(TestCase):
+    def assertIdentitiesMatchAccounts(self):
+        expected = {
+            (role, pk, normalize_email(email))
+            for role, model in LOGIN_MODELS.items()
+            for pk, email in model.objects.values_list('pk', 'email')
+            if normalize_email(email)
+        }
+        self.assertEqual(set(LoginIdentity.objects.values_list('role', 'object_id', 'email')), expected)
+
+    def test_identities_follow_account_changes(self):
+        patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x', email=' Asha@Example.com')
+        doctor = Doctor.objects.create(
+            first_name='Asha', last_name='Rao', password='x', email='asha@example.com',
+            phone_number='1', speciality='Cardiology', qualification='MD',
+        )
+        self.assertIdentitiesMatchAccounts()
+        # Patients come before doctors when both share an email
+        self.assertEqual(find_accounts('ASHA@example.com'), [('patient', patient.pk), ('doctor', doctor.pk)])
+
+        patient.email = 'asha.rao@example.com'
+        patient.save()
+        self.assertIdentitiesMatchAccounts()
+        self.assertEqual(find_accounts('asha@example.com'), [('doctor', doctor.pk)])
+
+        patient.email = None
+        patient.save()
+        self.assertIdentitiesMatchAccounts()
+
+        doctor.delete()
+        self.assertIdentitiesMatchAccounts()
+        self.assertEqual(find_accounts('asha@example.com'), [])
+
+    def test_rebuild_catches_up_with_queryset_updates(self):
+        patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x', email='asha@example.com')
+        # update() skips post_save, so only a rebuild sees the new email
+        Patient.objects.filter(pk=patient.pk).update(email='asha.rao@example.com')
+        rebuild_identities()
+        self.assertIdentitiesMatchAccounts()
+
+
+class PrincipalCacheTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.factory = RequestFactory()
+
+    def principal_for(self, method):
+        request = getattr(self.factory, method)('/')
+        request.session = {'patient_id': self.patient.pk}
+        return get_principal(request, 'patient')
+
+    def test_cached_rows_are_copies(self):
+        self.principal_for('get').first_name = 'Changed'
+        with self.assertNumQueries(0):
+            self.assertEqual(self.principal_for('get').first_name, 'Asha')
+
+    def test_saves_and_deletes_invalidate(self):
+        self.principal_for('get')
+        self.patient.first_name = 'Asha Devi'
+        self.patient.save()
+        self.assertEqual(self.principal_for('get').first_name, 'Asha Devi')
+        self.patient.delete()
+        self.assertIsNone(self.principal_for('get'))
+
+    def test_writes_read_the_database(self):
+        self.principal_for('get')
+        # update() skips post_save, so the cached row goes stale until a write reloads it
+        Patient.objects.filter(pk=self.patient.pk).update(first_name='Asha Devi')
+        self.assertEqual(self.principal_for('get').first_name, 'Asha')
+        self.assertEqual(self.principal_for('post').first_name, 'Asha Devi')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.principal_for('get').first_name, 'Asha Devi')
+
+    def test_entries_expire_and_are_evicted(self):
+        cache = PrincipalCache(maxsize=2, ttl=0.05)
+        cache.set(('patient', 1), 'one')
+        cache.set(('patient', 2), 'two')
+        cache.get(('patient', 1))
+        cache.set(('patient', 3), 'three')
+        self.assertIsNone(cache.get(('patient', 2)))
+        self.assertEqual(cache.get(('patient', 1)), 'one')
+        sleep(0.06)
+        self.assertIsNone(cache.get(('patient', 1)))
+
+
+
+class DoctorDirectoryTests(TestCase):
+    def setUp(self):
+        self.doctors = [
+            Doctor.objects.create(
+                first_name='Doc', last_name=str(n), password='x', email=f'doc{n}@example.com',
+                phone_number='1', speciality='Cardiology', qualification='MD',
+            )
+            for n in range(7)
+        ]
+        # Three share one registration day, so only the id orders them
+        Doctor.objects.filter(pk__in=[d.pk for d in self.doctors[:3]]).update(registration_date=date(2024, 1, 1))
+
+    def walk(self, **filters):
+        seen, cursor = [], None
+        while True:
+            page, next_cursor = doctor_page(cursor=cursor, page_size=2, **filters)
+            seen.extend(doctor.pk for doctor in page)
+            if next_cursor is None:
+                return seen
+            cursor = decode_cursor(next_cursor)
+
+    def expected(self, qs=None):
+        return list((qs or Doctor.objects.all()).order_by('-registration_date', '-id').values_list('pk', flat=True))
+
+    def test_pages_cover_every_doctor_once(self):
+        self.assertEqual(self.walk(), self.expected())
+
+    def test_new_doctors_do_not_shift_later_pages(self):
+        first, next_cursor = doctor_page(page_size=2)
+        Doctor.objects.create(
+            first_name='Doc', last_name='new', password='x', email='new@example.com',
+            phone_number='1', speciality='Cardiology', qualification='MD',
+        )
+        rest, _ = doctor_page(cursor=decode_cursor(next_cursor), page_size=100)
+        older = self.expected(Doctor.objects.exclude(email='new@example.com'))
+        self.assertEqual([d.pk for d in first + rest], older)
+
+    def test_incomplete_filter_follows_profile_edits(self):
+        doctor = self.doctors[0]
+        for field in Doctor.PROFILE_FIELDS:
+            setattr(doctor, field, 'filled')
+        doctor.save()
+        self.assertEqual(self.walk(incomplete=True), self.expected(Doctor.objects.exclude(pk=doctor.pk)))
+
+    def test_malformed_cursor_starts_over(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        self.assertIsNone(decode_cursor(''))
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        if not search_enabled():
+            self.skipTest("Full-text search needs SQLite")
+
+    def assertIndexMatchesProfiles(self):
+        expected = {
+            document_for(instance) for model in SEARCH_MODELS for instance in model.objects.all()
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid, kind, name, details, summary FROM {SEARCH_TABLE}")
+            self.assertEqual(set(cursor.fetchall()), expected)
+
+    def test_index_follows_saves_and_deletes(self):
+        doctor = Doctor.objects.create(
+            first_name='Meera', last_name='Iyer', password='x', email='meera@example.com',
+            phone_number='1', speciality='Cardiology', qualification='MD',
+        )
+        patient = Patient.objects.create(first_name='Meera', last_name='Rao', password='x', email='rao@example.com')
+        self.assertIndexMatchesProfiles()
+        self.assertEqual({hit['role'] for hit in search('meer')}, {'doctor', 'patient'})
+
+        doctor.last_name = 'Menon'
+        doctor.save()
+        self.assertIndexMatchesProfiles()
+        self.assertEqual(search('iyer'), [])
+        self.assertEqual([hit['id'] for hit in search('menon', role='doctor')], [doctor.pk])
+
+        patient.delete()
+        self.assertIndexMatchesProfiles()
+        self.assertEqual([hit['role'] for hit in search('meera', typeahead=True)], ['doctor'])
+
+    def test_rebuild_catches_up_with_queryset_updates(self):
+        Patient.objects.create(first_name='Meera', last_name='Rao', password='x')
+        Patient.objects.update(last_name='Iyer')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertIndexMatchesProfiles()
+
+
+class ImportPeopleTests(TestCase):
+    HEADER = 'email,first_name,last_name,gender,password\n'
+
+    def setUp(self):
+        self.errors = []
+        Patient.objects.create(first_name='Asha', last_name='Rao', password='x', email='taken@example.com')
+
+    def run_import(self, *lines, **options):
+        stream = StringIO(self.HEADER + ''.join(f"{line}\n" for line in lines))
+        return import_people(stream, 'csv', role='patient', batch_size=2, on_error=self.errors.append, **options)
+
+    def test_uniqueness_is_checked_within_and_across_chunks(self):
+        result = self.run_import(
+            'a@example.com,Ann,One,female,password1',
+            'a@example.com,Ann,Two,female,password1',   # same chunk
+            'b@example.com,Ben,One,male,password1',
+            'b@example.com,Ben,Two,male,password1',     # same chunk
+            'a@example.com,Ann,Three,female,password1',  # later chunk, already imported
+            'taken@example.com,Tia,One,female,password1',
+        )
+        self.assertEqual(result, (2, 4))
+        self.assertEqual(
+            [(error.line, error.field) for error in self.errors],
+            [(3, 'email'), (5, 'email'), (6, 'email'), (7, 'email')],
+        )
+        self.assertEqual(
+            sorted(Patient.objects.values_list('email', flat=True)),
+            ['a@example.com', 'b@example.com', 'taken@example.com'],
+        )
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        result = self.run_import(
+            'c@example.com,,One,female,password1',
+            'd@example.com,Dev,One,male,short',
+            'e@example.com,Eli,One,male,password1',
+        )
+        self.assertEqual(result, (1, 2))
+        self.assertEqual([(error.line, error.field) for error in self.errors], [(2, 'first_name'), (3, 'password')])
+
+    def test_imported_rows_are_indexed_and_hashed(self):
+        self.run_import('c@example.com,Cara,One,female,password1')
+        patient = Patient.objects.get(email='c@example.com')
+        self.assertTrue(is_password_hash(patient.password))
+        self.assertIsNotNone(patient.user_id)
+        self.assertEqual(find_accounts('c@example.com'), [('patient', patient.pk)])
+        if search_enabled():
+            self.assertEqual([hit['id'] for hit in search('cara')], [patient.pk])
+
+    def test_dry_run_writes_nothing(self):
+        self.assertEqual(self.run_import('c@example.com,Cara,One,female,password1', dry_run=True), (1, 0))
+        self.assertFalse(Patient.objects.filter(email='c@example.com').exists())
+
+
+class AggregateRefreshTests(TestCase):
+    def setUp(self):
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.doctors = [
+            Doctor.objects.create(
+                first_name='Doc', last_name=str(n), password='x', email=f'doc{n}@example.com',
+                phone_number='1', speciality=speciality, qualification='MD',
+            )
+            for n, speciality in enumerate(['Cardiology', 'Cardiology', 'Neurology'])
+        ]
+
+    def assertSummariesMatchAccounts(self):
+        expected = {}
+        for role, model in AGGREGATE_MODELS.items():
+            expected[('role', role)] = model.objects.count()
+            if role in PROFILE_ROLES:
+                expected[('incomplete', role)] = model.objects.filter(profile_missing__gt=0).count()
+        for speciality, count in Doctor.objects.values_list('speciality').annotate(n=Count('pk')):
+            expected[('speciality', speciality)] = count
+        counts = {(kind, key): count for kind, key, count in SummaryCount.objects.values_list('kind', 'key', 'count')}
+        self.assertEqual({bucket: count for bucket, count in counts.items() if count}, {
+            bucket: count for bucket, count in expected.items() if count
+        })
+
+    def registrations(self):
+        return {(role, day): count for role, day, count in DailyRegistrations.objects.values_list('role', 'day', 'count')}
+
+    def test_refresh_follows_creates_updates_and_deletes(self):
+        self.assertEqual(refresh_aggregates()['doctor'][:2], (3, 3))
+        self.assertSummariesMatchAccounts()
+        today = date.today()
+        self.assertEqual(self.registrations(), {('patient', today): 1, ('doctor', today): 3})
+
+        doctor = self.doctors[0]
+        doctor.speciality = 'Neurology'
+        doctor.save()
+        self.patient.delete()
+        Pharmacist.objects.create(
+            first_name='Pia', last_name='Das', password='x', license_number='L-1', phone_number='1',
+            email='pia@example.com', address='Here',
+        )
+        report = refresh_aggregates()
+        self.assertEqual(report['patient'][2], 1)
+        self.assertEqual(report['pharmacist'][0], 1)
+        self.assertSummariesMatchAccounts()
+        # Registrations are history: a deleted account still registered that day
+        self.assertEqual(self.registrations(), {('patient', today): 1, ('doctor', today): 3, ('pharmacist', today): 1})
+
+        # Nothing changed: the stamp the dashboard ETag hangs off stays put
+        stamp = AggregateWatermark.objects.get(role='doctor').refreshed_at
+        refresh_aggregates()
+        self.assertEqual(AggregateWatermark.objects.get(role='doctor').refreshed_at, stamp)
+
+    def test_late_commits_inside_the_overlap_are_picked_up(self):
+        refresh_aggregates()
+        mark = AggregateWatermark.objects.get(role='doctor').last_updated_at
+        self.assertGreater(UPDATED_AT_OVERLAP, timedelta(minutes=1))
+        # A save stamped before the mark whose transaction only committed after the refresh
+        Doctor.objects.filter(pk=self.doctors[2].pk).update(
+            speciality='Cardiology', updated_at=mark - timedelta(minutes=1),
+        )
+        refresh_aggregates()
+        self.assertSummariesMatchAccounts()
+
+    def test_inserts_committed_below_the_last_id_are_counted(self):
+        Patient.objects.create(pk=self.patient.pk + 100, first_name='Ravi', last_name='Rao', password='x')
+        refresh_aggregates()
+        # A lower id whose transaction committed after the refresh had read past it
+        Patient.objects.create(pk=self.patient.pk + 50, first_name='Mira', last_name='Rao', password='x')
+        self.assertEqual(refresh_aggregates()['patient'][0], 1)
+        self.assertSummariesMatchAccounts()
+        self.assertEqual(self.registrations()[('patient', date.today())], 3)
+
+    def test_deletes_are_taken_out_through_tombstones(self):
+        refresh_aggregates()
+        Doctor.objects.filter(speciality='Cardiology').delete()
+        self.assertEqual(AggregateTombstone.objects.filter(role='doctor').count(), 2)
+        self.assertEqual(refresh_aggregates()['doctor'][2], 2)
+        self.assertFalse(AggregateTombstone.objects.exists())
+        self.assertSummariesMatchAccounts()
+
+    def test_incremental_refresh_seeks_indexes(self):
+        Pharmacist.objects.create(
+            first_name='Pia', last_name='Das', password='x', license_number='L-1', phone_number='1',
+            email='pia@example.com', address='Here',
+        )
+        refresh_aggregates()
+        with CaptureQueriesContext(connection) as queries:
+            refresh_aggregates()
+        tables = tuple(f'"{model._meta.db_table}"' for model in AGGREGATE_MODELS.values())
+        reads = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and any(table in query['sql'] for table in tables)
+        ]
+        self.assertTrue(reads)
+        with connection.cursor() as cursor:
+            for sql in reads:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+                # (rowid<?) alone is every id up to the top: a scan in all but name
+                self.assertNotRegex(plan, r'SCAN main_(patient|doctor|pharmacist)\b|\(rowid<\?\)', sql)
+
+    def test_rebuild_matches_refresh(self):
+        refresh_aggregates()
+        Doctor.objects.update(speciality='Oncology', updated_at=datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+        rebuild_aggregates()
+        self.assertSummariesMatchAccounts()
+
+
+class FileServingTests(SimpleTestCase):
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = os.path.join(self.root, 'app.js')
+        with open(self.path, 'wb') as handle:
+            handle.write(self.DATA)
+        self.factory = RequestFactory()
+
+    def serve(self, path='app.js', **headers):
+        response = serve_file(self.factory.get('/', headers=headers), self.root, path)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def write_gzip(self, mtime_offset=1):
+        with open(self.path + '.gz', 'wb') as handle:
+            handle.write(gzip.compress(self.DATA))
+        st = os.stat(self.path)
+        os.utime(self.path + '.gz', (st.st_atime, st.st_mtime + mtime_offset))
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+        self.assertEqual(parse_range('bytes=990-5000', 1000), (990, 999))
+        self.assertIs(parse_range('bytes=1000-', 1000), False)
+        self.assertIs(parse_range('bytes=-0', 1000), False)
+        self.assertIs(parse_range('bytes=50-10', 1000), False)
+        self.assertIsNone(parse_range('bytes=0-10,20-30', 1000))
+        self.assertIsNone(parse_range('items=0-10', 1000))
+        self.assertIsNone(parse_range('bytes=-', 1000))
+
+    def test_whole_file(self):
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.DATA)
+        self.assertEqual(response['Content-Length'], str(len(self.DATA)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.serve(If_None_Match=response['ETag']).status_code, 304)
+
+    def test_single_range(self):
+        response = self.serve(Range='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.body, self.DATA[-24:])
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1023/{len(self.DATA)}')
+        self.assertEqual(response['Content-Length'], '24')
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.DATA)}')
+
+    def test_multiple_ranges_get_the_whole_file(self):
+        response = self.serve(Range='bytes=0-9,20-29')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.DATA)
+
+    def test_if_range(self):
+        etag = self.serve()['ETag']
+        self.assertEqual(self.serve(Range='bytes=0-9', If_Range=etag).status_code, 206)
+        stale = self.serve(Range='bytes=0-9', If_Range='"stale"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.body, self.DATA)
+
+    def test_precompressed_variant(self):
+        self.write_gzip()
+        identity = self.serve()
+        compressed = self.serve(Accept_Encoding='br, gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.body), self.DATA)
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertIn('Accept-Encoding', identity['Vary'])
+        self.assertTrue(compressed['ETag'].endswith('-gzip"'))
+        self.assertNotEqual(compressed['ETag'], identity['ETag'])
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        # Refused codings, ranges and stale variants get the identity bytes
+        self.assertFalse(self.serve(Accept_Encoding='gzip;q=0').has_header('Content-Encoding'))
+        self.assertFalse(self.serve(Accept_Encoding='gzip', Range='bytes=0-9').has_header('Content-Encoding'))
+        self.write_gzip(mtime_offset=-10)
+        self.assertFalse(self.serve(Accept_Encoding='gzip').has_header('Content-Encoding'))
+
+    def test_paths_outside_the_root_are_not_found(self):
+        for path in ('../secret.txt', '/etc/passwd', 'missing.js', ''):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.serve(path)
+
+    def test_accel_redirect(self):
+        os.mkdir(os.path.join(self.root, 'css'))
+        with open(os.path.join(self.root, 'css', 'app.0123456789ab.css'), 'w') as handle:
+            handle.write('body{}')
+        response = serve_file(
+            self.factory.get('/'), self.root, 'css/app.0123456789ab.css', accel_prefix='/protected/static/',
+        )
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/static/css/app.0123456789ab.css')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Routing against a real second connection: replica1 is a TEST MIRROR of
+    default, so it reads the same test database through its own connection
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists for this class, so the runner must not set it up.
+        cls.replica = {**connections.settings['default'], 'TEST': {'MIRROR': 'default'}}
+        connections.settings['replica1'] = cls.replica
+        cls.databases = {'default', 'replica1'}
+        cls.addClassCleanup(cls.drop_replica)
+        super().setUpClass()
+
+    @classmethod
+    def drop_replica(cls):
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+
+    def setUp(self):
+        # The router finds replicas by scanning settings.DATABASES.
+        settings_override = override_settings(DATABASES={**settings.DATABASES, 'replica1': self.replica})
+        with warnings.catch_warnings():
+            warnings.filterwarnings('ignore', 'Overriding setting DATABASES')
+            settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', password='x')
+        self.factory = RequestFactory()
+
+    def respond(self, request, view):
+        """Run view(request) behind the pinning middleware; returns (response, {alias: queries})"""
+        captures = {alias: CaptureQueriesContext(connections[alias]) for alias in ('default', 'replica1')}
+        for capture in captures.values():
+            capture.__enter__()
+        def handler(request):
+            view()
+            return HttpResponse()
+
+        try:
+            response = ReplicaPinningMiddleware(handler)(request)
+        finally:
+            for capture in captures.values():
+                capture.__exit__(None, None, None)
+        return response, {alias: len(capture) for alias, capture in captures.items()}
+
+    def read(self):
+        self.assertEqual(Patient.objects.get(pk=self.patient.pk).first_name, 'Asha')
+
+    def test_reads_go_to_the_replica(self):
+        response, queries = self.respond(self.factory.get('/'), self.read)
+        self.assertEqual(queries, {'default': 0, 'replica1': 1})
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_outside_a_request_everything_uses_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Patient), 'default')
+
+    def test_writes_and_transactions_use_the_primary(self):
+        def write_then_read():
+            Patient.objects.filter(pk=self.patient.pk).update(last_name='Iyer')
+            self.read()
+
+        def read_in_transaction():
+            with transaction.atomic():
+                self.read()
+
+        _, queries = self.respond(self.factory.get('/'), write_then_read)
+        self.assertEqual(queries['replica1'], 0)
+        _, queries = self.respond(self.factory.get('/'), read_in_transaction)
+        self.assertEqual(queries['replica1'], 0)
+        _, queries = self.respond(self.factory.post('/'), self.read)
+        self.assertEqual(queries['replica1'], 0)
+
+    def test_pin_cookie_follows_a_write(self):
+        response, _ = self.respond(
+            self.factory.get('/'), lambda: Patient.objects.create(first_name='Ravi', last_name='Rao', password='x'),
+        )
+        cookie = response.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.assertTrue(cookie['httponly'])
+
+        pinned = self.factory.get('/')
+        pinned.COOKIES[settings.REPLICA_PIN_COOKIE] = cookie.value
+        _, queries = self.respond(pinned, self.read)
+        self.assertEqual(queries, {'default': 1, 'replica1': 0})
+        # Once the browser drops the expired cookie, reads go back to the replica
+        _, queries = self.respond(self.factory.get('/'), self.read)
+        self.assertEqual(queries, {'default': 0, 'replica1': 1})
+
+    def test_sessions_stay_on_the_primary(self):
+        routes = []
+        router = PrimaryReplicaRouter()
+        self.respond(self.factory.get('/'), lambda: routes.extend(map(router.db_for_read, (Session, Patient))))
+        self.assertEqual(routes, ['default', 'replica1'])
+
+
+class ConditionalPageTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        self.patient = Patient.objects.create(
+            first_name='Asha', last_name='Rao', email='asha@example.com', gender='female', password='x',
+        )
+        session = self.client.session
+        session['patient_id'] = self.patient.pk
+        session.save()
+
+    def revalidate(self, url_name):
+        """GET the page, then again with its ETag; returns (first response, second response)"""
+        # The first visit sets the CSRF cookie, which is part of the ETag
+        self.client.get(reverse(url_name))
+        response = self.client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        return response, self.client.get(reverse(url_name), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_not_modified(self):
+        for url_name in ('patient_dashboard', 'update_profile'):
+            with self.subTest(page=url_name):
+                response, revalidated = self.revalidate(url_name)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], response['ETag'])
+                self.assertEqual(revalidated.content, b'')
+
+    def test_saving_the_profile_changes_the_etag(self):
+        before, _ = self.revalidate('update_profile')
+        response = self.client.post(reverse('update_profile'), {
+            'first_name': 'Asha', 'last_name': 'Iyer', 'email': 'asha@example.com', 'gender': 'female',
+            'height': '160', 'weight': '55',
+        })
+        # Pending messages turn the ETag off until a page has shown them
+        self.assertContains(response, 'Profile updated successfully')
+        self.assertFalse(response.has_header('ETag'))
+        after, revalidated = self.revalidate('update_profile')
+        self.assertContains(after, 'Iyer')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+@override_settings(ROOT_URLCONF=settings.ASGI_ROOT_URLCONF)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        # Stored in plaintext, like rows from before passwords were hashed
+        self.patient = Patient.objects.create(
+            first_name='Asha', last_name='Rao', email='asha@example.com', gender='female', password='secret',
+        )
+
+    async def alogin(self, password='secret'):
+        return await self.async_client.post(reverse('login'), {'email': 'asha@example.com', 'password': password})
+
+    async def test_login_upgrades_plaintext_passwords(self):
+        response = await self.alogin(password='wrong')
+        self.assertContains(response, 'Invalid credentials')
+        response = await self.alogin()
+        self.assertRedirects(response, reverse('patient_dashboard'), fetch_redirect_response=False)
+        await self.patient.arefresh_from_db()
+        self.assertTrue(is_password_hash(self.patient.password))
+        # The upgraded hash still signs in
+        self.async_client.cookies.clear()
+        response = await self.alogin()
+        self.assertRedirects(response, reverse('patient_dashboard'), fetch_redirect_response=False)
+
+    async def test_dashboard_and_profile_use_the_async_views(self):
+        await self.alogin()
+        for url_name, view, text in [
+            ('patient_dashboard', async_views.patient_dashboard, 'Asha'),
+            ('update_profile', async_views.update_profile, 'asha@example.com'),
+        ]:
+            with self.subTest(page=url_name):
+                response = await self.async_client.get(reverse(url_name))
+                self.assertIs(response.resolver_match.func, view)
+                self.assertContains(response, text)
+
+    async def test_pages_require_a_login(self):
+        response = await self.async_client.get(reverse('patient_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+
+class ASGIHandlerTests(TestCase):
+    def serve(self, path):
+        """Send one GET through mediwise.asgi.application; returns (status, the request it built)"""
+        from mediwise.asgi import application
+
+        requests, messages = [], []
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 1234), 'server': ('testserver', 80),
+        }
+        body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            if body:
+                return body.pop()
+            # Nothing more to read; the handler cancels this once it has responded
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+
+        def rendered(sender, context, **kwargs):
+            requests.append(context['request'])
+
+        template_rendered.connect(rendered)
+        try:
+            async_to_sync(application)(scope, receive, send)
+        finally:
+            template_rendered.disconnect(rendered)
+        return messages[0]['status'], requests[0]
+
+    def test_requests_resolve_against_the_asgi_urlconf(self):
+        status, request = self.serve(reverse('login'))
+        self.assertEqual(status, 200)
+        self.assertEqual(request.urlconf, settings.ASGI_ROOT_URLCONF)
+        self.assertIs(request.resolver_match.func, async_views.login)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        principal_cache.clear()
+        # Histograms are per process; give each test an empty set
+        saved = dict(metrics._histograms)
+        metrics._histograms.clear()
+        self.addCleanup(metrics._histograms.update, saved)
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', gender='female', password='x')
+        session = self.client.session
+        session['patient_id'] = self.patient.pk
+        session.save()
+
+    def test_server_timing_counts_the_views_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('patient_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn(f'desc="{len(queries)} queries"', response['Server-Timing'])
+        histogram = metrics._histograms[('mediwise_request_queries', 'patient_dashboard')]
+        self.assertEqual((sum(histogram.counts), histogram.sum), (1, len(queries)))
+
+    def test_endpoint_only_answers_allowed_addresses(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.7').status_code, 404)
+        self.client.get(reverse('patient_dashboard'))
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'mediwise_request_queries_count{view="patient_dashboard"} 1')
+
+    def test_histograms_render_cumulative_buckets(self):
+        for value in (1, 3, 3, 250):
+            metrics.observe('mediwise_request_queries', 'dash"board', value)
+        lines = metrics.render_prometheus().splitlines()
+        self.assertIn('# TYPE mediwise_request_queries histogram', lines)
+        self.assertEqual([line for line in lines if line.startswith('mediwise_request_queries')], [
+            'mediwise_request_queries_bucket{view="dash\\"board",le="1"} 1',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="2"} 1',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="5"} 3',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="10"} 3',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="20"} 3',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="50"} 3',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="100"} 3',
+            'mediwise_request_queries_bucket{view="dash\\"board",le="+Inf"} 4',
+            'mediwise_request_queries_sum{view="dash\\"board"} 257.000000',
+            'mediwise_request_queries_count{view="dash\\"board"} 4',
+        ])
+
+    def test_requests_over_the_threshold_log_their_sql(self):
+        with self.settings(METRICS_QUERY_LOG_THRESHOLD=1), self.assertLogs('main.metrics', 'WARNING') as logs:
+            self.client.get(reverse('patient_dashboard'))
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('GET /patient_dashboard/ (patient_dashboard) ran', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_requests_within_the_threshold_are_not_logged(self):
+        with self.assertNoLogs('main.metrics', 'WARNING'):
+            self.client.get(reverse('patient_dashboard'))
+
+
+class FragmentVersionTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        principal_cache.clear()
+        self.patient = Patient.objects.create(first_name='Asha', last_name='Rao', gender='female', password='x')
+
+    def render(self, name):
+        template = Template("{% load cache %}{% cache fragment_ttl greeting fragment_key %}Hi, {{ name }}{% endcache %}")
+        return template.render(Context({'name': name, **fragment_context('patient', self.patient)}))
+
+    def test_saves_and_deletes_change_the_key(self):
+        self.assertEqual(self.render('Asha'), 'Hi, Asha')
+        # Same version, same cached fragment
+        self.assertEqual(self.render('Meera'), 'Hi, Asha')
+        self.patient.save()
+        self.assertEqual(self.render('Meera'), 'Hi, Meera')
+        pk = self.patient.pk
+        self.patient.delete()
+        self.patient.pk = pk
+        self.assertEqual(self.render('Ravi'), 'Hi, Ravi')
+
+    def test_dashboard_shows_the_saved_account(self):
+        session = self.client.session
+        session['patient_id'] = self.patient.pk
+        session.save()
+        self.assertContains(self.client.get(reverse('patient_dashboard')), 'Hi, Asha')
+        # update() sends no signal, so the cached body is still served
+        Patient.objects.filter(pk=self.patient.pk).update(first_name='Meera')
+        principal_cache.clear()
+        self.assertContains(self.client.get(reverse('patient_dashboard')), 'Hi, Asha')
+        self.patient.first_name = 'Meera'
+        self.patient.save()
+        self.assertContains(self.client.get(reverse('patient_dashboard')), 'Hi, Meera')
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.patients = [
+            Patient(
+                first_name=f'Patient{i}', last_name='Rao, "Jr"' if i % 7 == 0 else 'Rao', password='x',
+                email=f'p{i}@example.com', gender='female' if i % 2 else None,
+                date_of_birth=date(1990, 1, 1) + timedelta(days=i) if i % 3 else None,
+                address='12 Park Street\nKolkata' if i % 5 == 0 else None, height='160',
+            )
+            for i in range(1200)
+        ]
+        Patient.objects.bulk_create(self.patients)
+        admin = MediAdmin.objects.create(email='admin@example.com', password='x')
+        session = self.client.session
+        session['admin_id'] = admin.pk
+        session.save()
+
+    def expected_rows(self):
+        """What csv.reader gives back for every patient: None as '', everything else as str()"""
+        return [
+            ['' if value is None else str(value) for value in row]
+            for row in Patient.objects.order_by('pk').values_list(*EXPORT_FIELDS['patient'])
+        ]
+
+    def test_gzip_chunks_round_trip(self):
+        chunks = list(export_chunks('patient', 'csv', compress=True, chunk_size=100))
+        # Several flushed members: header, then one per ROWS_PER_WRITE batch, then the trailer
+        self.assertGreater(len(chunks), 3)
+        rows = list(csv.reader(StringIO(gzip.decompress(b''.join(chunks)).decode())))
+        self.assertEqual(rows[0], list(EXPORT_FIELDS['patient']))
+        self.assertIn('registration_date', rows[0])
+        self.assertEqual(rows[1:], self.expected_rows())
+
+    def test_streamed_response_round_trip(self):
+        response = self.client.get(reverse('export_people', args=['patient']), {'format': 'csv', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="patients.csv.gz"')
+        data = gzip.decompress(b''.join(response.streaming_content)).decode()
+        rows = list(csv.reader(StringIO(data)))
+        self.assertEqual(rows, [list(EXPORT_FIELDS['patient'])] + self.expected_rows())
+        self.assertEqual(rows[1][-1], str(date.today()))
+
+
+class ProfileCompletenessTests(TestCase):
+    def patient(self, **fields):
+        return Patient.objects.create(first_name='Asha', last_name='Rao', password='x', **fields)
+
+    def stored(self, instance):
+        return type(instance).objects.values_list('profile_missing', 'profile_completeness').get(pk=instance.pk)
+
+    def test_save_sets_the_bitmask_and_score(self):
+        # Bits follow Patient.PROFILE_FIELDS; 'None' (as stored by old forms) counts as empty
+        patient = self.patient(phone_number='98400', address='12 Park Street', blood_group='None', height='')
+        self.assertEqual(self.stored(patient), (0b111100, 33))
+        patient.date_of_birth, patient.blood_group, patient.height, patient.weight = date(1990, 1, 1), 'o+', '160', '55'
+        patient.save()
+        self.assertEqual(self.stored(patient), (0, 100))
+        self.assertEqual(missing_profile_fields(patient), [])
+
+    def test_partial_saves_keep_the_columns_in_step(self):
+        patient = self.patient()
+        self.assertEqual(self.stored(patient), (0b111111, 0))
+        patient.phone_number = '98400'
+        patient.save(update_fields=['phone_number'])
+        self.assertEqual(self.stored(patient), (0b111110, 17))
+        # Without a profile field in update_fields the stored columns describe the stored row
+        patient.weight = '55'
+        patient.save(update_fields=['first_name'])
+        self.assertEqual(self.stored(patient), (0b111110, 17))
+
+    def test_migration_backfill_matches_save(self):
+        backfill = importlib.import_module('main.migrations.0017_profile_completeness').backfill_profile_completeness
+        values = (None, '', 'None', 'filled')
+        for i in range(len(values) ** 2):
+            first, second = values[i % 4], values[i // 4]
+            self.patient(
+                phone_number=first, address=second, blood_group=first and 'o+', height=second, weight=first,
+                date_of_birth=date(1990, 1, 1) if i % 3 else None,
+            )
+            Doctor.objects.create(
+                first_name='Dev', last_name=str(i), password='x', phone_number='1', email=f'dev{i}@example.com',
+                speciality='Cardiology', qualification='MD', description=first, cureentHospital=second,
+                # license_number is unique, so it only alternates between unset and filled
+                license_number=f'LIC{i}' if i % 3 else None, address=second,
+                profile_picture='profile_pictures/dev.png' if i % 2 else '',
+            )
+        expected = {model: dict(model.objects.values_list('pk', 'profile_missing')) for model in (Patient, Doctor)}
+        self.assertGreater(len({*expected[Patient].values()}), 4)
+        for model in (Patient, Doctor):
+            model.objects.update(profile_missing=0, profile_completeness=0)
+
+        backfill(django_apps, connection.schema_editor())
+
+        for model in (Patient, Doctor):
+            for row in model.objects.all():
+                missing, completeness = row.profile_missing, row.profile_completeness
+                update_profile_completeness(row)
+                with self.subTest(model=model.__name__, pk=row.pk):
+                    self.assertEqual((missing, completeness), (row.profile_missing, row.profile_completeness))
+                    self.assertEqual(missing, expected[model][row.pk])
@@ -1,7 +1,7 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 from django.conf import settings
-from django.conf.urls.static import static
+from .serving import serve_media, serve_static
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -12,6 +12,11 @@ urlpatterns = [
     path('patient/profile/', views.update_profile, name='update_profile'),
     path('admin_profile/', views.admin_profile, name='admin_profile'),
     path('admin_doctors/', views.manage_doctors, name='manage_doctors'),
+    path('admin_doctors/feed/', views.doctor_feed, name='doctor_feed'),
+    path('admin_exports/<str:role>/', views.export_people, name='export_people'),
+    path('avatars/<str:initials>.svg', views.initials_avatar, name='initials_avatar'),
+    path('search/typeahead/', views.search_typeahead, name='search_typeahead'),
+    path('metrics', views.metrics, name='metrics'),
     path('doctor/dashboard/', views.doctor_dashboard, name='doctor_dashboard'),
     path('doctor/profile/', views.doctor_profile, name='doctor_profile'),
     path('pharmacist/dashboard/', views.pharmacist_dashboard, name='pharmacist_dashboard'),
@@ -20,6 +25,8 @@ urlpatterns = [
     path('logout/', views.logout, name='logout'),
 ]
 
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Uploads and collected static files (runserver still serves app static dirs itself under DEBUG)
+urlpatterns += [
+    re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='serve_media'),
+    re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static, name='serve_static'),
+]
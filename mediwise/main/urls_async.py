@@ -0,0 +1,24 @@
+from django.urls import URLPattern
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# URL name -> coroutine view replacing the sync one under ASGI
+ASYNC_VIEWS = {
+    'login': async_views.login,
+    'admin_dashboard': async_views.admin_dashboard,
+    'patient_dashboard': async_views.patient_dashboard,
+    'update_profile': async_views.update_profile,
+    'admin_profile': async_views.admin_profile,
+    'doctor_dashboard': async_views.doctor_dashboard,
+    'doctor_profile': async_views.doctor_profile,
+    'pharmacist_dashboard': async_views.pharmacist_dashboard,
+    'pharmacist_profile': async_views.pharmacist_profile,
+}
+
+# Same routes and names as main.urls, so reverse() and templates are unaffected
+urlpatterns = [
+    URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
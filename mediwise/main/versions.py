@@ -0,0 +1,20 @@
+import uuid
+
+from .models import DataVersion
+
+# Versions of tables that each process caches in memory (the interaction
+# matrix, the free-slot indexes). They live in the database rather than the
+# cache so that a change made by any worker reaches all of them: the version
+# is written in the same transaction as the change, so whoever reads the new
+# version reads the new rows after it.
+
+
+def current_version(name):
+    """The version to cache against; '' until the first change"""
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or ''
+
+
+def bump_version(name):
+    version = uuid.uuid4().hex
+    if not DataVersion.objects.filter(name=name).update(version=version):
+        DataVersion.objects.get_or_create(name=name, defaults={'version': version})
@@ -1,7 +1,23 @@
 from django.shortcuts import render, redirect
-from .models import MediAdmin, Patient, Users, Doctor, Pharmacist
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.template.loader import render_to_string
+from .models import Users, Doctor
 from .forms import PatientRegistrationForm, PharmacistRegistrationForm, PatientProfileUpdateForm, DoctorRegistrationForm, PharmacistProfileUpdateForm
 from django.contrib import messages
+from django.conf import settings
+from .identity import LOGIN_MODELS, find_accounts
+from .credentials import CredentialPoolBusy, check_account_password, hash_password
+from .principal import principal_required
+from .conditional import conditional_page
+from .directory import doctor_page, doctor_search_results, decode_cursor
+from .search import search
+from .pharmacy import dashboard_summary
+from .aggregates import admin_summary, refresh_stamp
+from .export import EXPORT_FORMATS, EXPORT_MODELS, export_chunks, export_filename
+from .fragments import fragment_context
+from .metrics import render_prometheus
+from .avatars import DEFAULT_BACKGROUND, DEFAULT_COLOUR, clean_colour, clean_initials, render_avatar
 
 
 
@@ -10,17 +26,11 @@ from django.contrib import messages
 def index(request):
     return render(request, 'index.html')
 
-def getUser(email, password): # Import here to avoid circular import
-    mapping = {
-        'admin': MediAdmin,
-        'patient': Patient,
-        'pharmacist': Pharmacist,
-        'doctor': Doctor
-    }
-
-    for role, model in mapping.items():
-        user = model.objects.filter(email=email, password=password).first()
-        if user:
+def getUser(email, password):
+    # One indexed lookup on the identity table instead of probing every role table
+    for role, object_id in find_accounts(email):
+        user = LOGIN_MODELS[role].objects.filter(pk=object_id).first()
+        if user and check_account_password(user, password):
             return role, user # Return the object too so you can use it
     return None, None
 
@@ -29,7 +39,10 @@ def login(request):
         email = request.POST.get('email')
         password = request.POST.get('password')
         
-        role, user_obj = getUser(email, password)
+        try:
+            role, user_obj = getUser(email, password)
+        except CredentialPoolBusy:
+            return render(request, 'login.html', {'error': 'Too many sign-in attempts right now, please try again'}, status=503)
         
         if role == 'admin':
             request.session['admin_id'] = user_obj.id
@@ -52,46 +65,30 @@ def logout(request):
     request.session.flush()
     return redirect('index')
 
+@conditional_page('admin', stamp=refresh_stamp)
+@principal_required('admin')
 def admin_dashboard(request):
-    # Check if admin is logged in
-    admin_id = request.session.get('admin_id')
-    if not admin_id:
-        return redirect('login')
-    
-    try:
-        admin = MediAdmin.objects.get(id=admin_id)
-    except MediAdmin.DoesNotExist:
-        return redirect('login')
-    
-    return render(request, 'admin/dashboard.html', {'admin': admin})
+    admin = request.principal
+    context = {'admin': admin, 'summary': admin_summary(), **fragment_context('admin', admin)}
+    return render(request, 'admin/dashboard.html', context)
 
+@conditional_page('patient')
+@principal_required('patient')
 def patient_dashboard(request):
-    user_id = request.session.get('patient_id')
-    if user_id is None:
-        return redirect('login')
-    
-    user = Patient.objects.filter(id=user_id).first()
-    
-    # Define which fields are required for a "complete" profile
-    # Add or remove fields based on your Patient model
-    required_fields = [user.phone_number, user.address, user.date_of_birth, user.blood_group, user.height, user.weight]
-    profile_incomplete = any(field in [None, '', 'None'] for field in required_fields)
+    user = request.principal
 
+    # Stored by Patient.save(); see Patient.PROFILE_FIELDS for what counts
     context = {
         'user': user,
-        'profile_incomplete': profile_incomplete,
+        'profile_incomplete': user.profile_missing != 0,
+        **fragment_context('patient', user),
     }
     return render(request, 'patient/dashboard.html', context)
 
+@conditional_page('patient')
+@principal_required('patient')
 def update_profile(request):
-    user_id = request.session.get('patient_id')
-    if not user_id:
-        return redirect('login')
-    
-    try:
-        patient = Patient.objects.get(id=user_id)
-    except Patient.DoesNotExist:
-        return redirect('login')
+    patient = request.principal
     
     if request.method == 'POST':
         # instance=patient populates the form with existing data and maps the POST data to it
@@ -109,20 +106,17 @@ def update_profile(request):
     })
 
 
+@conditional_page('admin')
+@principal_required('admin')
 def admin_profile(request):
-    admin_id = request.session.get('admin_id')
-    
-    if not admin_id:
-        return redirect('login')
-    
-    try:
-        admin = MediAdmin.objects.get(id=admin_id)
-    except MediAdmin.DoesNotExist:
-        return redirect('login')
+    admin = request.principal
     
     if request.method == 'POST':
         admin.email = request.POST.get('email')
-        admin.password = request.POST.get('password')
+        password = request.POST.get('password')
+        # Blank keeps the current password
+        if password:
+            admin.password = hash_password(password)
         admin.save()
         messages.success(request, "Admin profile updated successfully!")
         return redirect('admin_profile')
@@ -133,57 +127,24 @@ def admin_profile(request):
     return render(request, 'admin/profile.html', context)
 
 
+@principal_required('pharmacist')
 def pharmacist_dashboard(request):
-    from .models import Pharmacist  # Import here to avoid circular import
-    
-    pharmacist_id = request.session.get('pharmacist_id')
-    
-    if not pharmacist_id:
-        return redirect('login')
+    pharmacist = request.principal
     
-    try:
-        pharmacist = Pharmacist.objects.get(id=pharmacist_id)
-    except:
-        return redirect('login')
-    
-    # Dummy data for dashboard
-    dashboard_data = {
-        'prescriptions_pending': 12,
-        'medications_low_stock': 5,
-        'today_orders': 24,
-        'weekly_sales': 12500,
-        'recent_customers': [
-            {'name': 'John Doe', 'contact': 'john@example.com', 'last_visit': 'Today'},
-            {'name': 'Jane Smith', 'contact': 'jane@example.com', 'last_visit': 'Yesterday'},
-            {'name': 'Robert Johnson', 'contact': 'robert@example.com', 'last_visit': '2 days ago'},
-        ],
-        'low_stock_medications': [
-            {'name': 'Aspirin', 'quantity': 5},
-            {'name': 'Amoxicillin', 'quantity': 3},
-            {'name': 'Lisinopril', 'quantity': 7},
-            {'name': 'Metformin', 'quantity': 2},
-            {'name': 'Atorvastatin', 'quantity': 4},
-        ]
-    }
+    dashboard_data = dashboard_summary(pharmacist)
     
     context = {
         'pharmacist': pharmacist,
-        'data': dashboard_data
+        'data': dashboard_data,
+        **fragment_context('pharmacist', pharmacist),
     }
     return render(request, 'pharmacist/dashboard.html', context)
 
 
+@conditional_page('pharmacist')
+@principal_required('pharmacist')
 def pharmacist_profile(request):
-    
-    pharmacist_id = request.session.get('pharmacist_id')
-    
-    if not pharmacist_id:
-        return redirect('login')
-    
-    try:
-        pharmacist = Pharmacist.objects.get(id=pharmacist_id)
-    except:
-        return redirect('login')
+    pharmacist = request.principal
     
     if request.method == 'POST':
         form = PharmacistProfileUpdateForm(request.POST, instance=pharmacist)
@@ -194,44 +155,31 @@ def pharmacist_profile(request):
     else:
         form = PharmacistProfileUpdateForm(instance=pharmacist)
     
-    # Pass password value for display as dots
+    # Stored passwords are hashed, so only tell the template whether one is set
     context = {
         'pharmacist': pharmacist,
         'form': form,
         'has_password': bool(pharmacist.password and pharmacist.password.strip()),
-        'current_password': pharmacist.password if pharmacist.password else ''
     }
     return render(request, 'pharmacist/profile.html', context)
 
+@conditional_page('doctor')
+@principal_required('doctor')
 def doctor_dashboard(request):
-    user_id = request.session.get('doctor_id')
-    if not user_id:
-        return redirect('login')
-    
-    try:
-        doctor = Doctor.objects.get(id=user_id)
-    except Doctor.DoesNotExist:
-        return redirect('login')
-    
-    # Check profile completion (customize as needed)
-    required_fields = [doctor.description, doctor.profile_picture, doctor.cureentHospital, doctor.license_number, doctor.address]
-    profile_incomplete = any(field in [None, '', 'None'] for field in required_fields)
+    doctor = request.principal
 
+    # Stored by Doctor.save(); see Doctor.PROFILE_FIELDS for what counts
     context = {
         'user': doctor,
-        'profile_incomplete': profile_incomplete,
+        'profile_incomplete': doctor.profile_missing != 0,
+        **fragment_context('doctor', doctor),
     }
     return render(request, 'doctor/dashboard.html', context)
 
+@conditional_page('doctor')
+@principal_required('doctor')
 def doctor_profile(request):
-    user_id = request.session.get('doctor_id')
-    if not user_id:
-        return redirect('login')
-    
-    try:
-        doctor = Doctor.objects.get(id=user_id)
-    except Doctor.DoesNotExist:
-        return redirect('login')
+    doctor = request.principal
     
     from .forms import DoctorProfileUpdateForm
     
@@ -249,12 +197,11 @@ def doctor_profile(request):
     else:
         form = DoctorProfileUpdateForm(instance=doctor)
     
-    # Pass password value for display as dots and profile picture status
+    # Stored passwords are hashed, so only tell the template whether one is set
     context = {
         'form': form, 
         'user': doctor,
         'has_password': bool(doctor.password and doctor.password.strip()),
-        'current_password': doctor.password if doctor.password else '',
         'has_profile_picture': bool(doctor.profile_picture)
     }
     return render(request, 'doctor/profile.html', context)
@@ -296,11 +243,42 @@ def register(request):
     }
     return render(request, 'register.html', context)
 
+def initials_avatar(request, initials):
+    # Rendered once per (initials, palette) and cached; the URL fully determines the image
+    svg, etag = render_avatar(
+        clean_initials(initials),
+        clean_colour(request.GET.get('background'), DEFAULT_BACKGROUND),
+        clean_colour(request.GET.get('color'), DEFAULT_COLOUR),
+    )
+    response = HttpResponse(svg, content_type='image/svg+xml')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.STATIC_MAX_AGE, immutable=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+def metrics(request):
+    """Per-view request histograms for Prometheus (this process only)"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@principal_required('admin')
+def export_people(request, role):
+    # Streams the roster chunk by chunk so memory stays flat however large the table is
+    fmt = request.GET.get('format', 'csv')
+    if role not in EXPORT_MODELS or fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export")
+    compress = request.GET.get('gzip') == '1'
+    response = StreamingHttpResponse(
+        export_chunks(role, fmt, compress=compress),
+        content_type='application/gzip' if compress else EXPORT_FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(role, fmt, compress)}"'
+    return response
+
+@principal_required('admin')
 def manage_doctors(request):
-    # Ensure admin authentication
-    if not request.session.get('admin_id'):
-        return redirect('login')
-        
     if request.method == 'POST':
         action = request.POST.get('action')
         
@@ -347,11 +325,42 @@ def manage_doctors(request):
                 
         return redirect('manage_doctors')
         
-    # GET request
-    doctors = Doctor.objects.all().order_by('-registration_date')
+    # GET request: first page only, the rest is fetched by doctor_feed on scroll
+    query = request.GET.get('q', '').strip()
+    speciality = request.GET.get('speciality', '').strip()
+    hospital = request.GET.get('hospital', '').strip()
+    incomplete = bool(request.GET.get('incomplete'))
+    if query:
+        # Ranked full-text matches replace the paginated listing
+        doctors, next_cursor = doctor_search_results(query), None
+    else:
+        doctors, next_cursor = doctor_page(speciality, hospital, decode_cursor(request.GET.get('cursor')), incomplete=incomplete)
     form = DoctorRegistrationForm()
     
     return render(request, 'admin/doctors.html', {
         'doctors': doctors,
+        'next_cursor': next_cursor,
+        'query': query,
+        'speciality': speciality,
+        'hospital': hospital,
+        'incomplete': incomplete,
         'form': form
     })
+
+@principal_required('admin')
+def doctor_feed(request):
+    # JSON page of doctor cards for infinite scroll on admin/doctors.html
+    speciality = request.GET.get('speciality', '').strip()
+    hospital = request.GET.get('hospital', '').strip()
+    incomplete = bool(request.GET.get('incomplete'))
+    doctors, next_cursor = doctor_page(speciality, hospital, decode_cursor(request.GET.get('cursor')), incomplete=incomplete)
+    html = render_to_string('admin/_doctor_cards.html', {'doctors': doctors}, request=request)
+    return JsonResponse({'html': html, 'count': len(doctors), 'next': next_cursor})
+
+@principal_required('admin')
+def search_typeahead(request):
+    # Ranked prefix matches across doctors, patients and pharmacists
+    query = request.GET.get('q', '').strip()
+    role = request.GET.get('role') or None
+    results = search(query, role=role, limit=8, typeahead=True) if len(query) >= 2 else []
+    return JsonResponse({'results': results})
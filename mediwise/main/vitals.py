@@ -0,0 +1,124 @@
+import re
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Patient, VitalsMeasurement
+
+# Plausible ranges; anything outside is a typo or a unit mix-up
+LIMITS = {
+    'height_cm': (40.0, 250.0),
+    'weight_kg': (2.0, 400.0),
+    'systolic': (50, 260),
+    'diastolic': (30, 160),
+}
+
+NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+
+
+def parse_number(text):
+    """The first number in a free-text profile value ("72", "72.5 kg", "172cm"), or None"""
+    match = NUMBER_RE.search(str(text or ''))
+    return float(match.group().replace(',', '.')) if match else None
+
+
+def bmi(height_cm, weight_kg):
+    if not height_cm or not weight_kg:
+        return None
+    return round(weight_kg / (height_cm / 100) ** 2, 1)
+
+
+def measurement(patient_id, measured_at=None, source='clinic', **values):
+    """
+    A validated, unsaved VitalsMeasurement. Raises ValueError for a value
+    that doesn't parse or is out of range, or half a blood pressure.
+    """
+    clean = {}
+    for field, (low, high) in LIMITS.items():
+        value = values.get(field)
+        if value in (None, ''):
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field}: not a number: {value!r}")
+        if not low <= value <= high:
+            raise ValueError(f"{field}: {value:g} is outside {low}-{high}")
+        clean[field] = round(value) if field in ('systolic', 'diastolic') else value
+    if not clean:
+        raise ValueError("no measurements given")
+    if ('systolic' in clean) != ('diastolic' in clean):
+        raise ValueError("blood pressure needs both systolic and diastolic")
+    if isinstance(measured_at, str):
+        measured_at = parse_datetime(measured_at) if measured_at else timezone.now()
+        if measured_at is None:
+            raise ValueError("measured_at: not a date and time")
+    elif measured_at is not None and not isinstance(measured_at, datetime):
+        # A number or list from JSON would only fail inside bulk_create, taking the batch with it
+        raise ValueError(f"measured_at: not a date and time: {measured_at!r}")
+    if isinstance(measured_at, datetime) and timezone.is_naive(measured_at):
+        measured_at = timezone.make_aware(measured_at)
+    return VitalsMeasurement(
+        patient_id=patient_id, measured_at=measured_at or timezone.now(), source=source,
+        bmi=bmi(clean.get('height_cm'), clean.get('weight_kg')), **clean,
+    )
+
+
+def record_vitals(patient, source='clinic', **values):
+    vitals = measurement(patient.pk, source=source, **values)
+    vitals.save()
+    return vitals
+
+
+def record_profile_vitals(patient):
+    """Append the height and weight from the profile form, ignoring values that don't parse"""
+    values = {'height_cm': parse_number(patient.height), 'weight_kg': parse_number(patient.weight)}
+    try:
+        return record_vitals(patient, source='profile', **values)
+    except ValueError:
+        return None
+
+
+def ingest_vitals(rows, batch_size=1000, source='import', on_error=None):
+    """
+    Validate and bulk insert (line, dict) rows with patient_id, optional
+    measured_at and any of the LIMITS columns, batch_size at a time with
+    one patient lookup per batch. Returns (imported, failed) counts.
+    """
+    # Imported here: the importer pulls in the forms, which record profile vitals
+    from .importer import RowError, chunked
+
+    imported = failed = 0
+    for chunk in chunked(rows, batch_size):
+        candidates = []
+        for line, row in chunk:
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError(str(row) if isinstance(row, Exception) else "expected an object")
+                try:
+                    patient_id = int(row.get('patient_id') or 0)
+                except TypeError:
+                    raise ValueError(f"patient_id: not a number: {row.get('patient_id')!r}")
+                values = {field: row.get(field) for field in LIMITS}
+                candidates.append((line, measurement(patient_id, row.get('measured_at'), source, **values)))
+            except ValueError as exc:
+                failed += 1
+                if on_error:
+                    on_error(RowError(line, 'row', str(exc)))
+        known = set(
+            Patient.objects.filter(pk__in={vitals.patient_id for _, vitals in candidates}).values_list('pk', flat=True)
+        )
+        batch = []
+        for line, vitals in candidates:
+            if vitals.patient_id in known:
+                batch.append(vitals)
+                continue
+            failed += 1
+            if on_error:
+                on_error(RowError(line, 'patient_id', f"No patient {vitals.patient_id}"))
+        with transaction.atomic():
+            VitalsMeasurement.objects.bulk_create(batch, batch_size=batch_size)
+        imported += len(batch)
+    return imported, failed
@@ -0,0 +1,91 @@
+"""
+Database profiles for settings.DATABASES, picked by the MEDIWISE_DB_PROFILE
+environment variable ("sqlite", the default, or "postgres").
+
+The SQLite profile tunes every new connection for a web server: WAL so
+readers never wait for a writer, IMMEDIATE transactions so a writer queues
+on busy_timeout instead of failing with "database is locked" halfway
+through, and persistent connections so the pragmas and page cache outlive a
+single request. The PostgreSQL profile uses psycopg's connection pool
+(pip install "psycopg[pool]").
+
+Read replicas are listed in MEDIWISE_DB_REPLICAS: SQLite file paths (kept
+in step by `manage.py sync_replicas`) or PostgreSQL hosts. They become the
+replica1, replica2, ... aliases that main.routers sends reads to.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+# Seconds a connection is kept between requests (0 would reconnect every time)
+CONN_MAX_AGE = 600
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable at every checkpoint; a power cut can only lose the last commits, never corrupt
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms a writer waits for the lock
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,  # negative means KiB: 64 MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_profile(path, env=os.environ):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': env.get('MEDIWISE_SQLITE_PATH', path),
+        'CONN_MAX_AGE': int(env.get('MEDIWISE_CONN_MAX_AGE', CONN_MAX_AGE)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+
+
+def postgres_profile(env=os.environ):
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env.get('POSTGRES_DB', 'mediwise'),
+        'USER': env.get('POSTGRES_USER', 'mediwise'),
+        'PASSWORD': env.get('POSTGRES_PASSWORD', ''),
+        'HOST': env.get('POSTGRES_HOST', 'localhost'),
+        'PORT': env.get('POSTGRES_PORT', '5432'),
+        # The pool owns connection reuse, so Django must not also keep them
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(env.get('POSTGRES_POOL_MIN', 2)),
+                'max_size': int(env.get('POSTGRES_POOL_MAX', 10)),
+                'timeout': int(env.get('POSTGRES_POOL_TIMEOUT', 10)),
+            },
+        },
+    }
+
+
+def database_config(base_dir, env=os.environ):
+    """The 'default' database for the profile named in MEDIWISE_DB_PROFILE"""
+    profile = env.get('MEDIWISE_DB_PROFILE', 'sqlite')
+    if profile == 'sqlite':
+        return sqlite_profile(base_dir / 'db.sqlite3', env)
+    if profile == 'postgres':
+        return postgres_profile(env)
+    raise ImproperlyConfigured(f"Unknown MEDIWISE_DB_PROFILE {profile!r} (expected 'sqlite' or 'postgres')")
+
+
+def replica_configs(primary, env=os.environ):
+    """replicaN aliases: copies of the primary profile pointing at each replica"""
+    replicas = {}
+    locations = [location.strip() for location in env.get('MEDIWISE_DB_REPLICAS', '').split(',') if location.strip()]
+    for number, location in enumerate(locations, start=1):
+        key = 'NAME' if primary['ENGINE'] == 'django.db.backends.sqlite3' else 'HOST'
+        # Tests run against the primary's test database only
+        replicas[f'replica{number}'] = {**primary, key: location, 'TEST': {'MIRROR': 'default'}}
+    return replicas
+
+
+def databases(base_dir, env=os.environ):
+    primary = database_config(base_dir, env)
+    return {'default': primary, **replica_configs(primary, env)}
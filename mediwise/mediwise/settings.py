@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 
+from .database import databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,11 +43,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "main.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "main.routers.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "main.principal.PrincipalMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -54,7 +59,9 @@ ROOT_URLCONF = "mediwise.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates that reports render time to main.metrics
+        "BACKEND": "main.metrics.TimedDjangoTemplates",
+        "NAME": "django",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -69,16 +76,26 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "mediwise.wsgi.application"
 
+# Under ASGI (mediwise.asgi) login, the dashboards and profile pages resolve
+# to the coroutine views in main.async_views
+ASGI_APPLICATION = "mediwise.asgi.application"
+ASGI_ROOT_URLCONF = "mediwise.urls_async"
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
-}
+# Tuned SQLite by default, pooled PostgreSQL with MEDIWISE_DB_PROFILE=postgres,
+# plus any read replicas in MEDIWISE_DB_REPLICAS (see mediwise/database.py)
+DATABASES = databases(BASE_DIR)
+
+# Reads go to a replica, writes and everything inside a transaction to the primary
+DATABASE_ROUTERS = ["main.routers.PrimaryReplicaRouter"]
+
+# After a request writes, the client reads from the primary for this many
+# seconds so it sees its own changes while the replicas catch up
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = "mediwise_primary"
 
 
 # Password validation
@@ -100,6 +117,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# Hashing and verification run in a bounded thread pool (see main/credentials.py)
+
+PASSWORD_HASHERS = [
+    "main.credentials.MediwisePBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+
+CREDENTIAL_HASH_ITERATIONS = 1_000_000  # PBKDF2 cost factor
+CREDENTIAL_POOL_WORKERS = None  # defaults to the number of CPUs
+CREDENTIAL_POOL_MAX_QUEUE = 64  # hashing jobs in flight before logins are refused
+CREDENTIAL_POOL_TIMEOUT = 10  # seconds
+
+
+# Logged-in account rows are cached per process (see main/principal.py)
+
+PRINCIPAL_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL = 60  # seconds
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/6.0/topics/i18n/
 
@@ -116,7 +154,56 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Static files get content-hashed names at collectstatic time, so they can
+# be cached for a year; build_assets must run before collectstatic
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "main.storage.MediwiseStaticStorage"},
+}
+STATIC_MAX_AGE = 60 * 60 * 24 * 365
+
+# build_assets: npm packages (tailwindcss, Font Awesome, Fontsource, Cropper.js)
+# and an optional command line for a standalone Tailwind binary
+ASSET_NODE_MODULES = BASE_DIR / 'node_modules'
+TAILWIND_CLI = None
 
 # Media files (Uploaded files)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_MAX_AGE = 60 * 60  # uploads without a content-addressed name
+
+# Internal nginx locations for X-Accel-Redirect, e.g. {'media': '/_protected/media/'};
+# without an entry, main.serving streams the file itself (sendfile under gunicorn)
+SENDFILE_ACCEL_PREFIXES = {}
+
+# Profile pictures: the background worker scales down uploads larger than this (in pixels),
+# storing the result under its own content hash, and generates the list/dashboard renditions
+PROFILE_PICTURE_MAX_SIDE = 1024
+BACKGROUND_TASKS_EAGER = False
+
+# Unreferenced media blobs are kept this long before gc_media deletes them
+MEDIA_GC_GRACE_HOURS = 24
+
+# Initials avatars rendered by main.avatars, one cache entry per (initials, palette)
+AVATAR_CACHE_SIZE = 512
+
+# Process-local cache for dashboard fragments and their per-account versions.
+# Use a shared backend (Redis, Memcached) when running several processes, and
+# bump KEY_PREFIX on deploys that change the dashboard templates.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "mediwise",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+FRAGMENT_CACHE_TTL = 600  # seconds
+
+# Request metrics (main.metrics): a Server-Timing header on every response,
+# per-view histograms at /metrics for the listed scraper addresses, and a
+# warning with the SQL for any request running more than this many queries
+METRICS_SERVER_TIMING = True
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+METRICS_QUERY_LOG_THRESHOLD = 30
@@ -0,0 +1,12 @@
+"""
+URL configuration used under ASGI (see asgi.py): mediwise.urls with the
+coroutine views from main.async_views in place of their sync versions.
+"""
+
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path("admin/", admin.site.urls),
+    path('', include('main.urls_async')),
+]
@@ -0,0 +1,11 @@
+/** @type {import('tailwindcss').Config} */
+module.exports = {
+  // Same defaults as the old cdn.tailwindcss.com play script, purged to the
+  // classes that appear in the templates (including the ones built in inline JS)
+  // and in Python code, where the form widgets set theirs
+  content: ['./main/templates/**/*.html', './main/**/*.py'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};